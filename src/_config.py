@@ -15,6 +15,8 @@ Sections:
 6. **URL Keywords**: Lists keywords used to filter and explore URLs during crawling.
 7. **Prompt Settings**: Contains prompts used for extracting information from HTML and PDF content.
 8. **Similarity Thresholds**: Sets thresholds for aligning items with target attributes.
+9. **Extraction Settings**: Controls the rule-based pre-pass and other shortcuts taken before calling the LLM.
+10. **Matching Settings**: Controls which scraped items are scored against the target attributes.
 
 # NOTE: MORE SETTINGS TO COME...
 """
@@ -23,6 +25,42 @@ Sections:
 MAX_CONCURRENCY = 4  # Maximum number of browser/page instances to use concurrently.
 USE_GET_CACHE = False  # Enable loading from cache when set to True.
 USE_SET_CACHE = False  # Enable saving to cache when set to True.
+PROCESS_POOL_WORKERS = None  # Worker processes for CPU-bound parsing. None uses every core; 0 runs tasks in a thread instead.
+PROCESS_POOL_TASK_TIMEOUT = 60  # Seconds to wait for a single parsing task in the process pool.
+OPENAI_BASE_URL = None  # Base URL for the OpenAI API, e.g. a local stand-in server. None uses $OPENAI_BASE_URL or the default.
+LLM_MAX_CONNECTIONS = 32  # Maximum open HTTP connections shared by all LLM clients.
+LLM_MAX_KEEPALIVE_CONNECTIONS = 16  # Idle HTTP connections kept alive for reuse by LLM clients.
+LLM_REQUEST_TIMEOUT = 60  # Seconds before an LLM HTTP request times out.
+CHAT_MAX_CONCURRENT_REQUESTS = 8  # Upper bound on chat requests in flight; the live limit adapts below this.
+CHAT_RPM = 500  # Chat requests per minute allowed by your API tier.
+CHAT_TPM = 200000  # Chat tokens per minute (prompt + max completion) allowed by your API tier.
+LLM_LATENCY_TARGET = 30  # Seconds. Chat concurrency is reduced when responses take longer than this.
+LLM_MAX_RETRIES = 3  # Retries for LLM requests that hit rate limits (429), server errors (5xx), connection errors or timeouts.
+EMBEDDING_MAX_INPUTS_PER_REQUEST = 2048  # Maximum texts sent in one embedding request.
+EMBEDDING_MAX_TOKENS_PER_REQUEST = 250000  # Maximum total tokens sent in one embedding request.
+EMBEDDING_MAX_CONCURRENT_REQUESTS = 4  # Upper bound on embedding requests in flight; the live limit adapts below this.
+EMBEDDING_RPM = 3000  # Embedding requests per minute allowed by your API tier.
+EMBEDDING_TPM = 1000000  # Embedding tokens per minute allowed by your API tier.
+EMBEDDING_BACKEND = "openai"  # Embedding backend: "openai" (remote), "hashed_ngram" (local, no dependencies) or "sentence_transformers" (local model).
+LOCAL_EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # Model used by the "sentence_transformers" backend.
+HASHED_EMBEDDING_DIM = 1024  # Vector size of the "hashed_ngram" backend.
+EMBEDDING_DIMENSIONS = None  # Request shortened OpenAI embeddings (e.g. 256 or 1024 instead of 3072). None keeps the model's full size.
+EMBEDDING_STORAGE_DTYPE = "float32"  # Cached/in-memory embedding format: "float32" (exact), or opt in to "float16" or "int8" (per-vector scale, ~4x smaller, slightly approximate scores).
+EMBEDDING_STORE_DIR = "../_embeddings"  # Local memory-mapped phrase embedding store. None uses the database cache instead.
+EMBEDDING_STORE_COMPACT_RATIO = 0.5  # Compact the store once this fraction of its rows has been overwritten. None disables.
+EMBEDDING_LRU_SIZE = 50000  # Phrase embeddings kept in memory by the shared embedding service.
+URL_SEGMENT_CACHE_SIZE = 100000  # URL segment relevance scores kept in memory; all are also persisted when USE_SET_CACHE is on.
+CHAT_CACHE_BACKEND = "memory"  # Chat response cache: "memory" (this run), "database" (persisted via LocalStorage), or None to disable.
+CHAT_CACHE_TTL = 7 * 24 * 3600  # Seconds before a cached chat response expires. None never expires.
+CANONICAL_URL_CACHE_SIZE = 100000  # Canonical URLs and fingerprints memoized per process.
+CRAWL_URL_QUERIES = False  # Treat links that differ only in their (non-tracking) query string as distinct pages when crawling.
+VISITED_FILTER_CAPACITY = 20000  # URLs held in each crawl's compact visited filter before later ones go to its exact overflow set.
+SEEN_FILTER_DIR = None  # e.g. "../_seen". Persist, per domain, links found dead or irrelevant so later runs skip them. Clear it after changing TARGET_URL_KEYWORDS.
+SEEN_FILTER_CAPACITY = 50000  # URLs held in each domain's persisted filter before later ones go to its exact overflow set.
+SEEN_FILTER_TTL_DAYS = 30  # Days before a domain's persisted filter is discarded and its links are scored and fetched again. None never expires.
+DEAD_URL_MAX_FAILURES = 3  # Separate runs a page must fail to return content in before it is skipped as dead.
+DOCUMENT_CACHE_SIZE = 512  # Parsed pages kept in memory from crawling until the interpreter reads them; should cover one establishment's crawl.
+USE_PLATFORM_ADAPTERS = True  # Extract items directly from hosted menu platforms (SinglePlatform, Toast, Square, Popmenu) when set to True.
 
 # <-----------------------Location Settings--------------------------------->
 SELECTED_ADDRESS = "Houston, Texas"  # Point of Interest (POI) around which to base your search.
@@ -32,6 +70,10 @@ LOOKUP_RADIUS = 16093  # Radius in meters around the SELECTED_ADDRESS to look fo
 SIMILARITY_THRESHOLD = 0.550  # Ignore any links with embedding cosine similarity less than this (see `TARGET_URL_KEYWORDS`).
 WEBPAGE_TIMEOUT = 10000  # Time in milliseconds to wait for a webpage to load before throwing a timeout error.
 DEPTH_LIMIT = 3  # Depth limit for the crawler.
+LINK_CLASSIFIER_PATH = "../_models/link_classifier.json"  # Link classifier retrained from `_trees` after each run. None uses embedding relevance only.
+LINK_CLASSIFIER_MIN_EXAMPLES = 20  # Train only once the trees hold this many followed links that did, and that did not, lead to menu items.
+LINK_CLASSIFIER_ACCEPT = 0.8  # Follow links the classifier scores at least this, without embedding them.
+LINK_CLASSIFIER_REJECT = 0.2  # Skip links the classifier scores at most this. Links in between fall back to SIMILARITY_THRESHOLD.
 
 # <-----------------------Search Parameters--------------------------------->
 SEARCH_REQUEST = "ukrainian"  # Search query term.
@@ -46,6 +88,13 @@ TARGET_ATTRIBUTES = {  # Attributes of the dish of interest.
     # "ingredient_4": [],  # Example of an empty ingredient list. Add as many ingredients as you deem necessary.
 }
 
+TARGET_PROFILES = None  # Score several dishes from one crawl: {"profile name": {attributes like TARGET_ATTRIBUTES}, ...}. None uses TARGET_ATTRIBUTES alone.
+# TARGET_PROFILES = {  # Example: the three dishes in this file, one results table each.
+#     "borscht": TARGET_ATTRIBUTES,
+#     "chicken_parmesan": {"name": ["chicken parmesan"], "ingredient_1": ["chicken"], "ingredient_2": ["parmesan", "mozzarella"], "ingredient_3": ["marinara", "tomato", "red"]},
+#     "fish_and_chips": {"name": ["fish and chips"], "ingredient_1": ["fish"], "ingredient_2": ["potatoes"], "ingredient_3": []},
+# }
+
 # <-----------------------Alternative Target Attributes Examples-------------------->
 # What are we looking for?
 # TARGET_ATTRIBUTES = {
@@ -100,4 +149,23 @@ Please ensure that items are copied exactly as seen in the text, with special ch
 
 PROMPT_PDF_EXTRACT = PROMPT_HTML_EXTRACT  # Use the same prompt for PDF extraction. Modify if a different prompt is required.
 
+# <-----------------------Extraction Settings--------------------------------->
+USE_RULE_BASED_EXTRACTION = True  # Try the deterministic menu line extractor before calling the LLM.
+RULE_EXTRACT_CONFIDENCE_THRESHOLD = 0.8  # Only skip the LLM when the rule-based extractor's confidence is at least this.
+RULE_EXTRACT_MIN_ITEMS = 3  # Minimum number of items the rule-based extractor must find to be trusted.
+PDF_BACKEND = "pypdfium2"  # PDF text backend: "pypdfium2" or "pymupdf" (fast, text only) or "pdfplumber" (slow, layout-aware).
+PDF_MAX_PAGES = 40  # Maximum number of PDF pages to extract. None extracts every page.
+PDF_MAX_CHARS = 200000  # Stop extracting a PDF once this many characters are collected. None disables the limit.
+
+# <-----------------------Matching Settings--------------------------------->
+MATCH_PREFILTER_NAME_THRESHOLD = None  # Opt-in: only score ingredients for items whose name similarity to TARGET_ATTRIBUTES['name'] is at least this (e.g. 0.3). Items it drops are left out of results.csv. None disables.
+MATCH_PREFILTER_TOP_K = None  # Opt-in: also keep the K items with the most similar names (e.g. 50), whatever their score. None disables.
+USE_LEXICAL_MATCHING = False  # Opt-in: score exact/fuzzy string matches to target phrases directly and skip embedding stopword n-grams. Changes combined scores.
+LEXICAL_FUZZY_THRESHOLD = 0.88  # Minimum string similarity ratio (0-1) for a misspelled phrase to count as a lexical match.
+MATCH_AT_END_OF_RUN = True  # Match every establishment's menu in one batch after crawling, instead of one establishment at a time.
+CANONICALIZE_MENU_ITEMS = True  # Cluster spelling/portion variants of the same item ("Ukrainian Borsh", "borscht (cup)"); variants with identical ingredients are scored once, and every row reports its cluster in canonical_item.
+MENU_CLUSTER_THRESHOLD = 0.8  # Minimum per-word string similarity (0-1) for two item names to count as variants of one another.
+MENU_INDEX_DIR = "../_menu_index"  # Persistent vector index over every scraped menu item, updated after each run. None disables.
+MENU_INDEX_NPROBE = 8  # Inverted lists scanned per query vector; higher is slower but closer to an exact search.
+
 # <------------------------------------------------------------------------>
\ No newline at end of file
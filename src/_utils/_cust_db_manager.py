@@ -62,6 +62,37 @@ class CustomDBManager:
             self.logging.warning(f"Collision detected for HASH_KEY: {hash_key}. Existing data overwritten.")
         self.commit()
 
+    def push_blobs_to_db(self, table_name, blobs, chunk_size=1000):
+        """
+        Inserts many blobs into the specified table with one statement per `chunk_size` rows.
+
+        Args:
+            table_name (str): The name of the table to insert the blobs into.
+            blobs (dict): hash_key -> blob data.
+        """
+        if not blobs:
+            return
+        if self.table_exists(table_name):
+            self.set_table(table_name)
+        else:
+            self.logging.info('SQL TABLE NOT FOUND')
+            self.logging.info('Constructing SQL query to generate new table')
+            sql_query = self.generate_table_from_name(table_name)
+            self.logging.info('Creating new table')
+            self.wrapped_execute(sql_query)
+
+        query = f"""
+            INSERT INTO {self.library}.{self.table_name} (HASH_KEY, BLOBBED)
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE BLOBBED = VALUES(BLOBBED)
+        """
+
+        rows = [(md5(hash_key.encode('utf-8')).hexdigest(), blob) for hash_key, blob in blobs.items()]
+        for start in range(0, len(rows), chunk_size):
+            self.cu.executemany(query, rows[start:start + chunk_size])
+        self.commit()
+        self.logging.info(f"Saved {len(rows)} HASH_KEYs.")
+
     def pull_blob_from_db(self, hash_key):
         """
         Retrieves the blob data associated with the given hash_key from the database.
@@ -88,6 +119,32 @@ class CustomDBManager:
             self.logging.info(f"No data found for HASH_KEY: {hash_key}")
             return None
 
+    def pull_blobs_from_db(self, hash_keys, chunk_size=1000):
+        """
+        Retrieves the blobs for many hash_keys with one query per `chunk_size` keys.
+
+        Args:
+            hash_keys (list of str): The hash keys identifying the blobs.
+
+        Returns:
+            dict: hash_key -> blob data, for the keys that were found.
+        """
+
+        if not hash_keys or not self.table_exists(self.table_name):
+            return {}
+
+        hashed = {md5(hash_key.encode('utf-8'), usedforsecurity=False).hexdigest(): hash_key for hash_key in hash_keys}
+        digests = list(hashed)
+        blobs = {}
+        for start in range(0, len(digests), chunk_size):
+            chunk = digests[start:start + chunk_size]
+            query = f"SELECT HASH_KEY, BLOBBED FROM {self.library}.{self.table_name} WHERE HASH_KEY IN ({', '.join(['%s'] * len(chunk))})"
+            self.cu.execute(query, tuple(chunk))
+            for digest, blob in self.cu.fetchall():
+                blobs[hashed[digest]] = blob
+        self.logging.info(f"Found {len(blobs)} of {len(hash_keys)} HASH_KEYs.")
+        return blobs
+
     def table_exists(self, table_name):
         """
         Checks if a table exists within the specified library/schema.
@@ -0,0 +1,259 @@
+from _utils._util import *
+from _utils._processpool import PROCESS_POOL
+
+import time
+import zlib
+from abc import ABC, abstractmethod
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+
+class EmbeddingBackend(ABC):
+    """
+    Interface for embedding backends behind `LLM.get_embeddings`.
+
+    `embed` returns an `np.ndarray` of shape (len(texts), dim) whose row `i` embeds `texts[i]`,
+    or an empty array on failure. `cache_namespace` keeps cached vectors from different backends apart.
+    """
+    name = 'base'
+
+    @property
+    def cache_namespace(self) -> str:
+        return self.name
+
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        ...
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """Remote embeddings through the owning `LLM`'s client, batching and rate limits."""
+    name = 'openai'
+
+    def __init__(self, llm):
+        self.llm = llm
+
+    @property
+    def cache_namespace(self) -> str:
+        # Empty for full-size vectors so existing caches (keyed by bare phrase) stay valid.
+        dimensions = getattr(self.llm, 'embedding_dimensions', None)
+        return f"{self.name}-{dimensions}" if dimensions else ''
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        return await self.llm._get_remote_embeddings(texts)
+
+
+def hashed_ngram_vectors(texts: List[str], dim: int, ngram_range: Tuple[int, int] = (3, 5)) -> np.ndarray:
+    """
+    Embed texts as L2-normalized, signed, hashed bags of character n-grams and words.
+    Deterministic across processes and runs (CRC32, not Python's salted `hash`). Runs in the process pool.
+    """
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        normalized = ' '.join(text.lower().split())
+        padded = f" {normalized} "
+        features = normalized.split()
+        for n in range(ngram_range[0], ngram_range[1] + 1):
+            features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        for feature in features:
+            digest = zlib.crc32(feature.encode('utf-8'))
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            vectors[row, digest % dim] += sign
+    # Sublinear term frequency, then unit length so cosine similarity is a dot product.
+    vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class HashedNgramEmbeddingBackend(EmbeddingBackend):
+    """Dependency-free local backend: hashed character n-gram vectors. Captures spelling, not meaning."""
+    name = 'hashed_ngram'
+    OFFLOAD_MIN_TEXTS = 2000  # Below this, hashing in-loop is cheaper than a process pool round trip.
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}-{self.dim}"
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.array([])
+        if len(texts) >= self.OFFLOAD_MIN_TEXTS:
+            return await PROCESS_POOL.run(hashed_ngram_vectors, texts, self.dim)
+        return hashed_ngram_vectors(texts, self.dim)
+
+
+class SentenceTransformerEmbeddingBackend(EmbeddingBackend):
+    """Local CPU backend using a sentence-transformers model (e.g. ONNX/PyTorch MiniLM)."""
+    name = 'sentence_transformers'
+
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
+        if SentenceTransformer is None:
+            raise ImportError("sentence-transformers is not installed; `pip install sentence-transformers`.")
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device='cpu')
+        UTIL_LOGGER.info(f"Loaded local embedding model '{model_name}'.")
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}-{self.model_name}"
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.array([])
+        # The model lives in this process, so it runs in a thread rather than the process pool.
+        embeddings = await asyncio.to_thread(self.model.encode, texts, normalize_embeddings=True, convert_to_numpy=True)
+        return np.asarray(embeddings, dtype=np.float32)
+
+
+def create_embedding_backend(backend_name: str, llm=None) -> EmbeddingBackend:
+    """Build the embedding backend selected in `_config.py`."""
+    if backend_name == 'openai':
+        return OpenAIEmbeddingBackend(llm)
+    if backend_name == 'hashed_ngram':
+        return HashedNgramEmbeddingBackend(dim=HASHED_EMBEDDING_DIM)
+    if backend_name == 'sentence_transformers':
+        return SentenceTransformerEmbeddingBackend(model_name=LOCAL_EMBEDDING_MODEL)
+    raise ValueError(f"Unknown embedding backend: {backend_name}")
+
+
+STORAGE_DTYPES = {'float32': np.float32, 'float16': np.float16, 'int8': np.int8}
+
+
+def quantize_embeddings(embeddings: np.ndarray, dtype: str = 'float32') -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compress an (n, dim) float matrix to `dtype` codes plus one scale factor per row, so that
+    `codes * scale` approximates the original. int8 uses symmetric per-row scaling (max |x| -> 127);
+    float16 and float32 keep a scale of 1.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if embeddings.ndim == 1:
+        embeddings = embeddings[np.newaxis, :]
+    if dtype == 'int8':
+        max_abs = np.abs(embeddings).max(axis=1, keepdims=True)
+        scales = np.where(max_abs == 0, 1.0, max_abs / 127.0).astype(np.float32)
+        codes = np.clip(np.rint(embeddings / scales), -127, 127).astype(np.int8)
+        return codes, scales[:, 0]
+    if dtype not in STORAGE_DTYPES:
+        raise ValueError(f"Unknown embedding storage dtype: {dtype}")
+    return embeddings.astype(STORAGE_DTYPES[dtype]), np.ones(len(embeddings), dtype=np.float32)
+
+
+def dequantize_embeddings(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """Inverse of `quantize_embeddings`: float32 rows of `codes * scale`."""
+    return codes.astype(np.float32) * np.asarray(scales, dtype=np.float32).reshape(-1, 1)
+
+
+def pack_embedding(codes: np.ndarray, scale: float) -> Tuple[str, bytes, float]:
+    """Cache form of one quantized row: (dtype, raw bytes, scale). Much smaller to pickle than a list of floats."""
+    return (codes.dtype.name, codes.tobytes(), float(scale))
+
+
+def unpack_embedding(value) -> Tuple[np.ndarray, float]:
+    """Read a cached embedding written by `pack_embedding`, or a legacy list of floats, into (codes, scale)."""
+    if isinstance(value, tuple) and len(value) == 3:
+        dtype, raw, scale = value
+        return np.frombuffer(raw, dtype=STORAGE_DTYPES[dtype]), scale
+    return np.asarray(value, dtype=np.float32), 1.0
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """float32 copy of `vectors` with every row scaled to unit length (all-zero rows are left as zeros)."""
+    vectors = np.atleast_2d(vectors).astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def cosine_similarity_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Cosine similarity between the rows of `a` and `b`, which may be float32, float16 or int8 codes.
+    Per-row scale factors cancel out of cosine similarity, so quantized codes are compared directly
+    without dequantizing. Accumulation is in float32.
+    """
+    return normalize_rows(a) @ normalize_rows(b).T
+
+
+def _rank(values: np.ndarray) -> np.ndarray:
+    ranks = np.empty(len(values), dtype=np.float64)
+    ranks[np.argsort(values, kind='stable')] = np.arange(len(values))
+    return ranks
+
+
+async def compare_embedding_backends(queries: List[str], targets: List[str], reference: EmbeddingBackend, candidates: List[EmbeddingBackend]) -> Dict[str, Dict[str, float]]:
+    """
+    Compare candidate backends against a reference on query x target cosine similarities.
+
+    Reports per backend: embedding latency, Spearman rank correlation of all similarity scores
+    with the reference, and how often each query's best-matching target agrees with the reference.
+    """
+    results = {}
+    reference_scores = None
+    for backend in [reference] + candidates:
+        start = time.perf_counter()
+        query_vectors = await backend.embed(queries)
+        target_vectors = await backend.embed(targets)
+        elapsed = time.perf_counter() - start
+
+        scores = cosine_similarity_matrix(query_vectors, target_vectors)
+
+        report = {'seconds': elapsed, 'texts_per_second': (len(queries) + len(targets)) / elapsed if elapsed else float('inf')}
+        if reference_scores is None:
+            reference_scores = scores
+        else:
+            report['spearman'] = float(np.corrcoef(_rank(scores.ravel()), _rank(reference_scores.ravel()))[0, 1])
+            report['top1_agreement'] = float(np.mean(scores.argmax(axis=1) == reference_scores.argmax(axis=1)))
+        results[backend.name] = report
+    return results
+
+
+def compare_storage_dtypes(embeddings: np.ndarray, queries: np.ndarray) -> Dict[str, Dict[str, float]]:
+    """
+    Compare storage dtypes on the same vectors: bytes per vector, largest cosine similarity error
+    against float32, and how often each query's best match is unchanged.
+    """
+    reference = cosine_similarity_matrix(queries, embeddings)
+    results = {}
+    for dtype in STORAGE_DTYPES:
+        codes, scales = quantize_embeddings(embeddings, dtype)
+        scores = cosine_similarity_matrix(quantize_embeddings(queries, dtype)[0], codes)
+        results[dtype] = {
+            'bytes_per_vector': codes.itemsize * codes.shape[1] + scales.itemsize,
+            'max_abs_error': float(np.abs(scores - reference).max()),
+            'top1_agreement': float(np.mean(scores.argmax(axis=1) == reference.argmax(axis=1))),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    # Usage (from src/): python -m _utils._embeddings ../_trees/example_trees_0.json
+    # Compares local backends against the configured reference on scraped menu phrases vs TARGET_ATTRIBUTES.
+    import sys
+    from _utils._llm import LLM
+
+    queries = set()
+    for path in sys.argv[1:]:
+        with open(path, 'r') as f:
+            for tree in json.load(f).values():
+                for item, ingredients in tree.get('menu_book', {}).items():
+                    queries.add(item)
+                    queries.update(ingredients)
+    targets = sorted({phrase for phrases in TARGET_ATTRIBUTES.values() for phrase in phrases})
+
+    candidates = [HashedNgramEmbeddingBackend(dim=HASHED_EMBEDDING_DIM)]
+    if SentenceTransformer is not None:
+        candidates.append(SentenceTransformerEmbeddingBackend(model_name=LOCAL_EMBEDDING_MODEL))
+
+    async def main():
+        reference = OpenAIEmbeddingBackend(LLM(embedding_backend='openai'))
+        report = await compare_embedding_backends(sorted(queries), targets, reference, candidates)
+        # Storage formats, on the reference model's vectors.
+        report.update(compare_storage_dtypes(await reference.embed(targets), await reference.embed(sorted(queries))))
+        return report
+
+    for name, metrics in asyncio.run(main()).items():
+        print(name, {key: round(value, 4) for key, value in metrics.items()})
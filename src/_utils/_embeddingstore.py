@@ -0,0 +1,267 @@
+from _utils._util import *
+from _utils._embeddings import quantize_embeddings
+
+from typing import Callable
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking; a single writer process is assumed.
+    fcntl = None
+
+
+class _FileLock:
+    """Exclusive cross-process lock on a lock file (no-op where `fcntl` is unavailable)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'a')
+        if fcntl:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+
+class EmbeddingStore:
+    """
+    Local on-disk embedding store: an append-only float32 matrix opened with `np.memmap`, plus an
+    append-only index log mapping each key (normalized phrase) to its row.
+
+    Files in `directory`, per store `name` and generation:
+        <name>.meta.json        {"generation": g, "dim": d} - replaced atomically on compaction.
+        <name>.<g>.f32          Row-major float32 matrix, one row per append.
+        <name>.<g>.idx          One JSON line `[key, row]` per append; later lines win.
+
+    Writers append under an exclusive file lock, writing rows before their index lines, so a reader
+    that sees an index entry always finds its row. Readers never lock: they pick up new index lines
+    and remap the grown matrix on `refresh()`. Compaction writes a new generation and swaps the meta
+    file; readers still holding the old generation keep a valid mapping until they refresh, and a
+    reader that finds the old files already removed re-reads the meta file and moves to the new one.
+    """
+
+    def __init__(self, directory: str, name: str = 'embeddings'):
+        self.directory = directory
+        self.name = name
+        os.makedirs(directory, exist_ok=True)
+        self.meta_path = os.path.join(directory, f"{name}.meta.json")
+        self._lock = _FileLock(os.path.join(directory, f"{name}.lock"))
+
+        self.generation = None
+        self.dim = None
+        self.index = {}  # key -> row
+        self._rows = 0  # Rows covered by the index (including overwritten ones).
+        self._index_offset = 0  # Bytes of the index log already read.
+        self._matrix = None
+        self.refresh()
+        UTIL_LOGGER.info(f"EmbeddingStore '{name}' opened at {directory} with {len(self.index)} embeddings (dim={self.dim}).")
+
+    def _data_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"{self.name}.{generation}.f32")
+
+    def _index_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"{self.name}.{generation}.idx")
+
+    def _read_meta(self) -> Optional[dict]:
+        try:
+            with open(self.meta_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, generation: int, dim: int) -> None:
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'generation': generation, 'dim': dim}, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def refresh(self) -> None:
+        """Pick up rows appended (or a compaction finished) by other writers since the last call."""
+        while True:
+            meta = self._read_meta()
+            if meta is None:
+                return
+            if meta['generation'] != self.generation:
+                self.generation, self.dim = meta['generation'], meta['dim']
+                self.index, self._rows, self._index_offset, self._matrix = {}, 0, 0, None
+            try:
+                self._read_generation()
+                return
+            except FileNotFoundError:
+                # Either nothing is written to this generation yet, or a compaction retired it
+                # between reading the meta file and opening its files: re-read the meta and retry.
+                meta = self._read_meta()
+                if meta is None or meta['generation'] == self.generation:
+                    return
+                UTIL_LOGGER.debug(f"EmbeddingStore '{self.name}' generation {self.generation} was retired while reading; moving to {meta['generation']}.")
+
+    def _read_generation(self) -> None:
+        """Read new index lines of the current generation and remap its matrix if it grew."""
+        with open(self._index_path(self.generation), 'rb') as f:
+            f.seek(self._index_offset)
+            new_bytes = f.read()
+        complete = new_bytes[:new_bytes.rfind(b'\n') + 1]  # Ignore a line still being written.
+        for line in complete.splitlines():
+            key, row = json.loads(line)
+            self.index[key] = row
+            self._rows = max(self._rows, row + 1)
+        self._index_offset += len(complete)
+
+        if self._rows and (self._matrix is None or len(self._matrix) < self._rows):
+            file_rows = os.path.getsize(self._data_path(self.generation)) // (4 * self.dim)
+            self._matrix = np.memmap(self._data_path(self.generation), dtype=np.float32, mode='r', shape=(file_rows, self.dim))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def get_many(self, keys: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Bulk lookup. Returns a contiguous float32 matrix with one row per key (zeros where missing)
+        and a boolean mask of which keys were found. Rows are gathered from the memmap in one call.
+        """
+        self.refresh()
+        rows = np.array([self.index.get(key, -1) for key in keys], dtype=np.int64)
+        found = rows >= 0
+        if self.dim is None:
+            return np.zeros((len(keys), 0), dtype=np.float32), found
+        matrix = np.zeros((len(keys), self.dim), dtype=np.float32)
+        if found.any():
+            matrix[found] = self._matrix[rows[found]]
+        return matrix, found
+
+    def add_many(self, keys: List[str], embeddings: np.ndarray) -> None:
+        """Append embeddings for `keys`. A key added again points to its new row; the old row is dead until compaction."""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if not keys:
+            return
+        if embeddings.shape[0] != len(keys):
+            raise ValueError(f"Expected {len(keys)} embeddings, received {embeddings.shape[0]}")
+
+        with self._lock:
+            self.refresh()
+            if self.generation is None:
+                self._write_meta(0, embeddings.shape[1])
+                self.refresh()
+            if embeddings.shape[1] != self.dim:
+                raise ValueError(f"EmbeddingStore '{self.name}' holds dim={self.dim}, received dim={embeddings.shape[1]}")
+
+            data_path = self._data_path(self.generation)
+            start_row = os.path.getsize(data_path) // (4 * self.dim) if os.path.exists(data_path) else 0
+            with open(data_path, 'ab') as f:
+                f.write(embeddings.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._index_path(self.generation), 'a', encoding='utf-8') as f:
+                for offset, key in enumerate(keys):
+                    f.write(json.dumps([key, start_row + offset], ensure_ascii=False) + '\n')
+            self.refresh()
+        UTIL_LOGGER.debug(f"EmbeddingStore '{self.name}' appended {len(keys)} embeddings (rows {start_row}-{start_row + len(keys) - 1}).")
+
+        if EMBEDDING_STORE_COMPACT_RATIO and self.dead_fraction() > EMBEDDING_STORE_COMPACT_RATIO:
+            self.compact()
+
+    def dead_fraction(self) -> float:
+        """Fraction of rows no longer referenced by the index."""
+        return 1 - len(self.index) / self._rows if self._rows else 0.0
+
+    def compact(self) -> None:
+        """Rewrite live rows into a new generation, dropping overwritten rows, and retire the old files."""
+        with self._lock:
+            self.refresh()
+            if self.generation is None:
+                return
+            old_generation = self.generation
+            new_generation = old_generation + 1
+            keys = sorted(self.index, key=self.index.get)
+            live = np.ascontiguousarray(self._matrix[[self.index[key] for key in keys]]) if keys else np.zeros((0, self.dim), np.float32)
+
+            with open(self._data_path(new_generation), 'wb') as f:
+                f.write(live.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._index_path(new_generation), 'w', encoding='utf-8') as f:
+                for row, key in enumerate(keys):
+                    f.write(json.dumps([key, row], ensure_ascii=False) + '\n')
+            self._write_meta(new_generation, self.dim)
+            UTIL_LOGGER.info(f"EmbeddingStore '{self.name}' compacted {self._rows} rows to {len(keys)} (generation {new_generation}).")
+
+            self._matrix = None
+            self.refresh()
+            # On POSIX, readers that still map the old files keep valid pages after unlinking.
+            for path in (self._data_path(old_generation), self._index_path(old_generation)):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    UTIL_LOGGER.warning(f"Could not remove retired embedding store file {path}: {e}")
+
+
+async def get_or_fetch_stored_embeddings(store: EmbeddingStore, llm, phrases: List[str], fallback: Optional[Callable[[List[str]], Dict[str, np.ndarray]]] = None) -> Dict[str, np.ndarray]:
+    """
+    Embeddings for `phrases` from `store` in one bulk lookup. Misses are looked up with `fallback` (phrase ->
+    float32 vector, e.g. the older database cache) and copied into the store; the rest are fetched from
+    `llm` in one call and appended. Values are in the compact `EMBEDDING_STORAGE_DTYPE` form, as with the
+    database cache. If the backend returns nothing, the error is logged and the embeddings found so far are returned.
+    """
+    phrases = list(dict.fromkeys(phrases))
+    if not phrases:
+        return {}
+    if USE_GET_CACHE:
+        matrix, found = store.get_many(phrases)
+    else:
+        matrix, found = np.zeros((len(phrases), store.dim or 0), dtype=np.float32), np.zeros(len(phrases), dtype=bool)
+    UTIL_LOGGER.debug(f"EmbeddingStore '{store.name}' hits: {int(found.sum())}, misses: {int((~found).sum())} out of {len(phrases)} unique phrases.")
+
+    missing = [phrase for phrase, hit in zip(phrases, found) if not hit]
+    embeddings = {}
+    if found.any():
+        codes, _ = quantize_embeddings(matrix[found], EMBEDDING_STORAGE_DTYPE)
+        embeddings.update(zip([phrase for phrase, hit in zip(phrases, found) if hit], codes))
+
+    if missing and fallback is not None and USE_GET_CACHE:
+        try:
+            migrated = {phrase: vector for phrase, vector in fallback(missing).items() if store.dim is None or np.size(vector) == store.dim}
+        except Exception as e:
+            UTIL_LOGGER.error(f"Fallback embedding lookup failed for {len(missing)} phrases: {e}. Fetching them from the backend.")
+            migrated = {}
+        if migrated:
+            migrated_phrases = list(migrated)
+            vectors = np.vstack([np.asarray(migrated[phrase], dtype=np.float32).reshape(1, -1) for phrase in migrated_phrases])
+            if USE_SET_CACHE:
+                store.add_many(migrated_phrases, vectors)
+            codes, _ = quantize_embeddings(vectors, EMBEDDING_STORAGE_DTYPE)
+            embeddings.update(zip(migrated_phrases, codes))
+            missing = [phrase for phrase in missing if phrase not in migrated]
+            UTIL_LOGGER.info(f"Reused {len(migrated_phrases)} embeddings from the fallback cache in EmbeddingStore '{store.name}'.")
+
+    if missing:
+        UTIL_LOGGER.info(f"Fetching {len(missing)} new embeddings from LLM.")
+        fetched = await llm.get_embeddings(missing)
+        if fetched.size == 0:
+            UTIL_LOGGER.error(f"Embedding backend returned no embeddings for {len(missing)} phrases. Returning the {len(embeddings)} found in caches.")
+            return embeddings
+        if USE_SET_CACHE:
+            store.add_many(missing, fetched)
+        codes, _ = quantize_embeddings(fetched, EMBEDDING_STORAGE_DTYPE)
+        embeddings.update(zip(missing, codes))
+    return embeddings
+
+
+_STORES = {}  # Process-wide stores by name.
+
+
+def get_embedding_store(name: str) -> Optional[EmbeddingStore]:
+    """Return the process-wide store for `name` (one per embedding backend/size), or None if disabled in `_config.py`."""
+    if not EMBEDDING_STORE_DIR:
+        return None
+    if name not in _STORES:
+        _STORES[name] = EmbeddingStore(EMBEDDING_STORE_DIR, name)
+    return _STORES[name]
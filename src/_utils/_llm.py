@@ -1,29 +1,139 @@
 from _utils._util import *  # Assuming logging is imported from _utils._util
 
+from _utils._processpool import PROCESS_POOL
+from _utils._ratelimiter import LLMBudget
+from _utils._responsecache import ResponseCache, create_response_cache
+from _utils._embeddings import EmbeddingBackend, create_embedding_backend, quantize_embeddings
+
+import httpx
 import tiktoken
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, APIConnectionError
+
+_HTTP_CLIENT = None  # Connection pool shared by every LLM instance's client.
+
+
+def get_shared_http_client() -> httpx.AsyncClient:
+    """Return the process-wide HTTP connection pool used by all OpenAI clients, creating it if needed."""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed:
+        _HTTP_CLIENT = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS
+            ),
+            timeout=LLM_REQUEST_TIMEOUT
+        )
+        UTIL_LOGGER.info(
+            "Shared LLM HTTP pool created with max_connections=%d, max_keepalive_connections=%d",
+            LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE_CONNECTIONS
+        )
+    return _HTTP_CLIENT
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Errors worth retrying, as in the OpenAI SDK's own retry policy: connection failures and timeouts,
+    request timeouts (408), lock conflicts (409), rate limits (429) and server errors (5xx).
+    """
+    if isinstance(error, APIConnectionError):  # Includes APITimeoutError.
+        return True
+    status_code = getattr(error, 'status_code', None)
+    return status_code in (408, 409, 429) or (status_code is not None and status_code >= 500)
+
+
+async def close_shared_http_client() -> None:
+    """Close the shared HTTP connection pool. It is recreated on next use, and each `LLM.client` is rebuilt on it."""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is not None and not _HTTP_CLIENT.is_closed:
+        await _HTTP_CLIENT.aclose()
+        UTIL_LOGGER.info("Shared LLM HTTP pool closed.")
+    _HTTP_CLIENT = None
+
+_ENCODINGS = {}  # Per-process tiktoken encodings, keyed by model.
+
+# Chat and embedding requests each share one RPM/TPM + adaptive concurrency budget per process,
+# since API limits apply per key rather than per LLM instance.
+CHAT_BUDGET = LLMBudget(
+    'chat',
+    rpm=CHAT_RPM,
+    tpm=CHAT_TPM,
+    max_concurrency=CHAT_MAX_CONCURRENT_REQUESTS,
+    initial_concurrency=max(1, CHAT_MAX_CONCURRENT_REQUESTS // 2),
+    latency_target=LLM_LATENCY_TARGET
+)
+EMBEDDING_BUDGET = LLMBudget(
+    'embeddings',
+    rpm=EMBEDDING_RPM,
+    tpm=EMBEDDING_TPM,
+    max_concurrency=EMBEDDING_MAX_CONCURRENT_REQUESTS
+)
+
+
+_CHAT_RESPONSE_CACHE = None  # Created on first use so a database backend isn't opened at import.
+
 
-# SANITIZED KEY
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+def get_chat_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide chat response cache, or None if disabled in `_config.py`."""
+    global _CHAT_RESPONSE_CACHE
+    if _CHAT_RESPONSE_CACHE is None and CHAT_CACHE_BACKEND:
+        _CHAT_RESPONSE_CACHE = create_response_cache(CHAT_CACHE_BACKEND, CHAT_CACHE_TTL)
+    return _CHAT_RESPONSE_CACHE
+
+
+def get_llm_utilization() -> Dict[str, Dict[str, float]]:
+    """Live utilization of the process-wide chat and embedding budgets."""
+    return {'chat': CHAT_BUDGET.utilization(), 'embeddings': EMBEDDING_BUDGET.utilization()}
+
+
+def count_tokens(model: str, text_list: List[str]) -> List[int]:
+    """Count tokens for each text. Runs in the process pool for large inputs."""
+    if model not in _ENCODINGS:
+        _ENCODINGS[model] = tiktoken.encoding_for_model(model)
+    encoding = _ENCODINGS[model]
+    return [len(encoding.encode(text)) for text in text_list]
 
 class LLM:
-    def __init__(self, model_chat: str = "gpt-4o-mini", model_embedding: str = 'text-embedding-3-large', max_tokens: int = 265, temperature: float = 0.7):
+    OFFLOAD_MIN_CHARS = 50000  # Below this many characters, token counting is cheaper in-loop than in the process pool.
+
+    def __init__(self, model_chat: str = "gpt-4o-mini", model_embedding: str = 'text-embedding-3-large', max_tokens: int = 265, temperature: float = 0.7, base_url: str = None, embedding_backend: str = None, embedding_dimensions: int = None):
+        self.base_url = base_url or OPENAI_BASE_URL or os.getenv("OPENAI_BASE_URL")
+        self._client = None  # Created on first API call, so local embedding backends run without an API key.
+        self._http_client = None  # The shared pool `_client` was built on.
         self.model_chat = model_chat
         self.model_embedding = model_embedding
-        self.token_limit = 4095  # token limit for 'text-embedding-3-large'
+        self.embedding_dimensions = embedding_dimensions or EMBEDDING_DIMENSIONS  # Shortened vectors via the API's `dimensions` parameter.
+        self.token_limit = 4095  # per-input token limit before chunking for 'text-embedding-3-large'
         self.encoding = tiktoken.encoding_for_model(model_embedding)
         self.max_tokens = max_tokens
         self.temperature = temperature
         self.logger = logging.getLogger(__name__)
+        self.embedding_backend: EmbeddingBackend = create_embedding_backend(embedding_backend or EMBEDDING_BACKEND, llm=self)
         
         self.logger.info(
-            "LLM initialized with parameters: model_chat=%s, model_embedding=%s, max_tokens=%d, temperature=%.2f",
-            self.model_chat, self.model_embedding, self.max_tokens, self.temperature
+            "LLM initialized with parameters: model_chat=%s, model_embedding=%s, max_tokens=%d, temperature=%.2f, base_url=%s, embedding_backend=%s",
+            self.model_chat, self.model_embedding, self.max_tokens, self.temperature, self.base_url or 'default', self.embedding_backend.name
         )
 
+    @property
+    def client(self) -> AsyncOpenAI:
+        http_client = get_shared_http_client()
+        if self._client is None or self._http_client is not http_client:
+            # Built on first use, and rebuilt after `close_shared_http_client` replaces the pool.
+            # SANITIZED KEY
+            self._client = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                base_url=self.base_url,
+                http_client=http_client,
+                max_retries=0  # Retries happen in `_call_with_budget`, so every attempt goes through the budget.
+            )
+            self._http_client = http_client
+        return self._client
+
     async def chat(self, messages: List[dict], model: str = None, temperature: float = None, max_tokens: int = None, n: int = 1) -> List[str]:
         """
         Asynchronous chat-based API call to OpenAI.
+        Identical calls (same model, temperature, max_tokens, n and messages) are served from the
+        process-wide response cache and never hit the network twice.
         """
         model_to_use = model or self.model_chat
         temperature_to_use = temperature or self.temperature
@@ -34,9 +144,24 @@ class LLM:
             model_to_use, temperature_to_use, max_tokens_to_use, n
         )
 
+        response_cache = get_chat_response_cache()
+        if response_cache is None:
+            return await self._chat_request(messages, model_to_use, temperature_to_use, max_tokens_to_use, n)
+
+        key = ResponseCache.make_key(model_to_use, temperature_to_use, max_tokens_to_use, n, messages)
+        return await response_cache.get_or_compute(
+            key,
+            lambda: self._chat_request(messages, model_to_use, temperature_to_use, max_tokens_to_use, n)
+        )
+
+    async def _chat_request(self, messages: List[dict], model_to_use: str, temperature_to_use: float, max_tokens_to_use: int, n: int) -> List[str]:
+        """Send one chat completion request. Returns None on error."""
         try:
-            response = await asyncio.to_thread(
-                client.chat.completions.create,
+            estimated_tokens = await self._estimate_chat_tokens(messages, model_to_use, max_tokens_to_use, n)
+            response = await self._call_with_budget(
+                CHAT_BUDGET,
+                estimated_tokens,
+                self.client.chat.completions.create,
                 model=model_to_use,
                 messages=messages,
                 max_tokens=max_tokens_to_use,
@@ -52,6 +177,39 @@ class LLM:
             self.logger.error("Error during chat call: %s\nmessages: %s", str(e), messages, exc_info=True)
             return None
 
+    async def _call_with_budget(self, budget: LLMBudget, tokens: int, func, **kwargs):
+        """
+        Call the API under `budget`, retrying rate limits (429), server errors (5xx), connection errors and
+        timeouts with exponential backoff (see `is_retryable_error`). Other errors are raised at once.
+        """
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            try:
+                async with budget.reserve(tokens):
+                    return await func(**kwargs)
+            except Exception as e:
+                if not is_retryable_error(e) or attempt == LLM_MAX_RETRIES:
+                    raise
+                backoff = 2 ** attempt
+                self.logger.warning(
+                    "%s API call failed with %s (attempt %d/%d). Retrying in %ds. Utilization: %s",
+                    budget.name, getattr(e, 'status_code', None) or type(e).__name__, attempt + 1, LLM_MAX_RETRIES + 1, backoff, budget.utilization()
+                )
+                await asyncio.sleep(backoff)
+
+    async def _estimate_chat_tokens(self, messages: List[dict], model: str, max_tokens: int, n: int) -> int:
+        """Estimate the tokens a chat call counts against TPM: prompt tokens plus the completion budget."""
+        contents = [str(message.get('content', '')) for message in messages]
+        try:
+            if sum(len(content) for content in contents) >= self.OFFLOAD_MIN_CHARS:
+                prompt_tokens = sum(await PROCESS_POOL.run(count_tokens, model, contents))
+            else:
+                prompt_tokens = sum(count_tokens(model, contents))
+        except Exception as e:
+            # Unknown model names have no tiktoken encoding; fall back to ~4 characters per token.
+            self.logger.debug("Token estimate fell back to character count for model %s: %s", model, str(e))
+            prompt_tokens = sum(len(content) for content in contents) // 4
+        return prompt_tokens + 4 * len(messages) + max_tokens * n
+
     def _count_tokens(self, text: str) -> int:
         """Count the number of tokens in a text string."""
         token_count = len(self.encoding.encode(text))
@@ -65,77 +223,139 @@ class LLM:
         self.logger.info("Text chunked into %d chunks based on token limit %d", len(chunks), self.token_limit)
         return chunks
 
+    @property
+    def embedding_store_name(self) -> str:
+        """Name of the local embedding store for this backend and vector size (see `_embeddingstore.py`)."""
+        return self.embedding_backend.cache_namespace or f"{self.embedding_backend.name}-{self.model_embedding}"
+
+    def embedding_cache_key(self, phrase: str) -> str:
+        """Cache key for a phrase's embedding, namespaced by backend so vectors from different backends never mix."""
+        namespace = self.embedding_backend.cache_namespace
+        return f"{namespace}|{phrase}" if namespace else phrase
+
+    async def get_quantized_embeddings(self, text_list: List[str], dtype: str = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Embeddings compressed to `dtype` (default `EMBEDDING_STORAGE_DTYPE`) as (codes, per-row scales).
+        See `quantize_embeddings`. Returns two empty arrays on failure.
+        """
+        embeddings = await self.get_embeddings(text_list)
+        if embeddings.size == 0:
+            return np.array([]), np.array([])
+        return quantize_embeddings(embeddings, dtype or EMBEDDING_STORAGE_DTYPE)
+
     async def get_embeddings(self, text_list: List[str]) -> np.ndarray:
         """
-        Asynchronous generation of embeddings for a list of texts using OpenAI API.
+        Asynchronous generation of embeddings for a list of texts with the configured backend
+        (`EMBEDDING_BACKEND`). Row `i` of the result is the embedding of `text_list[i]`.
         """
-        self.logger.info("get_embeddings called with %d texts", len(text_list))
+        self.logger.info("get_embeddings called with %d texts (backend=%s)", len(text_list), self.embedding_backend.name)
+        if not text_list:
+            return np.array([])
         try:
-            batches = self._create_batches(text_list)
-            all_embeddings = []
-
-            for batch in batches:
-                self.logger.debug("Generating embeddings for a batch of %d texts", len(batch))
-                embedding_response = await asyncio.to_thread(
-                    client.embeddings.create,
-                    model=self.model_embedding,
-                    input=batch
-                )
-                embedding_data = embedding_response.to_dict().get('data', [])
-                batch_embeddings = [data['embedding'] for data in embedding_data]
+            return await self.embedding_backend.embed(text_list)
+        except Exception as e:
+            self.logger.error("Error during embedding call for texts: %s\ntext_list: %s", str(e), text_list, exc_info=True)
+            return np.array([])
 
-                if batch_embeddings:
-                    all_embeddings.extend(batch_embeddings)
-                    self.logger.info("Aggregated embeddings for current batch")
-                else:
-                    self.logger.warning("No embeddings received for current batch")
+    async def _get_remote_embeddings(self, text_list: List[str]) -> np.ndarray:
+        """
+        Embeddings from the OpenAI API. Batches are dispatched concurrently under the shared
+        RPM/TPM limiter; row `i` of the result is the embedding of `text_list[i]`.
+        """
+        if not text_list:
+            return np.array([])
+        try:
+            token_counts = None
+            if sum(len(text) for text in text_list) >= self.OFFLOAD_MIN_CHARS:
+                token_counts = await PROCESS_POOL.run(count_tokens, self.model_embedding, text_list)
+            batches = self._create_batches(text_list, token_counts)
+
+            batch_embeddings = await asyncio.gather(*[self._embed_batch(batch) for batch in batches])
 
             self.logger.info("get_embeddings completed successfully")
-            return np.array(all_embeddings)
+            return self._assemble_embeddings(len(text_list), batches, batch_embeddings)
         except Exception as e:
             self.logger.error("Error during embedding call for texts: %s\ntext_list: %s", str(e), text_list, exc_info=True)
             return np.array([])
 
-    def _create_batches(self, text_list: List[str]) -> List[List[str]]:
+    async def _embed_batch(self, batch: List[Tuple[int, str, int]]) -> List[List[float]]:
+        """Embed one batch of (input index, text, tokens) pieces under the shared embedding budget."""
+        batch_tokens = sum(tokens for _, _, tokens in batch)
+        self.logger.debug("Generating embeddings for a batch of %d texts (%d tokens)", len(batch), batch_tokens)
+        embedding_response = await self._call_with_budget(
+            EMBEDDING_BUDGET,
+            batch_tokens,
+            self.client.embeddings.create,
+            model=self.model_embedding,
+            input=[text for _, text, _ in batch],
+            **({'dimensions': self.embedding_dimensions} if self.embedding_dimensions else {})
+        )
+        embedding_data = sorted(embedding_response.to_dict().get('data', []), key=lambda data: data['index'])
+        if len(embedding_data) != len(batch):
+            raise ValueError(f"Expected {len(batch)} embeddings for batch, received {len(embedding_data)}")
+        return [data['embedding'] for data in embedding_data]
+
+    def _assemble_embeddings(self, num_texts: int, batches: List[List[Tuple[int, str, int]]], batch_embeddings: List[List[List[float]]]) -> np.ndarray:
+        """
+        Reassemble batch results into one row per input, in input order. Texts that were chunked
+        get the token-weighted mean of their chunk embeddings, re-normalized to unit length.
         """
-        Create batches of texts where the total tokens per batch do not exceed the token limit.
+        rows = [None] * num_texts
+        weights = [0] * num_texts
+        pieces = [0] * num_texts
+        for batch, embeddings in zip(batches, batch_embeddings):
+            for (index, _, tokens), embedding in zip(batch, embeddings):
+                vector = np.asarray(embedding, dtype=np.float32)
+                weight = max(tokens, 1)
+                rows[index] = vector * weight if rows[index] is None else rows[index] + vector * weight
+                weights[index] += weight
+                pieces[index] += 1
+
+        for index in range(num_texts):
+            rows[index] = rows[index] / weights[index]
+            if pieces[index] > 1:
+                norm = np.linalg.norm(rows[index])
+                rows[index] = rows[index] / norm if norm else rows[index]
+        return np.vstack(rows)
+
+    def _create_batches(self, text_list: List[str], token_counts: Optional[List[int]] = None) -> List[List[Tuple[int, str, int]]]:
+        """
+        Pack texts into batches of (input index, text, tokens) limited by both input count
+        (`EMBEDDING_MAX_INPUTS_PER_REQUEST`) and total tokens (`EMBEDDING_MAX_TOKENS_PER_REQUEST`).
+        Texts longer than the per-input token limit are split into chunks.
+        `token_counts` may be precomputed (e.g. in the process pool); otherwise tokens are counted here.
         """
         batches = []
         current_batch = []
         current_tokens = 0
 
-        for text in text_list:
-            token_count = self._count_tokens(text)
-            
+        for index, text in enumerate(text_list):
+            token_count = token_counts[index] if token_counts is not None else self._count_tokens(text)
+
             if token_count > self.token_limit:
                 self.logger.warning(
                     "Text exceeds token limit (%d > %d). Chunking required.",
                     token_count, self.token_limit
                 )
-                text_chunks = self._chunk_text(text)
-                for chunk in text_chunks:
-                    chunk_tokens = self._count_tokens(chunk)
-                    if current_tokens + chunk_tokens > self.token_limit:
-                        if current_batch:
-                            batches.append(current_batch)
-                            self.logger.debug("Batch appended with %d texts/chunks", len(current_batch))
-                            current_batch = []
-                            current_tokens = 0
-                    current_batch.append(chunk)
-                    current_tokens += chunk_tokens
+                pieces = [(index, chunk, self._count_tokens(chunk)) for chunk in self._chunk_text(text)]
             else:
-                if current_tokens + token_count > self.token_limit:
-                    if current_batch:
-                        batches.append(current_batch)
-                        self.logger.debug("Batch appended with %d texts", len(current_batch))
-                        current_batch = []
-                        current_tokens = 0
-                current_batch.append(text)
-                current_tokens += token_count
+                pieces = [(index, text, token_count)]
+
+            for piece in pieces:
+                if current_batch and (
+                    len(current_batch) >= EMBEDDING_MAX_INPUTS_PER_REQUEST
+                    or current_tokens + piece[2] > EMBEDDING_MAX_TOKENS_PER_REQUEST
+                ):
+                    batches.append(current_batch)
+                    self.logger.debug("Batch appended with %d texts/chunks (%d tokens)", len(current_batch), current_tokens)
+                    current_batch = []
+                    current_tokens = 0
+                current_batch.append(piece)
+                current_tokens += piece[2]
 
         if current_batch:
             batches.append(current_batch)
-            self.logger.debug("Final batch appended with %d texts", len(current_batch))
+            self.logger.debug("Final batch appended with %d texts/chunks (%d tokens)", len(current_batch), current_tokens)
 
         self.logger.debug("Created %d batches for embedding generation", len(batches))
         return batches
@@ -164,11 +384,11 @@ class LLM:
         self.max_tokens = max_tokens
         self.logger.info("Default max_tokens changed from %d to %d", old_max_tokens, self.max_tokens)
 
-    def get_available_models(self) -> List[str]:
+    async def get_available_models(self) -> List[str]:
         """Fetch the available models from OpenAI."""
         self.logger.info("Fetching available models from OpenAI")
         try:
-            models = client.models.list()
+            models = await self.client.models.list()
             model_ids = [model.id for model in models.data]
             self.logger.info("Fetched %d models successfully", len(model_ids))
             return model_ids
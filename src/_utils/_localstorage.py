@@ -38,6 +38,17 @@ class LocalStorage:
             UTIL_LOGGER.info("No data found for hash_key='%s'", hash_key)
             return None
 
+    def get_many_by_hash(self, hash_keys):
+        """Retrieve data for many keys in bulk. Returns hash_key -> data for the keys found."""
+        UTIL_LOGGER.debug("Retrieving data for %d hash_keys", len(hash_keys))
+        data = {}
+        for hash_key, blob_data in self.db_manager.pull_blobs_from_db(hash_keys).items():
+            try:
+                data[hash_key] = pickle.loads(blob_data)
+            except UnicodeDecodeError as e:
+                UTIL_LOGGER.error("Decoding error for hash_key='%s': %s", hash_key, str(e))
+        return data
+
     def save_data(self, hash_key, data):
         """Save new API results to the cache, overwrite if data already exists."""
         UTIL_LOGGER.info("Saving data for hash_key='%s'", hash_key)
@@ -51,6 +62,17 @@ class LocalStorage:
             UTIL_LOGGER.error("Error while saving data for hash_key='%s': %s", hash_key, str(e))
             return {"error": str(e)}
 
+    def save_many(self, data):
+        """Save many key -> value pairs to the cache in bulk, overwriting existing data."""
+        UTIL_LOGGER.info("Saving data for %d hash_keys", len(data))
+        try:
+            blobs = {hash_key: pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL) for hash_key, value in data.items()}
+            self.db_manager.push_blobs_to_db(self.db_name, blobs)
+            return {"status": "Inserted or Updated"}
+        except Exception as e:
+            UTIL_LOGGER.error("Error while saving data for %d hash_keys: %s", len(data), str(e))
+            return {"error": str(e)}
+
     def close(self):
         """Close the database connection."""
         self.db_manager.close()
@@ -0,0 +1,66 @@
+from _utils._util import *
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+class ProcessPool:
+    """
+    Shared process pool for CPU-bound stages (PDF text extraction, HTML parsing, token counting)
+    so they run on every core instead of blocking the event loop.
+
+    Submitted callables must be module-level functions with picklable arguments and results.
+    With `max_workers=0` tasks run in a thread instead, which keeps the loop responsive but stays on one core.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, task_timeout: Optional[float] = None):
+        self.max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        self.task_timeout = task_timeout
+        self._executor = None
+        UTIL_LOGGER.info(
+            "ProcessPool configured with max_workers=%d, task_timeout=%s",
+            self.max_workers, self.task_timeout
+        )
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            UTIL_LOGGER.info("Starting process pool with %d workers.", self.max_workers)
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def run(self, func, *args, timeout: Optional[float] = None):
+        """
+        Run `func(*args)` in a worker process and await its result.
+
+        Raises:
+            asyncio.TimeoutError: If the task exceeds `timeout` (or the pool's default task timeout).
+        """
+        timeout = timeout if timeout is not None else self.task_timeout
+        name = getattr(func, '__name__', repr(func))
+
+        if self.max_workers == 0:
+            return await asyncio.wait_for(asyncio.to_thread(func, *args), timeout=timeout)
+
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self._get_executor(), func, *args)
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            # The worker keeps running until it finishes; only the caller stops waiting.
+            UTIL_LOGGER.warning("Process pool task '%s' timed out after %s seconds.", name, timeout)
+            raise
+        except BrokenProcessPool as e:
+            UTIL_LOGGER.error("Process pool broke while running '%s': %s. Restarting pool.", name, e)
+            self.shutdown(wait=False)
+            raise
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut down the worker processes. The pool restarts lazily on the next `run`."""
+        if self._executor is not None:
+            UTIL_LOGGER.info("Shutting down process pool.")
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+# Process-wide pool shared by every parser and LLM instance.
+PROCESS_POOL = ProcessPool(max_workers=PROCESS_POOL_WORKERS, task_timeout=PROCESS_POOL_TASK_TIMEOUT)
@@ -0,0 +1,158 @@
+from _utils._util import *
+
+import time
+import contextlib
+from collections import deque
+
+
+class RateLimiter:
+    """
+    Sliding one-minute window limiter for requests per minute (RPM) and tokens per minute (TPM).
+    Callers `await acquire(tokens)` before each API request; acquisitions are granted in FIFO order.
+    """
+    WINDOW = 60.0  # seconds
+
+    def __init__(self, name: str, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self._events = deque()  # (timestamp, tokens) per granted request within the window.
+        self._window_tokens = 0
+        self._lock = asyncio.Lock()
+        UTIL_LOGGER.info(f"RateLimiter '{name}' initialized with rpm={rpm}, tpm={tpm}")
+
+    def _prune(self, now: float) -> None:
+        while self._events and now - self._events[0][0] >= self.WINDOW:
+            _, tokens = self._events.popleft()
+            self._window_tokens -= tokens
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        """Seconds until a request of `tokens` fits in the window (0 if it fits now)."""
+        if not self._events:
+            return 0.0  # A single request larger than the TPM budget is still let through on an empty window.
+        request_ok = self.rpm is None or len(self._events) < self.rpm
+        token_ok = self.tpm is None or self._window_tokens + tokens <= self.tpm
+        if request_ok and token_ok:
+            return 0.0
+        return max(0.0, self.WINDOW - (now - self._events[0][0]))
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """Wait until one request of `tokens` tokens fits under the RPM/TPM limits, then record it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._prune(now)
+                wait = self._wait_time(tokens, now)
+                if wait <= 0:
+                    self._events.append((now, tokens))
+                    self._window_tokens += tokens
+                    return
+                UTIL_LOGGER.debug(f"RateLimiter '{self.name}' waiting {wait:.2f}s for capacity ({tokens} tokens).")
+                await asyncio.sleep(wait)
+
+    def utilization(self) -> Dict[str, float]:
+        """Fraction of the RPM/TPM budget used in the current window."""
+        self._prune(time.monotonic())
+        return {
+            'rpm': len(self._events) / self.rpm if self.rpm else 0.0,
+            'tpm': self._window_tokens / self.tpm if self.tpm else 0.0,
+        }
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: grows additively (about +1 per round of successful requests) and
+    shrinks multiplicatively on rate-limit errors or when latency exceeds the target.
+    """
+
+    def __init__(self, name: str, initial: int, max_limit: int, min_limit: int = 1,
+                 latency_target: Optional[float] = None, decrease_factor: float = 0.5):
+        self.name = name
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+        UTIL_LOGGER.info(
+            f"AdaptiveConcurrency '{name}' initialized with limit={self.limit:.0f}, "
+            f"range=[{self.min_limit}, {self.max_limit}], latency_target={latency_target}"
+        )
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            while self.in_flight >= int(self.limit):
+                await self._condition.wait()
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        if self.latency_target and latency > self.latency_target:
+            self._decrease(f"latency {latency:.1f}s above target {self.latency_target:.1f}s")
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def on_overload(self) -> None:
+        self._decrease("rate limited")
+
+    def _decrease(self, reason: str) -> None:
+        old_limit = self.limit
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        UTIL_LOGGER.warning(f"AdaptiveConcurrency '{self.name}' decreased from {old_limit:.1f} to {self.limit:.1f}: {reason}")
+
+
+class LLMBudget:
+    """
+    Process-wide budget for one class of LLM calls: an RPM/TPM window plus an AIMD concurrency limit.
+
+    Usage:
+        async with budget.reserve(estimated_tokens):
+            response = await client...
+    """
+
+    def __init__(self, name: str, rpm: Optional[int], tpm: Optional[int], max_concurrency: int,
+                 initial_concurrency: Optional[int] = None, latency_target: Optional[float] = None):
+        self.name = name
+        self.rate_limiter = RateLimiter(name, rpm=rpm, tpm=tpm)
+        self.concurrency = AdaptiveConcurrency(
+            name,
+            initial=initial_concurrency or max_concurrency,
+            max_limit=max_concurrency,
+            latency_target=latency_target
+        )
+        self.requests = 0
+        self.rate_limited = 0
+
+    @contextlib.asynccontextmanager
+    async def reserve(self, tokens: int):
+        await self.concurrency.acquire()
+        try:
+            await self.rate_limiter.acquire(tokens)
+            start = time.monotonic()
+            try:
+                yield
+            except Exception as e:
+                if getattr(e, 'status_code', None) == 429:
+                    self.rate_limited += 1
+                    self.concurrency.on_overload()
+                raise
+            self.requests += 1
+            self.concurrency.on_success(time.monotonic() - start)
+        finally:
+            await self.concurrency.release()
+
+    def utilization(self) -> Dict[str, float]:
+        """Live view of the budget: window usage, concurrency, and request counters."""
+        report = self.rate_limiter.utilization()
+        report.update({
+            'in_flight': self.concurrency.in_flight,
+            'concurrency_limit': round(self.concurrency.limit, 2),
+            'requests': self.requests,
+            'rate_limited': self.rate_limited,
+        })
+        return report
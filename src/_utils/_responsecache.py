@@ -0,0 +1,131 @@
+from _utils._util import *
+from _utils._localstorage import LocalStorage
+
+import time
+import hashlib
+
+
+class MemoryCacheBackend:
+    """Bounded in-process LRU backend."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class LocalStorageCacheBackend:
+    """Persistent backend on top of `LocalStorage`, so responses survive across runs."""
+
+    def __init__(self, db_name: str = 'llm_chat_responses'):
+        self.storage = LocalStorage(db_name)
+
+    def get(self, key: str):
+        return self.storage.get_data_by_hash(key)
+
+    def set(self, key: str, entry) -> None:
+        self.storage.save_data(key, entry)
+
+
+class ResponseCache:
+    """
+    Cache of LLM responses keyed by model, sampling parameters, and a hash of the messages.
+    Entries expire after `ttl` seconds (None keeps them forever). Concurrent requests for the
+    same key share one in-flight call.
+    """
+
+    def __init__(self, backend, ttl: Optional[float] = None):
+        self.backend = backend
+        self.ttl = ttl
+        self._in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        UTIL_LOGGER.info(f"ResponseCache initialized with backend={type(backend).__name__}, ttl={ttl}")
+
+    @staticmethod
+    def make_key(model: str, temperature: float, max_tokens: int, n: int, messages: List[dict]) -> str:
+        messages_digest = hashlib.sha256(
+            json.dumps(messages, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+        return f"chat|{model}|{temperature}|{max_tokens}|{n}|{messages_digest}"
+
+    def get(self, key: str):
+        try:
+            entry = self.backend.get(key)
+        except Exception as e:
+            UTIL_LOGGER.error(f"ResponseCache read failed for key {key}: {e}")
+            return None
+        if entry is None:
+            return None
+        created, value = entry
+        if self.ttl is not None and time.time() - created > self.ttl:
+            UTIL_LOGGER.debug(f"ResponseCache entry expired for key {key}")
+            return None
+        return value
+
+    def set(self, key: str, value) -> None:
+        try:
+            self.backend.set(key, (time.time(), value))
+        except Exception as e:
+            UTIL_LOGGER.error(f"ResponseCache write failed for key {key}: {e}")
+
+    async def get_or_compute(self, key: str, compute):
+        """
+        Return the cached value for `key`, or await `compute()` once and cache its result.
+        `None` results are treated as failures and are not cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            UTIL_LOGGER.debug(f"ResponseCache hit for key {key}")
+            return value
+
+        if key in self._in_flight:
+            UTIL_LOGGER.debug(f"ResponseCache joining in-flight request for key {key}")
+            return await asyncio.shield(self._in_flight[key])
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = await compute()
+            if value is not None:
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when no other caller is waiting on it.
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+
+def create_response_cache(backend_name: Optional[str], ttl: Optional[float]) -> Optional[ResponseCache]:
+    """Build the response cache selected in `_config.py` ('memory', 'database', or None to disable)."""
+    if not backend_name:
+        return None
+    if backend_name == 'memory':
+        return ResponseCache(MemoryCacheBackend(), ttl=ttl)
+    if backend_name == 'database':
+        try:
+            return ResponseCache(LocalStorageCacheBackend(), ttl=ttl)
+        except Exception as e:
+            UTIL_LOGGER.error(f"Failed to open database response cache ({e}). Falling back to memory.")
+            return ResponseCache(MemoryCacheBackend(), ttl=ttl)
+    raise ValueError(f"Unknown response cache backend: {backend_name}")
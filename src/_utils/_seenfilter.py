@@ -0,0 +1,196 @@
+from _utils._util import *
+
+import math
+import time
+
+
+class SeenURLFilter:
+    """
+    Compact seen-URL set over 64-bit URL fingerprints (see `url_fingerprint`): a Bloom filter sized for
+    `capacity` URLs at `error_rate` false positives, plus an exact overflow set.
+
+    The first `capacity` fingerprints go into the Bloom filter; later ones are kept exactly in the overflow
+    set, so the false-positive rate never degrades past `error_rate` however many URLs are added.
+    A false positive makes a new URL look seen, so the default rate is kept low (about 29 bits per URL).
+    Bloom filters cannot forget single entries, so `created` lets persisted filters expire as a whole.
+    Checks and adds are plain synchronous calls with no awaits, so they are atomic on the event loop and
+    need no lock.
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 1e-6):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0  # Fingerprints in the Bloom filter
+        self.overflow = set()
+        self.created = time.time()
+
+    def _positions(self, fingerprint: int):
+        # Double hashing: the two 32-bit halves of the fingerprint generate every probe position.
+        low, high = fingerprint & 0xFFFFFFFF, (fingerprint >> 32) | 1
+        return [(low + index * high) % self.num_bits for index in range(self.num_hashes)]
+
+    def _in_bloom(self, fingerprint: int) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(fingerprint))
+
+    def contains_fingerprint(self, fingerprint: int) -> bool:
+        return fingerprint in self.overflow or self._in_bloom(fingerprint)
+
+    def add_fingerprint(self, fingerprint: int) -> bool:
+        """Add a fingerprint. Returns False if it was (probably) already present."""
+        if self.contains_fingerprint(fingerprint):
+            return False
+        if self.count < self.capacity:
+            for position in self._positions(fingerprint):
+                self.bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+        else:
+            self.overflow.add(fingerprint)
+        return True
+
+    def __contains__(self, url: str) -> bool:
+        return self.contains_fingerprint(url_fingerprint(url))
+
+    def add(self, url: str) -> bool:
+        """Mark a URL as seen. Returns False if it was already seen, so check-and-add is a single call."""
+        return self.add_fingerprint(url_fingerprint(url))
+
+    def __len__(self) -> int:
+        return self.count + len(self.overflow)
+
+    def clear(self) -> None:
+        self.bits = bytearray(len(self.bits))
+        self.count = 0
+        self.overflow.clear()
+
+    def save(self, path: str) -> None:
+        """Write the filter to `path` (replaced atomically)."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            params=np.array([self.capacity, self.num_bits, self.num_hashes, self.count], dtype=np.int64),
+            error_rate=np.array([self.error_rate]),
+            created=np.array([self.created]),
+            bits=np.frombuffer(bytes(self.bits), dtype=np.uint8),
+            overflow=np.array(sorted(self.overflow), dtype=np.uint64),
+        )
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path: str) -> Optional['SeenURLFilter']:
+        try:
+            data = np.load(path)
+            capacity, num_bits, num_hashes, count = (int(value) for value in data['params'])
+            seen = SeenURLFilter(capacity, float(data['error_rate'][0]))
+            seen.num_bits, seen.num_hashes, seen.count = num_bits, num_hashes, count
+            seen.bits = bytearray(data['bits'].tobytes())
+            seen.overflow = {int(fingerprint) for fingerprint in data['overflow']}
+            seen.created = float(data['created'][0]) if 'created' in data.files else 0.0
+            return seen
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            UTIL_LOGGER.error(f"Failed to load seen-URL filter from {path}: {e}. Starting empty.")
+            return None
+
+
+_SKIP_FILTERS = {}  # Domain -> persisted filter of URLs known to be dead or irrelevant.
+_FETCH_FAILURES = {}  # Domain -> {fingerprint: [failed runs, last failure time]} for pages not yet considered dead.
+_FAILED_THIS_RUN = set()  # Fingerprints whose failure is already counted in this process.
+
+
+def _domain_key(domain: str) -> str:
+    domain = domain.lower()
+    return domain[4:] if domain.startswith('www.') else domain
+
+
+def _skip_filter_path(domain: str, suffix: str = '.npz') -> str:
+    return os.path.join(SEEN_FILTER_DIR, f"{re.sub(r'[^a-z0-9.-]', '_', domain)}{suffix}")
+
+
+def _expired(timestamp: float) -> bool:
+    return bool(SEEN_FILTER_TTL_DAYS) and time.time() - timestamp > SEEN_FILTER_TTL_DAYS * 86400
+
+
+def get_skip_filter(domain: str) -> Optional[SeenURLFilter]:
+    """
+    The persisted per-domain filter of URLs to skip on later runs, or None if SEEN_FILTER_DIR is disabled.
+    A filter older than SEEN_FILTER_TTL_DAYS is dropped and started fresh, so pages that came back or became
+    relevant are crawled again.
+    """
+    if not SEEN_FILTER_DIR:
+        return None
+    domain = _domain_key(domain)
+    if domain not in _SKIP_FILTERS:
+        seen = SeenURLFilter.load(_skip_filter_path(domain))
+        if seen is not None and _expired(seen.created):
+            UTIL_LOGGER.info(f"Seen-URL filter for {domain} is older than {SEEN_FILTER_TTL_DAYS} days. Starting fresh.")
+            seen = None
+        _SKIP_FILTERS[domain] = seen if seen is not None else SeenURLFilter(SEEN_FILTER_CAPACITY)
+    return _SKIP_FILTERS[domain]
+
+
+def _fetch_failures(domain: str) -> Dict[int, List[float]]:
+    if domain not in _FETCH_FAILURES:
+        failures = {}
+        try:
+            with open(_skip_filter_path(domain, '.failures.json'), 'r') as f:
+                failures = {int(fingerprint): entry for fingerprint, entry in json.load(f).items()}
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, OSError, ValueError) as e:
+            UTIL_LOGGER.error(f"Failed to load fetch failures for {domain}: {e}. Starting empty.")
+        _FETCH_FAILURES[domain] = {fingerprint: entry for fingerprint, entry in failures.items() if not _expired(entry[1])}
+    return _FETCH_FAILURES[domain]
+
+
+def record_fetch_failure(url: str) -> None:
+    """
+    Count a page that returned no content. It is added to its domain's skip filter only once it has failed
+    in DEAD_URL_MAX_FAILURES separate runs, so one timeout or transient error never marks it dead.
+    """
+    if not SEEN_FILTER_DIR:
+        return
+    fingerprint = url_fingerprint(url)
+    if fingerprint in _FAILED_THIS_RUN:
+        return
+    _FAILED_THIS_RUN.add(fingerprint)
+    domain = _domain_key(urlparse(url).netloc)
+    failures = _fetch_failures(domain)
+    entry = failures.setdefault(fingerprint, [0, 0.0])
+    entry[0] += 1
+    entry[1] = time.time()
+    if entry[0] >= DEAD_URL_MAX_FAILURES:
+        get_skip_filter(domain).add_fingerprint(fingerprint)
+        del failures[fingerprint]
+        UTIL_LOGGER.info(f"Marked URL as dead after {DEAD_URL_MAX_FAILURES} failed runs: {url}")
+
+
+def record_fetch_success(url: str) -> None:
+    """Forget earlier failures of a page that returned content."""
+    if not SEEN_FILTER_DIR:
+        return
+    _fetch_failures(_domain_key(urlparse(url).netloc)).pop(url_fingerprint(url), None)
+
+
+def save_skip_filters() -> None:
+    """Persist every per-domain skip filter and fetch-failure count touched in this process."""
+    for domain, seen in _SKIP_FILTERS.items():
+        try:
+            seen.save(_skip_filter_path(domain))
+        except OSError as e:
+            UTIL_LOGGER.error(f"Failed to save seen-URL filter for {domain}: {e}")
+    for domain, failures in _FETCH_FAILURES.items():
+        path = _skip_filter_path(domain, '.failures.json')
+        try:
+            os.makedirs(SEEN_FILTER_DIR, exist_ok=True)
+            with open(f"{path}.tmp", 'w') as f:
+                json.dump({str(fingerprint): entry for fingerprint, entry in failures.items()}, f)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            UTIL_LOGGER.error(f"Failed to save fetch failures for {domain}: {e}")
+    if _SKIP_FILTERS:
+        UTIL_LOGGER.info(f"Saved seen-URL filters for {len(_SKIP_FILTERS)} domains to {SEEN_FILTER_DIR}.")
@@ -2,6 +2,7 @@ from _config import *
 
 import os
 import re
+import multiprocessing
 import numpy as np
 import asyncio  # Add asyncio
 import aiohttp
@@ -14,6 +15,8 @@ from fake_useragent import UserAgent
 from datetime import datetime, timezone
 from sklearn.metrics.pairwise import cosine_similarity
 from collections import defaultdict, OrderedDict
+from functools import lru_cache
+from hashlib import blake2b
 from bs4 import BeautifulSoup, Comment
 
 from typing import List, Optional, Dict, Any, Tuple
@@ -38,13 +41,16 @@ log_format = logging.Formatter(
 # File handler for DEBUG and higher with rotation
 log_file = '../logging/log.log'
 
+# Worker processes (see `_processpool.py`) re-import this module; only the main process may reset the log.
+IS_MAIN_PROCESS = multiprocessing.current_process().name == 'MainProcess'
+
 # Ensure the log file is wiped each run
-if os.path.exists(log_file):
+if IS_MAIN_PROCESS and os.path.exists(log_file):
     os.remove(log_file)
 
 file_handler = RotatingFileHandler(
     filename=log_file,
-    mode='w',  # Overwrite the log file each run
+    mode='w' if IS_MAIN_PROCESS else 'a',  # Overwrite the log file each run
     maxBytes=10*1024*1024,  # 10 MB
     backupCount=1,
     encoding='utf-8',
@@ -99,21 +105,60 @@ def has_cycle(path: str, max_cycle_length: int = 10) -> bool:
 
     return False
 
-def normalize_url(url: str) -> str:
+# Query parameters that only track the visitor or session and never change the page.
+TRACKING_QUERY_PARAMS = {
+    'gclid', 'dclid', 'fbclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid', '_ga', '_gl', '_hsenc', '_hsmi',
+    'ref', 'ref_src', 'sessionid', 'session_id', 'sid', 'jsessionid', 'phpsessid', 'cfid', 'cftoken',
+}
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+@lru_cache(maxsize=CANONICAL_URL_CACHE_SIZE)
+def canonicalize_url(url: str, keep_query: bool = True) -> str:
     """
-    Normalize a URL by removing default ports, sorting query parameters, and 
-    removing fragments.
+    The one canonical form of a URL, used wherever URLs are compared or cached (memoized).
+
+    Lowercases the scheme and host, drops default ports, fragments, tracking parameters (`utm_*` and
+    `TRACKING_QUERY_PARAMS`) and trailing slashes, and sorts the remaining query parameters.
+    `keep_query=False` drops the query entirely. `www.` and the scheme are kept so the URL stays fetchable;
+    `url_fingerprint` ignores both.
     """
-    parsed = urlparse(url)
+    parsed = urlparse(url.strip())
     scheme = parsed.scheme.lower()
-    netloc = parsed.hostname.lower()
-    if parsed.port:
+    netloc = (parsed.hostname or '').lower()
+    if parsed.port and parsed.port != DEFAULT_PORTS.get(scheme):
         netloc += f":{parsed.port}"
 
-    path = parsed.path or '/'
-    query = urlencode(sorted(parse_qsl(parsed.query)))
-    normalized = urlunparse((scheme, netloc, path, '', query, ''))
-    return normalized
+    path = parsed.path.rstrip('/') or '/'
+    query = ''
+    if keep_query:
+        query = urlencode(sorted(
+            (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+            if not key.lower().startswith('utm_') and key.lower() not in TRACKING_QUERY_PARAMS
+        ))
+    return urlunparse((scheme, netloc, path, '', query, ''))
+
+
+def normalize_url(url: str) -> str:
+    """Alias of `canonicalize_url`, kept for existing callers."""
+    return canonicalize_url(url)
+
+
+@lru_cache(maxsize=CANONICAL_URL_CACHE_SIZE)
+def url_fingerprint(url: str) -> int:
+    """
+    64-bit fingerprint of a URL's canonical form, ignoring the scheme and a leading `www.`, so
+    http/https and www/apex variants of a page share one identity.
+    """
+    parsed = urlparse(canonicalize_url(url))
+    host = parsed.netloc[4:] if parsed.netloc.startswith('www.') else parsed.netloc
+    identity = f"{host}{parsed.path}?{parsed.query}"
+    return int.from_bytes(blake2b(identity.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def url_key(url: str) -> str:
+    """Cache key for a URL: its fingerprint as 16 hex digits. Every URL-keyed cache uses this."""
+    return f"{url_fingerprint(url):016x}"
 
 
 def get_anonymous_headers():
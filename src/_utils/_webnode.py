@@ -11,6 +11,8 @@ class WebNode:
         self.scraped_items = {}
         self.menu_book = defaultdict(set)
         self.children = []
+        self.link_anchors = {}  # Child or rejected link URL -> its anchor text on this page.
+        self.rejected_links = []  # Links on this page that URL relevance scored as irrelevant and were not followed.
 
     def add_child(self, child_node):
         if not isinstance(child_node, WebNode):
@@ -59,7 +61,9 @@ class WebNode:
             'descriptor': self.descriptor,
             'scraped_items': self.scraped_items,
             'menu_book': {k: list(v) for k, v in self.menu_book.items()},
-            'children': [child.to_dict() for child in self.children]
+            'children': [child.to_dict() for child in self.children],
+            'link_anchors': self.link_anchors,
+            'rejected_links': self.rejected_links
         }
         UTIL_LOGGER.debug(f"Serialized data for URL: {self.url}: {serialized.keys()}")
         return serialized
@@ -75,6 +79,8 @@ class WebNode:
         node = WebNode(url=url, descriptor=descriptor)
         node.scraped_items = data.get('scraped_items', {})
         node.menu_book = defaultdict(set, {k: set(v) for k, v in data.get('menu_book', {}).items()})
+        node.link_anchors = data.get('link_anchors', {})
+        node.rejected_links = data.get('rejected_links', [])
         children_data = data.get('children', [])
         UTIL_LOGGER.debug(f"Deserializing {len(children_data)} children for WebNode with URL: {url}")
         node.children = [WebNode.from_dict(child_data) for child_data in children_data]
@@ -45,6 +45,23 @@ class CacheManager:
             UTIL_LOGGER.error(f"Error retrieving data from '{storage_name}' for key '{key}': {e}", exc_info=True)
             raise
 
+    def get_many_cached_data(self, storage_name, keys):
+        """Bulk `get_cached_data`: one storage read for all `keys`. Returns key -> data for the keys found."""
+        UTIL_LOGGER.debug(f"Attempting to retrieve {len(keys)} keys from '{storage_name}'")
+        if not USE_GET_CACHE or not keys:
+            return {}
+
+        try:
+            storage = self._get_storage(storage_name)
+            if storage is None:
+                return {}
+            data = storage.get_many_by_hash(keys)
+            UTIL_LOGGER.debug(f"Retrieved {len(data)} of {len(keys)} keys from '{storage_name}'")
+            return data
+        except Exception as e:
+            UTIL_LOGGER.error(f"Error retrieving {len(keys)} keys from '{storage_name}': {e}", exc_info=True)
+            raise
+
     def set_cached_data(self, storage_name, key, value):
         UTIL_LOGGER.info(f"Attempting to set data in '{storage_name}' with key: {key}")
         if not USE_SET_CACHE:
@@ -64,6 +81,22 @@ class CacheManager:
             UTIL_LOGGER.error(f"Error setting data in '{storage_name}' for key '{key}': {e}", exc_info=True)
             raise
 
+    def set_many_cached_data(self, storage_name, items):
+        """Bulk `set_cached_data`: one storage write for all key -> value pairs in `items`."""
+        UTIL_LOGGER.info(f"Attempting to set {len(items)} keys in '{storage_name}'")
+        if not USE_SET_CACHE or not items:
+            return None
+
+        try:
+            storage = self._get_storage(storage_name)
+            if storage is None:
+                return
+            storage.save_many(items)
+            UTIL_LOGGER.info(f"Set {len(items)} keys in '{storage_name}'")
+        except Exception as e:
+            UTIL_LOGGER.error(f"Error setting {len(items)} keys in '{storage_name}': {e}", exc_info=True)
+            raise
+
     def close(self):
         UTIL_LOGGER.info("Closing all LocalStorage instances.")
         for name, storage in self.storages.items():
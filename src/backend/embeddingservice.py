@@ -0,0 +1,144 @@
+# embeddingservice.py
+
+from _utils._util import *
+from _utils._llm import LLM
+from _utils._embeddings import dequantize_embeddings, pack_embedding, unpack_embedding
+from _utils._embeddingstore import get_embedding_store, get_or_fetch_stored_embeddings
+from backend.cachemanager import CacheManager
+
+
+class EmbeddingService:
+    """
+    Process-wide phrase embedding lookup shared by the crawler (`LLMHandler`) and the matcher (`ItemMatcher`).
+
+    Lookups go: bounded in-memory LRU -> pending request for the same phrase -> persistent cache
+    (local embedding store, or the database) -> one batched backend call for all remaining misses.
+    Each pending phrase has a single future, so concurrent callers asking for the same phrase share one fetch.
+    Values are in the compact `EMBEDDING_STORAGE_DTYPE` form.
+    """
+
+    def __init__(self, llm: LLM = None, max_entries: int = 50000):
+        UTIL_LOGGER.info("Initializing EmbeddingService.")
+        self.llm = llm or LLM()
+        self.cache_manager = CacheManager()
+        self.max_entries = max_entries
+        self._lru = OrderedDict()
+        self._in_flight = {}  # phrase -> future
+        self.hits = 0
+        self.joined = 0
+        self.misses = 0
+        UTIL_LOGGER.info(f"EmbeddingService initialized with backend={self.llm.embedding_backend.name}, max_entries={max_entries}")
+
+    def _remember(self, phrase: str, embedding: np.ndarray) -> None:
+        self._lru[phrase] = embedding
+        self._lru.move_to_end(phrase)
+        if len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    async def get_embeddings(self, phrases: List[str]) -> Dict[str, np.ndarray]:
+        """Return phrase -> embedding for every non-empty phrase. Phrases are used as given (callers normalize)."""
+        embeddings = {}
+        pending = {}
+        misses = []
+        for phrase in dict.fromkeys(phrases):
+            if not phrase:
+                continue
+            if phrase in self._lru:
+                self._lru.move_to_end(phrase)
+                embeddings[phrase] = self._lru[phrase]
+            elif phrase in self._in_flight:
+                pending[phrase] = self._in_flight[phrase]
+            else:
+                misses.append(phrase)
+        self.hits += len(embeddings)
+        self.joined += len(pending)
+        self.misses += len(misses)
+        UTIL_LOGGER.debug(f"EmbeddingService memory hits: {len(embeddings)}, joined in-flight: {len(pending)}, misses: {len(misses)}.")
+
+        if misses:
+            loop = asyncio.get_running_loop()
+            futures = {phrase: loop.create_future() for phrase in misses}
+            self._in_flight.update(futures)
+            try:
+                fetched = await self._load(misses)
+                for phrase, future in futures.items():
+                    embedding = fetched.get(phrase)
+                    if embedding is not None:
+                        self._remember(phrase, embedding)
+                        embeddings[phrase] = embedding
+                    future.set_result(embedding)
+            except asyncio.CancelledError:
+                for future in futures.values():
+                    future.cancel()
+                raise
+            except Exception as e:
+                for future in futures.values():
+                    future.set_exception(e)
+                    # Mark the exception as retrieved when no other caller is waiting on it.
+                    future.exception()
+                raise
+            finally:
+                for phrase in misses:
+                    del self._in_flight[phrase]
+
+        for phrase, future in pending.items():
+            embedding = await asyncio.shield(future)
+            if embedding is not None:
+                embeddings[phrase] = embedding
+        return embeddings
+
+    async def _load(self, phrases: List[str]) -> Dict[str, np.ndarray]:
+        """Persistent cache lookup for `phrases`, then one batched backend call for the rest."""
+        store = get_embedding_store(self.llm.embedding_store_name)
+        if store is not None:
+            # Embeddings cached in the database before the store existed are reused and copied into it.
+            return await get_or_fetch_stored_embeddings(store, self.llm, phrases, fallback=self._database_embeddings)
+
+        embeddings = {phrase: codes for phrase, (codes, _) in self._cached_codes(phrases).items()}
+        phrases_to_fetch = [phrase for phrase in phrases if phrase not in embeddings]
+        UTIL_LOGGER.debug(f"Cache hits: {len(embeddings)}, Cache misses: {len(phrases_to_fetch)} out of {len(phrases)} unique phrases.")
+
+        if phrases_to_fetch:
+            UTIL_LOGGER.info(f"Fetching {len(phrases_to_fetch)} new embeddings from LLM.")
+            new_codes, new_scales = await self.llm.get_quantized_embeddings(phrases_to_fetch)
+            if new_codes.size == 0:
+                UTIL_LOGGER.error(f"Embedding backend returned no embeddings for {len(phrases_to_fetch)} phrases. Returning the {len(embeddings)} found in the cache.")
+                return embeddings
+            for phrase, codes, scale in zip(phrases_to_fetch, new_codes, new_scales):
+                # Similarity is computed on the compact codes directly; see `cosine_similarity_matrix`.
+                embeddings[phrase] = codes
+                self.cache_manager.set_cached_data('embedding_relevance', self.llm.embedding_cache_key(phrase), pack_embedding(codes, scale))
+            UTIL_LOGGER.info(f"Fetched and cached {len(phrases_to_fetch)} new embeddings.")
+        return embeddings
+
+    def _cached_codes(self, phrases: List[str]) -> Dict[str, Tuple[np.ndarray, float]]:
+        """(codes, scale) for each phrase in the database 'embedding_relevance' cache, read in one bulk lookup."""
+        keys = {self.llm.embedding_cache_key(phrase): phrase for phrase in phrases}
+        cached = {}
+        for key, value in self.cache_manager.get_many_cached_data('embedding_relevance', list(keys)).items():
+            try:
+                cached[keys[key]] = unpack_embedding(value)
+            except (ValueError, TypeError, KeyError) as e:
+                UTIL_LOGGER.error(f"Error converting cached embedding for phrase '{keys[key]}': {e}. Fetching anew.")
+        return cached
+
+    def _database_embeddings(self, phrases: List[str]) -> Dict[str, np.ndarray]:
+        """float32 vectors from the database cache, for migrating into the embedding store."""
+        return {phrase: dequantize_embeddings(codes, [scale])[0] for phrase, (codes, scale) in self._cached_codes(phrases).items()}
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'joined': self.joined, 'misses': self.misses, 'entries': len(self._lru)}
+
+    def close(self) -> None:
+        self.cache_manager.close()
+
+
+_EMBEDDING_SERVICE = None  # Shared by every LLMHandler and ItemMatcher in the process.
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Return the process-wide embedding service, creating it on first use."""
+    global _EMBEDDING_SERVICE
+    if _EMBEDDING_SERVICE is None:
+        _EMBEDDING_SERVICE = EmbeddingService(max_entries=EMBEDDING_LRU_SIZE)
+    return _EMBEDDING_SERVICE
@@ -1,10 +1,15 @@
 from _utils._util import *
 from _utils._llm import *
+from _utils._embeddings import cosine_similarity_matrix, normalize_rows
 
-from backend.cachemanager import CacheManager
+from backend.embeddingservice import EmbeddingService, get_embedding_service
+from backend.lexicalmatcher import LexicalMatcher
+from backend.menucanonicalizer import canonicalize_menu_books, fan_out_results
+
+import time
 
 class ItemMatcher:
-    def __init__(self, target_attributes, attribute_weights=None):
+    def __init__(self, target_attributes, attribute_weights=None, embedding_service: EmbeddingService = None):
         UTIL_LOGGER.info("Initializing ItemMatcher class.")
         self.target_attributes = target_attributes
         UTIL_LOGGER.debug(f"Target attributes: {list(self.target_attributes.keys())}")
@@ -18,65 +23,29 @@ class ItemMatcher:
             UTIL_LOGGER.info("Attribute weights provided and assigned.")
             UTIL_LOGGER.debug(f"Attribute weights: {self.attribute_weights}")
         
-        # Initialize CacheManager
-        self.cache_manager = CacheManager()
-        UTIL_LOGGER.info("Initialized CacheManager for embedding caching.")
-
-        # Initialize LLM class
-        self.llm = LLM()
-        UTIL_LOGGER.info("Initialized LLM for embeddings.")
+        # Embeddings are shared with the crawler through the process-wide service.
+        self.embedding_service = embedding_service or get_embedding_service()
+        UTIL_LOGGER.info("Attached shared EmbeddingService.")
 
         self.attribute_phrase_embeddings = {}
         UTIL_LOGGER.debug("Attribute phrase embeddings initialized as empty dictionary.")
 
+        # String-level matches scored before (and instead of some) embedding lookups.
+        self.lexical_matcher = LexicalMatcher(target_attributes, LEXICAL_FUZZY_THRESHOLD) if USE_LEXICAL_MATCHING else None
+
     async def get_phrase_embeddings(self, phrases):
         UTIL_LOGGER.debug("Fetching phrase embeddings.")
-        embeddings = {}
-        phrases_to_fetch = []
-        cache_hits = 0
-        cache_misses = 0
-
         # Normalize phrases to lowercase and strip whitespace, and remove duplicates
         normalized_phrases = set(phrase.lower().strip() for phrase in phrases)
         UTIL_LOGGER.debug(f"Normalized phrases to fetch: {len(normalized_phrases)} unique phrases.")
+        if '' in normalized_phrases:
+            UTIL_LOGGER.warning("Encountered empty phrase after normalization. Skipping.")
 
-        for phrase in normalized_phrases:
-            if not phrase:
-                UTIL_LOGGER.warning("Encountered empty phrase after normalization. Skipping.")
-                continue
-            cached_embedding = self.cache_manager.get_cached_data('embedding_relevance', phrase)
-            if cached_embedding is not None:
-                try:
-                    embeddings[phrase] = np.array(cached_embedding, dtype=np.float32)
-                    cache_hits += 1
-                except (ValueError, TypeError) as e:
-                    UTIL_LOGGER.error(f"Error converting cached embedding for phrase '{phrase}': {e}. Fetching anew.")
-                    phrases_to_fetch.append(phrase)
-                    cache_misses += 1
-            else:
-                phrases_to_fetch.append(phrase)
-                cache_misses += 1
-
-        UTIL_LOGGER.debug(f"Cache hits: {cache_hits}, Cache misses: {cache_misses} out of {len(normalized_phrases)} unique phrases.")
-
-        if phrases_to_fetch:
-            UTIL_LOGGER.info(f"Fetching {len(phrases_to_fetch)} new embeddings from LLM.")
-            try:
-                new_embeddings = await self.llm.get_embeddings(phrases_to_fetch)
-                for phrase, embedding in zip(phrases_to_fetch, new_embeddings):
-                    embeddings[phrase] = np.array(embedding, dtype=np.float32)
-                    # Save to cache as a list to ensure JSON serialization
-                    self.cache_manager.set_cached_data(
-                        'embedding_relevance',
-                        phrase,
-                        embedding.tolist()
-                    )
-                UTIL_LOGGER.info(f"Fetched and cached {len(phrases_to_fetch)} new embeddings.")
-            except Exception as e:
-                UTIL_LOGGER.error(f"Error fetching embeddings from LLM: {e}")
-                raise e
-
-        return embeddings
+        try:
+            return await self.embedding_service.get_embeddings(list(normalized_phrases))
+        except Exception as e:
+            UTIL_LOGGER.error(f"Error fetching embeddings from LLM: {e}")
+            raise e
 
     async def precompute_attribute_embeddings(self):
         UTIL_LOGGER.info("Precomputing attribute phrase embeddings.")
@@ -111,9 +80,33 @@ class ItemMatcher:
         UTIL_LOGGER.debug(f"Generated {len(ngrams)} n-grams.")
         return ngrams
 
+    def candidate_ngrams(self, text_list: List[str]) -> List[str]:
+        """`get_ngrams`, minus n-grams the lexical stage marks as unable to identify an ingredient."""
+        ngrams = self.get_ngrams(text_list)
+        return self.lexical_matcher.prune_ngrams(ngrams) if self.lexical_matcher else ngrams
+
+    def phrases_to_embed(self, scraped_items: List[Tuple[str, List[str]]]) -> set:
+        """
+        N-grams whose embeddings can still change an item's scores. With the lexical stage, an item whose
+        every attribute already has an exact string match needs none.
+        """
+        ngrams_to_embed = set()
+        has_phrases = np.array([bool(phrases) for phrases in self.target_attributes.values()])
+        for item_name, item_ingredients in scraped_items:
+            try:
+                ngrams = self.candidate_ngrams(item_ingredients)
+            except Exception as e:
+                # The item is reported and skipped when it is scored.
+                UTIL_LOGGER.debug(f"Not embedding n-grams of item '{item_name}': {e}")
+                continue
+            if self.lexical_matcher and ngrams and (self.lexical_matcher.score(ngrams).max(axis=0)[has_phrases] >= 1.0).all():
+                continue
+            ngrams_to_embed.update(ngram for ngram in ngrams if ngram)
+        return ngrams_to_embed
+
     def cosine_sim(self, vec1, vec2):
         try:
-            similarity = cosine_similarity([vec1], [vec2])[0][0]
+            similarity = cosine_similarity_matrix(vec1, vec2)[0][0]
             return similarity
         except Exception as e:
             UTIL_LOGGER.error(f"Error calculating cosine similarity: {e}")
@@ -231,55 +224,421 @@ class ItemMatcher:
 
     async def run_hybrid_similarity_tests(self, scraped_items):
         UTIL_LOGGER.info(f"Starting hybrid similarity tests for {len(scraped_items)} scraped items.")
-        results = []
-        try:
-            # Collect all unique phrases from scraped_items
-            all_phrases = set()
-            for item_name, item_ingredients in scraped_items.items():
-                normalized_name = item_name.lower().strip()
-                if normalized_name:
-                    all_phrases.add(normalized_name)
-                else:
-                    UTIL_LOGGER.warning("Encountered empty item name after normalization. Skipping.")
-                ngrams = self.get_ngrams(item_ingredients)
-                all_phrases.update(ngram for ngram in ngrams if ngram)
+        results = (await self.run_batched_similarity_tests([scraped_items]))[0]
+        UTIL_LOGGER.info("Completed hybrid similarity tests.")
+        return results
 
+    async def run_batched_similarity_tests(self, menu_books: List[Dict[str, List[str]]]) -> List[List[dict]]:
+        """
+        Score several menu books (e.g. every establishment in a run) together. Phrases are deduplicated
+        across all books and embedded once, and all items are scored in one `score_items` pass.
+        Returns one result list per menu book, each identical to `run_hybrid_similarity_tests` on that book alone.
+        """
+        UTIL_LOGGER.info(f"Starting batched similarity tests for {len(menu_books)} menu books ({sum(len(book) for book in menu_books)} items).")
+        if CANONICALIZE_MENU_ITEMS:
+            # Embed and score one item per cluster of name variants with identical ingredients; results are copied back to each variant.
+            original_books = menu_books
+            menu_books, variants = canonicalize_menu_books(menu_books, MENU_CLUSTER_THRESHOLD)
+        try:
+            # Stage 1: embed and score item names only, and keep the candidates that can plausibly match.
+            # Names that are exact lexical matches already score 1.0 and need no embedding.
+            normalized_names = set(item_name.lower().strip() for menu_book in menu_books for item_name in menu_book)
+            if '' in normalized_names:
+                UTIL_LOGGER.warning("Encountered empty item name after normalization. Skipping.")
+            normalized_names = [name for name in normalized_names if name]
+            if self.lexical_matcher:
+                normalized_names = [name for name, score in zip(normalized_names, self.lexical_matcher.score_names(normalized_names)) if score < 1.0]
+            scraped_embeddings = await self.get_phrase_embeddings(normalized_names)
+
+            # The prefilter's top-K applies per menu book, as when each book is matched on its own.
+            items = []
+            owners = []
+            for book_index, menu_book in enumerate(menu_books):
+                item_names = list(menu_book)
+                candidates = self.select_candidates(self.score_names(item_names, scraped_embeddings), MATCH_PREFILTER_TOP_K, MATCH_PREFILTER_NAME_THRESHOLD)
+                UTIL_LOGGER.info(f"Name prefilter kept {len(candidates)} of {len(item_names)} items for attribute scoring.")
+                items.extend((item_names[index], menu_book[item_names[index]]) for index in candidates)
+                owners.extend([book_index] * len(candidates))
+
+            # Stage 2: embed the candidates' ingredient n-grams in a single batch
+            all_phrases = self.phrases_to_embed(items)
+            all_phrases.difference_update(scraped_embeddings)
             UTIL_LOGGER.debug(f"Total unique phrases to fetch embeddings for: {len(all_phrases)}")
-
-            # Fetch all embeddings in a single batch
-            scraped_embeddings = await self.get_phrase_embeddings(list(all_phrases))
+            scraped_embeddings.update(await self.get_phrase_embeddings(list(all_phrases)))
             UTIL_LOGGER.debug(f"Fetched embeddings for all scraped items.")
 
-            # Process each item using the fetched embeddings
-            tasks = []
-            for item_name, item_ingredients in scraped_items.items():
-                task = self.hybrid_similarity(
-                    item_name,
-                    item_ingredients,
-                    scraped_embeddings
-                )
-                tasks.append(task)
+            # Score every item in one batched pass, then split the results back per menu book
+            results = [[] for _ in menu_books]
+            for book_index, result in zip(owners, self._score_item_list(items, scraped_embeddings)):
+                if result is not None:
+                    results[book_index].append(result)
+
+        except Exception as e:
+            UTIL_LOGGER.error(f"Error during hybrid similarity tests: {e}")
+            raise e
 
-            # Gather all results concurrently
-            hybrid_results = await asyncio.gather(*tasks, return_exceptions=True)
+        if CANONICALIZE_MENU_ITEMS:
+            results = [fan_out_results(book_results, book_variants, book) for book_results, book_variants, book in zip(results, variants, original_books)]
+        UTIL_LOGGER.info("Completed batched similarity tests.")
+        return results
 
-            # Iterate over results and handle exceptions
-            for (item_name, item_ingredients), result in zip(scraped_items.items(), hybrid_results):
-                if isinstance(result, Exception):
-                    UTIL_LOGGER.error(f"Failed to process item '{item_name}': {result}")
-                    continue
-                combined_score, attribute_scores = result
-                results.append({
-                    'scraped_item': item_name,
-                    'ingredients': item_ingredients,
-                    'combined_score': combined_score,
-                    'attribute_scores': attribute_scores
-                })
-                UTIL_LOGGER.debug(f"Processed item '{item_name}' with combined score {combined_score:.4f}.")
+    def _attribute_phrase_matrix(self) -> Tuple[Optional[np.ndarray], Dict[str, np.ndarray]]:
+        """
+        Unit-normalized matrix of every target phrase embedding, and for each attribute the columns
+        (rows of the matrix) holding its phrases. Phrases without an embedding are left out, as in `calculate_attribute_similarity`.
+        """
+        vectors = []
+        columns = {}
+        for attribute, phrases in self.target_attributes.items():
+            attribute_columns = []
+            for phrase in phrases:
+                phrase_embedding = self.attribute_phrase_embeddings.get(phrase.lower().strip())
+                if phrase_embedding is not None:
+                    attribute_columns.append(len(vectors))
+                    vectors.append(phrase_embedding)
+            columns[attribute] = np.array(attribute_columns, dtype=np.int64)
+        return (normalize_rows(np.vstack(vectors)) if vectors else None), columns
+
+    def score_names(self, item_names: List[str], scraped_embeddings, phrase_matrix: np.ndarray = None, attribute_columns: Dict[str, np.ndarray] = None) -> np.ndarray:
+        """Target similarity (as in `calculate_target_similarity`) for each item name, in one GEMM."""
+        if phrase_matrix is None and attribute_columns is None:
+            phrase_matrix, attribute_columns = self._attribute_phrase_matrix()
+        name_scores = np.zeros(len(item_names), dtype=np.float32)
+        name_columns = attribute_columns.get('name', np.array([], dtype=np.int64))
+        named_items = [index for index, item_name in enumerate(item_names) if item_name.lower().strip() in scraped_embeddings]
+        if phrase_matrix is not None:
+            # A malformed embedding only fails its own item (NaN score), not the whole batch.
+            malformed = {index for index in named_items if np.size(scraped_embeddings[item_names[index].lower().strip()]) != phrase_matrix.shape[1]}
+            if malformed:
+                name_scores[sorted(malformed)] = np.nan
+                named_items = [index for index in named_items if index not in malformed]
+        if named_items and len(name_columns):
+            name_matrix = normalize_rows(np.vstack([scraped_embeddings[item_names[index].lower().strip()] for index in named_items]))
+            name_scores[named_items] = np.maximum((name_matrix @ phrase_matrix[name_columns].T).max(axis=1), 0)
+        if self.lexical_matcher:
+            name_scores = np.maximum(name_scores, self.lexical_matcher.score_names(item_names))
+        return name_scores
+
+    def select_candidates(self, name_scores: np.ndarray, top_k: Optional[int] = None, threshold: Optional[float] = None) -> np.ndarray:
+        """
+        Indices of items kept by the name prefilter: the `top_k` best names plus every name scoring at least
+        `threshold`. With neither set, every item is kept.
+        """
+        if top_k is None and threshold is None:
+            return np.arange(len(name_scores))
+        keep = np.zeros(len(name_scores), dtype=bool)
+        if top_k:
+            keep[np.argsort(-name_scores, kind='stable')[:top_k]] = True
+        if threshold is not None:
+            keep |= name_scores >= threshold
+        return np.flatnonzero(keep)
+
+    def score_items(self, scraped_items, scraped_embeddings, attribute_threshold=0.0, name_similarity_weight=0.5) -> List[dict]:
+        """Score a menu book (item name -> ingredients) with `_score_item_list`, dropping items that failed."""
+        results = self._score_item_list(list(scraped_items.items()), scraped_embeddings, attribute_threshold, name_similarity_weight)
+        return [result for result in results if result is not None]
+
+    def _score_item_list(self, items: List[Tuple[str, List[str]]], scraped_embeddings, attribute_threshold=0.0, name_similarity_weight=0.5) -> List[Optional[dict]]:
+        """
+        Batched equivalent of calling `hybrid_similarity` for every item, with the same scores.
+
+        Each distinct n-gram and target phrase is normalized once. One GEMM scores every n-gram against every
+        target phrase, a max over each attribute's columns reduces that to n-gram x attribute, and
+        `np.maximum.reduceat` over each item's segment of n-gram rows gives item x attribute.
+        Item names are scored against the 'name' phrases with a second GEMM.
+        With the lexical stage enabled, each n-gram and name takes the larger of its embedding and lexical score.
+        Returns one result per item, in order (None where the item could not be scored).
+        """
+        attribute_scores = self.item_attribute_scores(items, scraped_embeddings)
+        name_scores = self.score_names([item_name for item_name, _ in items], scraped_embeddings)
+        return self.combine_scores(items, attribute_scores, name_scores, attribute_threshold, name_similarity_weight)
+
+    def item_attribute_scores(self, items: List[Tuple[str, List[str]]], scraped_embeddings) -> np.ndarray:
+        """(items x attributes) best n-gram similarity per item and attribute, floored at 0. See `_score_item_list`."""
+        attributes = list(self.target_attributes)
+        phrase_matrix, attribute_columns = self._attribute_phrase_matrix()
+
+        # Distinct n-grams that can be scored, and each item's segment of rows into them.
+        # An item whose n-grams can't be built or have malformed embeddings is skipped on its own (NaN row).
+        dimension = phrase_matrix.shape[1] if phrase_matrix is not None else None
+        ngram_rows = {}
+        segments = []
+        failed_items = []
+        for index, (item_name, item_ingredients) in enumerate(items):
+            try:
+                ngrams = [ngram for ngram in self.candidate_ngrams(item_ingredients) if ngram in scraped_embeddings or self.lexical_matcher]
+                for ngram in ngrams:
+                    if dimension is not None and ngram in scraped_embeddings and np.size(scraped_embeddings[ngram]) != dimension:
+                        raise ValueError(f"embedding of '{ngram}' has {np.size(scraped_embeddings[ngram])} values, expected {dimension}")
+            except Exception as e:
+                UTIL_LOGGER.error(f"Failed to process item '{item_name}': {e}")
+                failed_items.append(index)
+                segments.append([])
+                continue
+            segments.append([ngram_rows.setdefault(ngram, len(ngram_rows)) for ngram in ngrams])
+
+        attribute_scores = np.zeros((len(items), len(attributes)), dtype=np.float32)
+        ngram_attribute_scores = np.zeros((len(ngram_rows), len(attributes)), dtype=np.float32)
+        embedded_rows = [row for ngram, row in ngram_rows.items() if ngram in scraped_embeddings]
+        if embedded_rows and phrase_matrix is not None:
+            embedded_ngrams = [ngram for ngram in ngram_rows if ngram in scraped_embeddings]
+            similarities = normalize_rows(np.vstack([scraped_embeddings[ngram] for ngram in embedded_ngrams])) @ phrase_matrix.T
+            for column, attribute in enumerate(attributes):
+                if len(attribute_columns[attribute]):
+                    ngram_attribute_scores[embedded_rows, column] = similarities[:, attribute_columns[attribute]].max(axis=1)
+        if self.lexical_matcher and ngram_rows:
+            ngram_attribute_scores = np.maximum(ngram_attribute_scores, self.lexical_matcher.score(list(ngram_rows)))
+
+        if ngram_rows:
+            scored_items = [index for index, rows in enumerate(segments) if rows]
+            if scored_items:
+                lengths = [len(segments[index]) for index in scored_items]
+                offsets = np.concatenate(([0], np.cumsum(lengths[:-1]))).astype(np.int64)
+                flat_rows = np.concatenate([segments[index] for index in scored_items])
+                attribute_scores[scored_items] = np.maximum.reduceat(ngram_attribute_scores[flat_rows], offsets, axis=0)
+        attribute_scores[failed_items] = np.nan
+        UTIL_LOGGER.debug(f"Scored {len(items)} items against {len(attributes)} attributes ({len(ngram_rows)} distinct n-grams).")
+        # Scores start at 0 in the scalar path, so negative similarities never win.
+        return np.maximum(attribute_scores, 0)
+
+    def combine_scores(self, items: List[Tuple[str, List[str]]], attribute_scores: np.ndarray, name_scores: np.ndarray, attribute_threshold=0.0, name_similarity_weight=0.5) -> List[Optional[dict]]:
+        """
+        Apply `hybrid_similarity`'s threshold, attribute weights and name weighting to precomputed scores.
+        Items whose scores are NaN (they failed upstream) or that fail here get None and are skipped.
+        """
+        attributes = list(self.target_attributes)
+        passed_scores = np.where(attribute_scores >= attribute_threshold, attribute_scores, 0)
+        weights = np.array([self.attribute_weights[attribute] if attribute != 'name' else 0 for attribute in attributes], dtype=np.float32)
+        total_weight = sum(self.attribute_weights.values())
+
+        results = []
+        for index, (item_name, item_ingredients) in enumerate(items):
+            if np.isnan(attribute_scores[index]).any() or np.isnan(name_scores[index]):
+                UTIL_LOGGER.warning(f"Skipping item '{item_name}': it could not be scored.")
+                results.append(None)
+                continue
+            try:
+                item_attribute_scores = {attribute: float(score) for attribute, score in zip(attributes, attribute_scores[index])}
+                if not passed_scores[index].any() and item_ingredients:
+                    combined_score = 0.0
+                elif total_weight == 0:
+                    raise ValueError("Total attribute weight must be greater than zero.")
+                else:
+                    weighted_attribute_score = float(passed_scores[index] @ weights) / total_weight
+                    target_similarity_score = float(name_scores[index])
+                    if item_ingredients:
+                        combined_score = (target_similarity_score * name_similarity_weight) + \
+                                         (weighted_attribute_score * (1 - name_similarity_weight))
+                    else:
+                        combined_score = target_similarity_score
+            except Exception as e:
+                UTIL_LOGGER.error(f"Failed to process item '{item_name}': {e}")
+                results.append(None)
+                continue
+            results.append({
+                'scraped_item': item_name,
+                'ingredients': item_ingredients,
+                'combined_score': combined_score,
+                'attribute_scores': item_attribute_scores
+            })
+        return results
+
+
+class MultiProfileMatcher:
+    """
+    Scores menu items against several target profiles (each a `TARGET_ATTRIBUTES`-style dict) in one pass.
+
+    Target phrases and menu phrases are embedded once for all profiles. A combined matcher holding every
+    profile's attributes side by side scores all n-grams against all profiles' phrases in a single GEMM;
+    each profile's `ItemMatcher` then applies its own prefilter, weights and name scoring.
+    Results for each profile are the same as running that profile's `ItemMatcher` alone.
+    """
+    COLUMN_SEPARATOR = '\x1f'  # Joins profile and attribute names in the combined matcher.
+
+    def __init__(self, profiles: Dict[str, Dict[str, List[str]]], profile_weights: Dict[str, Dict[str, float]] = None, embedding_service: EmbeddingService = None):
+        UTIL_LOGGER.info(f"Initializing MultiProfileMatcher with profiles: {list(profiles)}")
+        self.embedding_service = embedding_service or get_embedding_service()
+        profile_weights = profile_weights or {}
+        self.matchers = {
+            profile: ItemMatcher(target_attributes, profile_weights.get(profile), embedding_service=self.embedding_service)
+            for profile, target_attributes in profiles.items()
+        }
+        self.combined = ItemMatcher(
+            {self._column(profile, attribute): phrases for profile, target_attributes in profiles.items() for attribute, phrases in target_attributes.items()},
+            embedding_service=self.embedding_service
+        )
+        combined_attributes = list(self.combined.target_attributes)
+        self.profile_columns = {
+            profile: np.array([combined_attributes.index(self._column(profile, attribute)) for attribute in target_attributes], dtype=np.int64)
+            for profile, target_attributes in profiles.items()
+        }
+
+    def _column(self, profile: str, attribute: str) -> str:
+        return f"{profile}{self.COLUMN_SEPARATOR}{attribute}"
+
+    async def precompute_attribute_embeddings(self):
+        """Embed every profile's target phrases in one request and share them with each profile's matcher."""
+        await self.combined.precompute_attribute_embeddings()
+        for matcher in self.matchers.values():
+            matcher.attribute_phrase_embeddings = self.combined.attribute_phrase_embeddings
+
+    async def run_hybrid_similarity_tests(self, scraped_items) -> Dict[str, List[dict]]:
+        """Score one menu book against every profile. Returns profile -> results."""
+        results = await self.run_batched_similarity_tests([scraped_items])
+        return {profile: profile_results[0] for profile, profile_results in results.items()}
+
+    async def run_batched_similarity_tests(self, menu_books: List[Dict[str, List[str]]]) -> Dict[str, List[List[dict]]]:
+        """Score several menu books against every profile. Returns profile -> one result list per menu book."""
+        UTIL_LOGGER.info(f"Starting multi-profile similarity tests for {len(self.matchers)} profiles and {len(menu_books)} menu books.")
+        if CANONICALIZE_MENU_ITEMS:
+            original_books = menu_books
+            menu_books, variants = canonicalize_menu_books(menu_books, MENU_CLUSTER_THRESHOLD)
+        try:
+            # Stage 1: item names, embedded once. A name needs an embedding unless it is an exact lexical match for every profile.
+            normalized_names = set(item_name.lower().strip() for menu_book in menu_books for item_name in menu_book)
+            normalized_names = [name for name in normalized_names if name]
+            needs_embedding = np.zeros(len(normalized_names), dtype=bool)
+            for matcher in self.matchers.values():
+                if matcher.lexical_matcher is None:
+                    needs_embedding[:] = True
+                    break
+                needs_embedding |= matcher.lexical_matcher.score_names(normalized_names) < 1.0
+            scraped_embeddings = await self.combined.get_phrase_embeddings([name for name, needed in zip(normalized_names, needs_embedding) if needed])
+
+            # Each profile keeps its own candidates; the union is scored once.
+            positions = {}  # (menu book, item name) -> row in `items`
+            items = []
+            profile_rows = {}
+            phrases = set()
+            for profile, matcher in self.matchers.items():
+                rows = []
+                for book_index, menu_book in enumerate(menu_books):
+                    item_names = list(menu_book)
+                    candidates = matcher.select_candidates(matcher.score_names(item_names, scraped_embeddings), MATCH_PREFILTER_TOP_K, MATCH_PREFILTER_NAME_THRESHOLD)
+                    for index in candidates:
+                        key = (book_index, item_names[index])
+                        if key not in positions:
+                            positions[key] = len(items)
+                            items.append((item_names[index], menu_book[item_names[index]]))
+                        rows.append(positions[key])
+                profile_rows[profile] = rows
+                phrases.update(matcher.phrases_to_embed([items[row] for row in rows]))
+                UTIL_LOGGER.info(f"Profile '{profile}': name prefilter kept {len(rows)} of {sum(len(book) for book in menu_books)} items.")
+
+            # Stage 2: every profile's n-grams in one embedding batch, and one GEMM across all profiles.
+            phrases.difference_update(scraped_embeddings)
+            scraped_embeddings.update(await self.combined.get_phrase_embeddings(list(phrases)))
+            attribute_scores = self.combined.item_attribute_scores(items, scraped_embeddings)
+
+            owners = {position: book_index for (book_index, _), position in positions.items()}
+            results = {}
+            for profile, matcher in self.matchers.items():
+                rows = profile_rows[profile]
+                profile_items = [items[row] for row in rows]
+                profile_results = matcher.combine_scores(
+                    profile_items,
+                    attribute_scores[np.array(rows, dtype=np.int64)][:, self.profile_columns[profile]] if rows else np.zeros((0, len(self.profile_columns[profile])), dtype=np.float32),
+                    matcher.score_names([item_name for item_name, _ in profile_items], scraped_embeddings)
+                )
+                results[profile] = [[] for _ in menu_books]
+                for row, result in zip(rows, profile_results):
+                    if result is not None:
+                        results[profile][owners[row]].append(result)
 
         except Exception as e:
-            UTIL_LOGGER.error(f"Error during hybrid similarity tests: {e}")
+            UTIL_LOGGER.error(f"Error during multi-profile similarity tests: {e}")
             raise e
 
-        UTIL_LOGGER.info("Completed hybrid similarity tests.")
+        if CANONICALIZE_MENU_ITEMS:
+            results = {
+                profile: [fan_out_results(book_results, book_variants, book) for book_results, book_variants, book in zip(profile_results, variants, original_books)]
+                for profile, profile_results in results.items()
+            }
+        UTIL_LOGGER.info("Completed multi-profile similarity tests.")
         return results
+
+
+def prefilter_recall(matcher: ItemMatcher, scraped_items: Dict[str, List[str]], scraped_embeddings, top_k: Optional[int], threshold: Optional[float], top_n: int = 10) -> float:
+    """
+    Fraction of the `top_n` best items under full scoring (those with a positive score) that the name
+    prefilter keeps. `scraped_embeddings` must cover every item's name and n-grams.
+    """
+    results = matcher.score_items(scraped_items, scraped_embeddings)
+    ranked = sorted((result for result in results if result['combined_score'] > 0), key=lambda result: result['combined_score'], reverse=True)[:top_n]
+    if not ranked:
+        return 1.0
+    item_names = list(scraped_items)
+    kept = {item_names[index] for index in matcher.select_candidates(matcher.score_names(item_names, scraped_embeddings), top_k, threshold)}
+    return sum(result['scraped_item'] in kept for result in ranked) / len(ranked)
+
+
+async def benchmark_item_matching(matcher: ItemMatcher, scraped_items: Dict[str, List[str]]) -> Dict[str, float]:
+    """
+    Score `scraped_items` with the per-item `hybrid_similarity` path and with `score_items`.
+    Reports items per second for each and the largest combined-score difference between them
+    (with the lexical stage off, since `hybrid_similarity` is embedding-only, and again with
+    USE_LEXICAL_MATCHING as configured), plus how many n-grams the lexical stage leaves to embed.
+    """
+    lexical_matcher, matcher.lexical_matcher = matcher.lexical_matcher, None
+    await matcher.precompute_attribute_embeddings()
+    phrases = [name.lower().strip() for name in scraped_items]
+    for ingredients in scraped_items.values():
+        phrases.extend(matcher.get_ngrams(ingredients))
+    scraped_embeddings = await matcher.get_phrase_embeddings(phrases)
+
+    start = time.perf_counter()
+    scalar_scores = [
+        (await matcher.hybrid_similarity(name, ingredients, scraped_embeddings))[0]
+        for name, ingredients in scraped_items.items()
+    ]
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched_scores = [result['combined_score'] for result in matcher.score_items(scraped_items, scraped_embeddings)]
+    batched_seconds = time.perf_counter() - start
+
+    matcher.lexical_matcher = lexical_matcher
+    configured_scores = [result['combined_score'] for result in matcher.score_items(scraped_items, scraped_embeddings)] if lexical_matcher else batched_scores
+    ngrams_to_embed = len(matcher.phrases_to_embed(list(scraped_items.items())))
+    matcher.lexical_matcher = None
+    ngrams_total = len(matcher.phrases_to_embed(list(scraped_items.items())))
+    matcher.lexical_matcher = lexical_matcher
+
+    candidates = matcher.select_candidates(matcher.score_names(list(scraped_items), scraped_embeddings), MATCH_PREFILTER_TOP_K, MATCH_PREFILTER_NAME_THRESHOLD)
+    return {
+        'items': len(scraped_items),
+        'prefilter_kept': len(candidates),
+        'ngrams_total': ngrams_total,
+        'ngrams_to_embed_after_lexical': ngrams_to_embed,
+        'prefilter_recall_top10': prefilter_recall(matcher, scraped_items, scraped_embeddings, MATCH_PREFILTER_TOP_K, MATCH_PREFILTER_NAME_THRESHOLD),
+        'scalar_items_per_second': len(scraped_items) / scalar_seconds if scalar_seconds else float('inf'),
+        'batched_items_per_second': len(scraped_items) / batched_seconds if batched_seconds else float('inf'),
+        'max_abs_difference': float(np.max(np.abs(np.array(scalar_scores) - np.array(batched_scores)))) if scalar_scores else 0.0,
+        'max_abs_difference_configured': float(np.max(np.abs(np.array(scalar_scores) - np.array(configured_scores)))) if scalar_scores else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    # Usage (from src/): python -m backend.itemmatcher ../_trees/example_trees_0.json [...]
+    # Embeds with the local "hashed_ngram" backend so the benchmark runs offline.
+    import sys
+    menu_book = {}
+    for path in sys.argv[1:]:
+        with open(path, 'r') as f:
+            for tree in json.load(f).values():
+                menu_book.update(tree.get('menu_book', {}))
+
+    async def main():
+        service = EmbeddingService(llm=LLM(embedding_backend='hashed_ngram'))
+        return await benchmark_item_matching(ItemMatcher(TARGET_ATTRIBUTES, embedding_service=service), menu_book)
+
+    report = asyncio.run(main())
+    print(report)
+    # With the default config the prefilter must keep every item that full scoring ranks in the top 10.
+    if report['prefilter_recall_top10'] < 1.0:
+        print(f"Prefilter recall {report['prefilter_recall_top10']:.2f} < 1.0 with MATCH_PREFILTER_TOP_K={MATCH_PREFILTER_TOP_K}, MATCH_PREFILTER_NAME_THRESHOLD={MATCH_PREFILTER_NAME_THRESHOLD}.")
+        sys.exit(1)
+    # With the default config the batched scores must match the per-item path.
+    if report['max_abs_difference_configured'] > 1e-5:
+        print(f"Batched scores differ from hybrid_similarity by {report['max_abs_difference_configured']:.6f} with USE_LEXICAL_MATCHING={USE_LEXICAL_MATCHING}.")
+        sys.exit(1)
@@ -0,0 +1,103 @@
+# lexicalmatcher.py
+
+from _utils._util import *
+
+from difflib import SequenceMatcher
+
+# Words that never identify a dish or ingredient on their own.
+STOPWORDS = {
+    'a', 'an', 'and', 'or', 'the', 'of', 'with', 'without', 'w', 'in', 'on', 'over', 'under', 'to', 'for',
+    'from', 'by', 'at', 'as', 'our', 'your', 'its', 'their', 'choice', 'side', 'served', 'topped', 'tossed',
+    'add', 'extra', 'made', 'house', 'style', 'plus', 'per', 'each', 'n/a', 'na', 'w/', '&',
+}
+
+NON_WORD = re.compile(r"[^\w\s'/&-]+")
+SPACES = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation other than word joiners, and collapse whitespace."""
+    return SPACES.sub(' ', NON_WORD.sub(' ', text.lower())).strip()
+
+
+def fold_word(word: str) -> str:
+    """Light stemming that folds common English plurals: berries -> berry, potatoes -> potato, beets -> beet."""
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'ches', 'shes', 'sses', 'xes')):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def fold_text(text: str) -> str:
+    return ' '.join(fold_word(word) for word in normalize_text(text).split())
+
+
+class LexicalMatcher:
+    """
+    String-level matching against target phrases, run before any embedding lookup.
+
+    Exact matches after normalization and plural folding score 1.0. Near-misses (misspellings such as
+    "cabage"/"cabbage") score their `SequenceMatcher` ratio when it reaches `fuzzy_threshold`.
+    Also prunes n-grams that cannot identify an ingredient, so they are never embedded.
+    """
+
+    def __init__(self, target_attributes: Dict[str, List[str]], fuzzy_threshold: float = 0.88):
+        self.attributes = list(target_attributes)
+        self.fuzzy_threshold = fuzzy_threshold
+        self.attribute_phrases = {
+            attribute: sorted({fold_text(phrase) for phrase in phrases if fold_text(phrase)})
+            for attribute, phrases in target_attributes.items()
+        }
+        self._scores = {}  # folded text -> per-attribute scores
+        UTIL_LOGGER.info(f"LexicalMatcher initialized for {len(self.attributes)} attributes with fuzzy_threshold={fuzzy_threshold}")
+
+    def is_prunable(self, ngram: str) -> bool:
+        """True for n-grams made only of stopwords/numbers, or that start or end with a stopword ("with beet", "beet and")."""
+        words = normalize_text(ngram).split()
+        if not words or all(word in STOPWORDS or not any(char.isalpha() for char in word) for word in words):
+            return True
+        return len(words) > 1 and (words[0] in STOPWORDS or words[-1] in STOPWORDS)
+
+    def prune_ngrams(self, ngrams: List[str]) -> List[str]:
+        return [ngram for ngram in ngrams if not self.is_prunable(ngram)]
+
+    def _phrase_score(self, folded: str, phrases: List[str]) -> float:
+        best = 0.0
+        for phrase in phrases:
+            if folded == phrase:
+                return 1.0
+            # Cheap length bound before the quadratic ratio: ratio <= 2 * min / (len_a + len_b).
+            if 2 * min(len(folded), len(phrase)) / (len(folded) + len(phrase)) < self.fuzzy_threshold:
+                continue
+            ratio = SequenceMatcher(None, folded, phrase).ratio()
+            if ratio >= self.fuzzy_threshold and ratio > best:
+                best = ratio
+        return best
+
+    def score_text(self, text: str) -> np.ndarray:
+        """Lexical similarity of one n-gram or name to each attribute's phrases (0 where nothing matches)."""
+        folded = fold_text(text)
+        if folded not in self._scores:
+            self._scores[folded] = np.array(
+                [self._phrase_score(folded, self.attribute_phrases[attribute]) if folded else 0.0 for attribute in self.attributes],
+                dtype=np.float32
+            )
+        return self._scores[folded]
+
+    def score(self, texts: List[str]) -> np.ndarray:
+        """(len(texts), len(attributes)) lexical similarity matrix."""
+        if not texts:
+            return np.zeros((0, len(self.attributes)), dtype=np.float32)
+        return np.vstack([self.score_text(text) for text in texts])
+
+    def score_names(self, names: List[str]) -> np.ndarray:
+        """Lexical similarity of each item name to the 'name' phrases."""
+        if 'name' not in self.attributes:
+            return np.zeros(len(names), dtype=np.float32)
+        column = self.attributes.index('name')
+        return np.array([self.score_text(name)[column] for name in names], dtype=np.float32)
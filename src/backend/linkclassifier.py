@@ -0,0 +1,174 @@
+# linkclassifier.py
+
+from _utils._util import *
+
+
+def link_features(url: str, anchor_text: str = '') -> List[str]:
+    """
+    Sparse features of a link: its path/query/fragment tokens (split as in `LLMHandler._extract_segments`,
+    plus query keys and values), its path depth, whether it has a query string or file extension, and the
+    words of its anchor text.
+    """
+    parsed_url = urlparse(url)
+    path_segments = [segment for segment in parsed_url.path.split('/') if segment]
+    components = path_segments + (parsed_url.query.split('&') if parsed_url.query else []) + (parsed_url.fragment.split('&') if parsed_url.fragment else [])
+    features = {f"tok:{token.lower()}" for component in components for token in re.split(r'[._=-]', component) if token}
+    features.add(f"depth:{min(len(path_segments), 5)}")
+    if parsed_url.query:
+        features.add('query')
+    if path_segments and '.' in path_segments[-1]:
+        features.add(f"ext:{path_segments[-1].rsplit('.', 1)[-1].lower()}")
+    features.update(f"anchor:{word}" for word in re.findall(r'\w+', anchor_text.lower()))
+    return sorted(features)
+
+
+def training_examples(trees: Dict[str, Any]) -> Tuple[List[str], List[str], List[int]]:
+    """
+    Links in `trees` as (urls, anchor texts, labels). Each followed link (every non-root node) is labelled 1 if
+    the page or any page below it yielded menu items, else 0. Links embedding relevance rejected are labelled 0;
+    links the classifier itself dropped are not recorded, so it never trains on its own decisions.
+    Root pages are chosen by the places lookup, not by link filtering.
+    """
+    urls, anchors, labels = [], [], []
+
+    def visit(node) -> bool:
+        yielded = bool(node.scraped_items)
+        link_anchors = node.link_anchors
+        for child in node.children:
+            child_yielded = visit(child)
+            urls.append(child.url)
+            # Children are created with their link as the descriptor; `url` may since have followed a redirect.
+            anchors.append(link_anchors.get(child.descriptor, link_anchors.get(child.url, '')))
+            labels.append(int(child_yielded))
+            yielded = yielded or child_yielded
+        for link in node.rejected_links:
+            urls.append(link)
+            anchors.append(link_anchors.get(link, ''))
+            labels.append(0)
+        return yielded
+
+    for tree in trees.values():
+        visit(tree)
+    return urls, anchors, labels
+
+
+class LinkClassifier:
+    """
+    Logistic regression over `link_features`, trained from crawl outcomes in historical trees.
+
+    Weights are learned by full-batch gradient descent with L2 regularization and class weights balanced
+    between the (rare) menu links and the rest. The model is a feature -> weight map stored as JSON.
+    """
+
+    def __init__(self, weights: Dict[str, float] = None, bias: float = 0.0):
+        self.weights = weights or {}
+        self.bias = bias
+
+    def _feature_rows(self, urls: List[str], anchors: List[str], vocabulary: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sparse binary feature matrix as (row, column) index pairs, one per feature present in a link.
+        Links have a handful of features out of thousands, so a dense matrix would be almost all zeros.
+        """
+        rows, columns = [], []
+        for row, (url, anchor_text) in enumerate(zip(urls, anchors)):
+            url_columns = [vocabulary[feature] for feature in link_features(url, anchor_text) if feature in vocabulary]
+            rows.extend([row] * len(url_columns))
+            columns.extend(url_columns)
+        return np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64)
+
+    def fit(self, urls: List[str], labels: List[int], anchors: List[str] = None, iterations: int = 300, learning_rate: float = 0.5, l2: float = 1e-3) -> 'LinkClassifier':
+        anchors = anchors or [''] * len(urls)
+        features = sorted({feature for url, anchor_text in zip(urls, anchors) for feature in link_features(url, anchor_text)})
+        vocabulary = {feature: column for column, feature in enumerate(features)}
+        rows, columns = self._feature_rows(urls, anchors, vocabulary)
+        y = np.array(labels, dtype=np.float32)
+        positives = max(float(y.sum()), 1.0)
+        negatives = max(float(len(y) - y.sum()), 1.0)
+        sample_weights = np.where(y == 1, len(y) / (2 * positives), len(y) / (2 * negatives)).astype(np.float32)
+
+        weights = np.zeros(len(features), dtype=np.float32)
+        bias = 0.0
+        for _ in range(iterations):
+            # x @ w sums each link's feature weights; x.T @ error sums each feature's links' errors.
+            logits = np.bincount(rows, weights=weights[columns], minlength=len(y)) + bias
+            probabilities = 1 / (1 + np.exp(-logits))
+            error = (probabilities - y) * sample_weights
+            gradient = np.bincount(columns, weights=error[rows], minlength=len(features))
+            weights -= (learning_rate * (gradient / len(y) + l2 * weights)).astype(np.float32)
+            bias -= learning_rate * float(error.mean())
+
+        self.weights = {feature: float(weight) for feature, weight in zip(features, weights) if weight != 0}
+        self.bias = bias
+        UTIL_LOGGER.info(f"Trained LinkClassifier on {len(urls)} links ({int(y.sum())} yielded menus) with {len(self.weights)} features.")
+        return self
+
+    def predict_proba(self, urls: List[str], anchors: List[str] = None) -> np.ndarray:
+        """Probability that following each link (with its anchor text, if given) leads to menu items."""
+        anchors = anchors or [''] * len(urls)
+        logits = np.array([self.bias + sum(self.weights.get(feature, 0.0) for feature in link_features(url, anchor_text)) for url, anchor_text in zip(urls, anchors)], dtype=np.float32)
+        return 1 / (1 + np.exp(-logits))
+
+    def known_features(self, url: str, anchor_text: str = '') -> int:
+        """Number of the link's features seen in training; links with none are left to the embedding path."""
+        return sum(feature in self.weights for feature in link_features(url, anchor_text) if not feature.startswith('depth:'))
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'bias': self.bias, 'weights': self.weights}, f)
+        os.replace(tmp_path, path)
+        UTIL_LOGGER.info(f"Saved LinkClassifier to {path}.")
+
+    @staticmethod
+    def load(path: str) -> Optional['LinkClassifier']:
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            UTIL_LOGGER.info(f"No link classifier found at {path}. Using embedding relevance only.")
+            return None
+        except (json.JSONDecodeError, OSError) as e:
+            UTIL_LOGGER.error(f"Failed to load link classifier from {path}: {e}. Using embedding relevance only.")
+            return None
+        return LinkClassifier(data.get('weights', {}), data.get('bias', 0.0))
+
+
+def train_link_classifier(trees: Dict[str, Any], path: str = None) -> Optional[LinkClassifier]:
+    """Fit and save a classifier from `trees`, or return None when there are too few examples of either outcome."""
+    path = path or LINK_CLASSIFIER_PATH
+    urls, anchors, labels = training_examples(trees)
+    positives = sum(labels)
+    if positives < LINK_CLASSIFIER_MIN_EXAMPLES or len(labels) - positives < LINK_CLASSIFIER_MIN_EXAMPLES:
+        UTIL_LOGGER.info(f"Not training LinkClassifier: {positives} menu links and {len(labels) - positives} others (need {LINK_CLASSIFIER_MIN_EXAMPLES} of each).")
+        return None
+    classifier = LinkClassifier().fit(urls, labels, anchors)
+    if path:
+        classifier.save(path)
+    return classifier
+
+
+if __name__ == "__main__":
+    # Usage (from src/): python -m backend.linkclassifier ../_trees/trees.json
+    # Trains on the first 80% of establishments and reports accuracy on the rest, then trains on everything and saves.
+    import sys
+    from _utils._webnode import WebNode
+    trees = {}
+    for tree_path in sys.argv[1:] or ['../_trees/trees.json']:
+        with open(tree_path, 'r') as f:
+            trees.update({key: WebNode.from_dict(value) for key, value in json.load(f).items()})
+
+    keys = sorted(trees)
+    split = int(len(keys) * 0.8)
+    train_urls, train_anchors, train_labels = training_examples({key: trees[key] for key in keys[:split]})
+    test_urls, test_anchors, test_labels = training_examples({key: trees[key] for key in keys[split:]})
+    if train_urls and test_urls and 0 < sum(train_labels) < len(train_labels):
+        predictions = LinkClassifier().fit(train_urls, train_labels, train_anchors).predict_proba(test_urls, test_anchors) >= 0.5
+        labels = np.array(test_labels, dtype=bool)
+        print({
+            'test_links': len(test_labels),
+            'accuracy': float((predictions == labels).mean()),
+            'menu_link_recall': float(predictions[labels].mean()) if labels.any() else None,
+            'links_skipped': float(1 - predictions.mean()),
+        })
+    train_link_classifier(trees)
@@ -2,20 +2,28 @@
 
 from _utils._util import *
 from _utils._llm import LLM
+from _utils._embeddings import normalize_rows
 from backend.cachemanager import CacheManager
+from backend.embeddingservice import get_embedding_service
+
+from hashlib import md5
+
+_KEYWORD_MATRICES = {}  # (embedding backend, keywords) -> normalized keyword matrix, shared by every LLMHandler.
+_SEGMENT_RELEVANCE = {}  # Segment cache namespace -> LRU of segment -> relevance, shared by every LLMHandler.
 
 class LLMHandler:
-    def __init__(self):
+    def __init__(self, cache_manager: CacheManager = None):
         UTIL_LOGGER.info("Initializing LLMHandler.")
+        self.cache_manager = cache_manager or CacheManager()
         try:
             self.llm = LLM()
             UTIL_LOGGER.info("LLM instance created successfully.")
         except Exception as e:
             UTIL_LOGGER.error(f"Failed to create LLM instance: {e}")
             raise
-        # Initialize CacheManager
-        self.cache_manager = CacheManager()
-        UTIL_LOGGER.info("Initialized CacheManager for embedding caching.")
+        # Embeddings are shared with the item matcher through the process-wide service.
+        self.embedding_service = get_embedding_service()
+        UTIL_LOGGER.info("Attached shared EmbeddingService.")
 
     async def extract_scraped_items(self, content, content_type='html'):
         UTIL_LOGGER.info(f"Starting extract_scraped_items with content_type: {content_type}.")
@@ -86,71 +94,105 @@ class LLMHandler:
             UTIL_LOGGER.error(f"Error in build_dict_from_llm_response: {e}")
             raise
 
-    async def find_url_relevance(self, urls: List[str]) -> List[Tuple[str, float]]:
+    async def find_url_relevance(self, urls: List[str]) -> List[Tuple[str, Optional[float]]]:
+        """
+        Relevance of each URL: the best cosine similarity between any of its segments and any of `TARGET_URL_KEYWORDS`.
+        Every distinct segment on the page is scored in one segment x keyword product, and a grouped max over
+        each URL's scored segment rows gives the URL scores. Segments that could not be embedded are skipped;
+        URLs with no scored segment at all get None.
+        """
         UTIL_LOGGER.info(f"Calculating URL relevance for {len(urls)} URLs.")
         try:
             if not urls:
                 UTIL_LOGGER.warning("No URLs provided to find_url_relevance.")
                 return []
 
-            # Extract all unique segments from URLs
-            unique_segments = self._extract_unique_segments(urls)
-            unique_segments.update(TARGET_URL_KEYWORDS)
-            UTIL_LOGGER.debug(f"Total unique segments to fetch embeddings for: {len(unique_segments)}")
-
-            # Retrieve embeddings with caching
-            segment_embeddings = await self._get_or_fetch_embeddings(list(unique_segments))
-            if not segment_embeddings:
-                UTIL_LOGGER.error("Failed to retrieve embeddings for URL segments.")
-                return []
+            url_segments = [self._extract_segments(url) for url in urls]
+            segment_scores = await self.segment_relevance(list({segment for segments in url_segments for segment in segments}))
 
-            # Extract keyword embeddings
-            keyword_embeddings = [segment_embeddings[kw] for kw in TARGET_URL_KEYWORDS if kw in segment_embeddings]
-            keyword_embeddings = np.array(keyword_embeddings)
+            # Grouped max: each URL's scored segments are one contiguous run of `flat_scores`.
+            url_rows = [[segment_scores[segment] for segment in segments if segment in segment_scores] for segments in url_segments]
+            scores = np.zeros(len(urls), dtype=np.float32)
+            scored_urls = [index for index, rows in enumerate(url_rows) if rows]
+            if scored_urls:
+                lengths = [len(url_rows[index]) for index in scored_urls]
+                offsets = np.concatenate(([0], np.cumsum(lengths[:-1]))).astype(np.int64)
+                flat_scores = np.array([score for index in scored_urls for score in url_rows[index]], dtype=np.float32)
+                scores[scored_urls] = np.maximum.reduceat(flat_scores, offsets)
 
             relevant_urls = []
-
-            for url in urls:
-                UTIL_LOGGER.debug(f"Processing URL: {url}")
-                segments = self._extract_segments(url)
-                UTIL_LOGGER.debug(f"Extracted segments: {segments}")
-
+            for url, segments, rows, score in zip(urls, url_segments, url_rows, scores):
                 if not segments:
-                    UTIL_LOGGER.warning(f"No valid segments found for URL: {url}. Assigning similarity 0.")
-                    relevant_urls.append((url, 0.0))
-                    continue
-
-                # Retrieve embeddings for the current URL's segments
-                current_embeddings = [
-                    segment_embeddings.get(seg) for seg in segments if segment_embeddings.get(seg) is not None
-                ]
-
-                if not current_embeddings:
-                    UTIL_LOGGER.warning(f"No embeddings found for segments of URL: {url}. Assigning similarity 0.")
-                    relevant_urls.append((url, 0.0))
+                    UTIL_LOGGER.debug(f"No valid segments found for URL: {url}. Assigning similarity 0.")
+                elif not rows:
+                    UTIL_LOGGER.debug(f"No embeddings found for any segment of URL: {url}. Leaving it unscored.")
+                    relevant_urls.append((url, None))
                     continue
-
-                # Calculate cosine similarities with keyword embeddings
-                similarities = cosine_similarity(current_embeddings, keyword_embeddings)
-                max_similarity = similarities.max() if similarities.size > 0 else 0.0
-
-                UTIL_LOGGER.debug(f"Max similarity for URL '{url}': {max_similarity}")
-
-                # Apply similarity threshold
-                if max_similarity >= SIMILARITY_THRESHOLD:
-                    relevant_urls.append((url, max_similarity))
-                    UTIL_LOGGER.info(f"URL '{url}' is relevant with similarity {max_similarity:.2f}.")
-                else:
-                    relevant_urls.append((url, max_similarity))
-                    UTIL_LOGGER.info(f"URL '{url}' is not relevant. Similarity {max_similarity:.2f} is below threshold.")
-
-            UTIL_LOGGER.info("Completed URL relevance calculation.")
+                elif len(rows) < len(segments):
+                    UTIL_LOGGER.debug(f"No embeddings found for {len(segments) - len(rows)} of {len(segments)} segments of URL: {url}. Scoring the rest.")
+                relevant_urls.append((url, float(score)))
+            UTIL_LOGGER.info(f"Completed URL relevance calculation: {int((scores >= SIMILARITY_THRESHOLD).sum())} of {len(urls)} URLs at or above threshold {SIMILARITY_THRESHOLD:.2f}.")
             return relevant_urls
 
         except Exception as e:
             UTIL_LOGGER.error(f"Error in find_url_relevance: {e}")
             raise
 
+    async def segment_relevance(self, segments: List[str]) -> Dict[str, float]:
+        """
+        Best cosine similarity of each segment to any URL keyword. Segments without an embedding are left out.
+
+        Scores come from the in-memory segment cache, then one bulk read of the persisted 'url_segment_relevance'
+        cache; only segments in neither are embedded, scored in one matrix product, and written to both (one bulk write).
+        """
+        segments = list(dict.fromkeys(segment for segment in segments if segment))
+        if not segments:
+            return {}
+        namespace = self._segment_namespace()
+        memory = _SEGMENT_RELEVANCE.setdefault(namespace, OrderedDict())
+        scores = {segment: memory[segment] for segment in segments if segment in memory}
+
+        missing = [segment for segment in segments if segment not in scores]
+        if missing:
+            persisted = self.cache_manager.get_many_cached_data('url_segment_relevance', [f"{namespace}|{segment}" for segment in missing])
+            scores.update({segment: persisted[f"{namespace}|{segment}"] for segment in missing if f"{namespace}|{segment}" in persisted})
+            missing = [segment for segment in missing if segment not in scores]
+        UTIL_LOGGER.debug(f"Segment relevance cache hits: {len(segments) - len(missing)}, misses: {len(missing)} out of {len(segments)} segments.")
+
+        if missing:
+            keyword_matrix = await self._keyword_matrix()
+            segment_embeddings = await self._get_or_fetch_embeddings(missing) if keyword_matrix is not None else {}
+            embedded = [segment for segment in missing if segment in segment_embeddings]
+            if embedded:
+                similarities = normalize_rows(np.vstack([segment_embeddings[segment] for segment in embedded])) @ keyword_matrix.T
+                new_scores = dict(zip(embedded, similarities.max(axis=1).tolist()))
+                scores.update(new_scores)
+                self.cache_manager.set_many_cached_data('url_segment_relevance', {f"{namespace}|{segment}": score for segment, score in new_scores.items()})
+
+        for segment, score in scores.items():
+            memory[segment] = score
+            memory.move_to_end(segment)
+        while len(memory) > URL_SEGMENT_CACHE_SIZE:
+            memory.popitem(last=False)
+        return scores
+
+    def _segment_namespace(self) -> str:
+        """Segment scores depend on the embedding backend and on `TARGET_URL_KEYWORDS`, so both key the cache."""
+        keywords = md5('\x1f'.join(TARGET_URL_KEYWORDS).encode('utf-8')).hexdigest()[:12]
+        return f"{self.embedding_service.llm.embedding_store_name}|{keywords}"
+
+    async def _keyword_matrix(self) -> Optional[np.ndarray]:
+        """Unit-normalized `TARGET_URL_KEYWORDS` embeddings, built once per process and embedding backend."""
+        key = (self.embedding_service.llm.embedding_store_name, tuple(TARGET_URL_KEYWORDS))
+        if key not in _KEYWORD_MATRICES:
+            keyword_embeddings = await self._get_or_fetch_embeddings(list(TARGET_URL_KEYWORDS))
+            vectors = [keyword_embeddings[keyword] for keyword in TARGET_URL_KEYWORDS if keyword in keyword_embeddings]
+            if not vectors:
+                UTIL_LOGGER.error("Failed to retrieve embeddings for TARGET_URL_KEYWORDS.")
+                return None
+            _KEYWORD_MATRICES[key] = normalize_rows(np.vstack(vectors))
+        return _KEYWORD_MATRICES[key]
+
     def _extract_unique_segments(self, urls: List[str]) -> set:
         """
         Extracts and returns a set of unique segments from a list of URLs.
@@ -183,47 +225,13 @@ class LLMHandler:
 
     async def _get_or_fetch_embeddings(self, phrases: List[str]) -> dict:
         """
-        Retrieves embeddings for a list of phrases using caching.
-        If a phrase is not found in the cache, fetches it from the LLM and caches it.
+        Retrieves embeddings for a list of phrases through the shared embedding service, which
+        caches them and coalesces concurrent requests with the item matcher.
         Returns a dictionary mapping phrases to their embeddings.
         """
         UTIL_LOGGER.debug(f"Fetching embeddings for {len(phrases)} unique phrases with caching.")
-        embeddings = {}
-        phrases_to_fetch = []
-        cache_hits = 0
-        cache_misses = 0
-
-        for phrase in phrases:
-            cached_embedding = self.cache_manager.get_cached_data('embedding_relevance', phrase)
-            if cached_embedding is not None:
-                try:
-                    embeddings[phrase] = np.array(cached_embedding, dtype=np.float32)
-                    cache_hits += 1
-                except (ValueError, TypeError) as e:
-                    UTIL_LOGGER.error(f"Error converting cached embedding for phrase '{phrase}': {e}. Fetching anew.")
-                    phrases_to_fetch.append(phrase)
-                    cache_misses += 1
-            else:
-                phrases_to_fetch.append(phrase)
-                cache_misses += 1
-
-        UTIL_LOGGER.debug(f"Cache hits: {cache_hits}, Cache misses: {cache_misses} out of {len(phrases)} unique phrases.")
-
-        if phrases_to_fetch:
-            UTIL_LOGGER.info(f"Fetching {len(phrases_to_fetch)} new embeddings from LLM.")
-            try:
-                new_embeddings = await self.llm.get_embeddings(phrases_to_fetch)
-                for phrase, embedding in zip(phrases_to_fetch, new_embeddings):
-                    embeddings[phrase] = np.array(embedding, dtype=np.float32)
-                    # Save to cache as a list to ensure JSON serialization
-                    self.cache_manager.set_cached_data(
-                        'embedding_relevance',
-                        phrase,
-                        embedding.tolist()
-                    )
-                UTIL_LOGGER.info(f"Fetched and cached {len(phrases_to_fetch)} new embeddings.")
-            except Exception as e:
-                UTIL_LOGGER.error(f"Error fetching embeddings from LLM: {e}")
-                raise e
-
-        return embeddings
\ No newline at end of file
+        try:
+            return await self.embedding_service.get_embeddings(phrases)
+        except Exception as e:
+            UTIL_LOGGER.error(f"Error fetching embeddings from LLM: {e}")
+            raise e
@@ -0,0 +1,238 @@
+# menucanonicalizer.py
+
+from _utils._util import *
+
+from backend.lexicalmatcher import fold_text
+
+from collections import Counter
+from difflib import SequenceMatcher
+
+# Portion and serving words that don't change which dish an item is: "borscht (cup)", "borscht - bowl".
+SERVING_WORDS = {
+    'cup', 'bowl', 'plate', 'small', 'medium', 'large', 'sm', 'md', 'lg', 'regular', 'reg', 'half', 'full',
+    'order', 'slice', 'piece', 'pc', 'pcs', 'pint', 'quart', 'oz', 'lb', 'single', 'double', 'mini', 'portion',
+}
+
+# Other spellings of the same word.
+TOKEN_ALIASES = {'w/': 'with', 'w': 'with', '&': 'and', 'n': 'and', "'n'": 'and'}
+
+# Words that change which dish an item is, however close their spelling is to another word.
+NEGATIONS = {'no', 'non', 'not', 'without', 'free', 'less'}
+
+# Origin and house-style qualifiers. A name may state one and a variant leave it out ("Ukrainian Borsh" /
+# "Borscht"), but names stating different ones ("Korean BBQ" / "Chinese BBQ") are different dishes.
+QUALIFIER_WORDS = {
+    'ukrainian', 'russian', 'polish', 'georgian', 'armenian', 'hungarian', 'romanian', 'lithuanian', 'belarusian',
+    'serbian', 'croatian', 'bulgarian', 'italian', 'sicilian', 'indian', 'korean', 'vietnamese', 'japanese',
+    'chinese', 'cantonese', 'lebanese', 'persian', 'jamaican', 'peruvian', 'brazilian', 'turkish', 'ethiopian',
+    'moroccan', 'classic', 'traditional', 'homemade', 'house', 'famous', 'original', 'signature', 'authentic',
+}
+
+
+def canonical_tokens(item_name: str) -> Tuple[str, ...]:
+    """
+    Sorted, plural-folded tokens of an item name without serving words or bare punctuation.
+    Every other word is kept, including negations ("without onions") and numbers ("combo 1").
+    """
+    tokens = (TOKEN_ALIASES.get(token, token) for token in fold_text(item_name).split())
+    return tuple(sorted(
+        token for token in tokens
+        if token not in SERVING_WORDS and any(char.isalnum() for char in token)
+    ))
+
+
+@lru_cache(maxsize=10000)
+def _is_qualifier(token: str, threshold: float) -> bool:
+    if token in QUALIFIER_WORDS:
+        return True
+    return token.isalpha() and len(token) > 3 and any(SequenceMatcher(None, token, word).ratio() >= threshold for word in QUALIFIER_WORDS)
+
+
+def split_qualifiers(tokens: Tuple[str, ...], threshold: float = 0.8) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """(core tokens, qualifier tokens) of a name, qualifiers matched allowing misspellings. A name that is all qualifiers is all core."""
+    qualifiers = tuple(token for token in tokens if _is_qualifier(token, threshold))
+    core = tuple(token for token in tokens if not _is_qualifier(token, threshold))
+    return (core, qualifiers) if core else (tokens, ())
+
+
+def tokens_match(a: Tuple[str, ...], b: Tuple[str, ...], threshold: float) -> bool:
+    """
+    True when both names have the same number of tokens and each pair, in sorted order, is equal or a close
+    misspelling. Numbers, negations and short words only ever match exactly.
+    """
+    if len(a) != len(b):
+        return False
+    for token_a, token_b in zip(a, b):
+        if token_a == token_b:
+            continue
+        if not (token_a.isalpha() and token_b.isalpha()) or token_a in NEGATIONS or token_b in NEGATIONS:
+            return False
+        if min(len(token_a), len(token_b)) <= 3 or SequenceMatcher(None, token_a, token_b).ratio() < threshold:
+            return False
+    return True
+
+
+def _item_tokens(name: str) -> set:
+    return set(canonical_tokens(name))
+
+
+def choose_representative(members: List[str], menu_book: Dict[str, List[str]] = None) -> str:
+    """
+    The spelling to report for a cluster. Ranked by, in order: how often its words appear in the rest of the
+    menu (other item names and all ingredients), so a correct spelling beats a repeated typo; how similar it
+    is to the other members; how often it occurs; and fewest extra characters (serving words, punctuation).
+    """
+    member_set = set(members)
+    support = Counter()
+    for name, ingredients in (menu_book or {}).items():
+        if name not in member_set:
+            support.update(_item_tokens(name))
+        for ingredient in ingredients:
+            support.update(_item_tokens(ingredient))
+    counts = Counter(name.lower().strip() for name in members)
+    keys = {name: ' '.join(canonical_tokens(name)) for name in members}
+
+    def rank(name: str):
+        similarity = sum(SequenceMatcher(None, keys[name], keys[other]).ratio() for other in members if other is not name)
+        return (sum(support[token] for token in set(canonical_tokens(name))), round(similarity, 6), counts[name.lower().strip()], -len(name))
+
+    return max(members, key=rank)
+
+
+def cluster_item_names(item_names: List[str], threshold: float = 0.8, menu_book: Dict[str, List[str]] = None) -> List[List[str]]:
+    """
+    Group surface variants of the same dish ("Ukrainian Borsh", "ukraninan borsh", "borscht (cup)" / "borscht - bowl").
+
+    Names whose canonical tokens are identical (so they differ only by case, punctuation, plurals or serving
+    words) share a cluster. Remaining clusters merge when their core tokens match pairwise within `threshold`
+    (see `tokens_match`), i.e. they differ only by misspellings, and their origin/style qualifiers don't
+    conflict (see `QUALIFIER_WORDS`). Candidates are blocked by core token count and first letters.
+    Names with no canonical tokens stay alone.
+    Each cluster lists its representative first (see `choose_representative`), then the rest in input order.
+    """
+    by_tokens = {}
+    singletons = []
+    for item_name in item_names:
+        tokens = canonical_tokens(item_name)
+        if tokens:
+            by_tokens.setdefault(tokens, []).append(item_name)
+        else:
+            singletons.append([item_name])
+
+    # Leader clustering within each block: each name joins the first cluster whose leader's core it matches,
+    # unless it states a qualifier that conflicts with the cluster's.
+    blocks = {}
+    for tokens in by_tokens:
+        core, qualifiers = split_qualifiers(tokens, threshold)
+        blocks.setdefault((len(core), ''.join(token[0] for token in core)), []).append((tokens, core, qualifiers))
+    clusters = []
+    for block in blocks.values():
+        leaders = []  # [leader core, cluster qualifiers, member names]
+        for tokens, core, qualifiers in block:
+            for leader in leaders:
+                leader_core, leader_qualifiers, members = leader
+                if not tokens_match(leader_core, core, threshold):
+                    continue
+                if qualifiers and leader_qualifiers and not tokens_match(leader_qualifiers, qualifiers, threshold):
+                    continue
+                members.extend(by_tokens[tokens])
+                leader[1] = leader_qualifiers or qualifiers
+                break
+            else:
+                leaders.append([core, qualifiers, list(by_tokens[tokens])])
+        clusters.extend(members for _, _, members in leaders)
+
+    result = []
+    for members in clusters + singletons:
+        representative = choose_representative(members, menu_book)
+        result.append([representative] + [name for name in members if name is not representative])
+    return result
+
+
+def canonicalize_menu_book(menu_book: Dict[str, List[str]], threshold: float = 0.8) -> Tuple[Dict[str, List[str]], Dict[str, dict]]:
+    """
+    Collapse a menu book to one item per cluster of name variants with the same ingredients.
+
+    Variants are only scored together when their ingredients are identical, so no variant gets a score
+    earned by another's ingredients. Returns (canonical menu book, scored name -> {'canonical': the cluster's
+    representative, 'names': the variants sharing that row}).
+    """
+    canonical_book = {}
+    variants = {}
+    for cluster in cluster_item_names(list(menu_book), threshold, menu_book):
+        representative = cluster[0]
+        groups = {}
+        for name in cluster:
+            groups.setdefault(tuple(sorted(set(menu_book[name]))), []).append(name)
+        for names in groups.values():
+            scored_name = names[0]  # The representative when it's in the group, as clusters list it first.
+            canonical_book[scored_name] = menu_book[scored_name]
+            variants[scored_name] = {'canonical': representative, 'names': names}
+    UTIL_LOGGER.debug(f"Canonicalized {len(menu_book)} menu items into {len(canonical_book)} scored items.")
+    return canonical_book, variants
+
+
+def canonicalize_menu_books(menu_books: List[Dict[str, List[str]]], threshold: float = 0.8) -> Tuple[List[Dict[str, List[str]]], List[Dict[str, dict]]]:
+    """`canonicalize_menu_book` for each book. Returns (canonical books, variants per book)."""
+    canonical = [canonicalize_menu_book(menu_book, threshold) for menu_book in menu_books]
+    UTIL_LOGGER.info(f"Canonicalized {sum(len(book) for book in menu_books)} menu items into {sum(len(book) for book, _ in canonical)} scored items.")
+    return [book for book, _ in canonical], [variants for _, variants in canonical]
+
+
+def fan_out_results(results: List[dict], variants: Dict[str, dict], menu_book: Dict[str, List[str]]) -> List[dict]:
+    """Copy each scored row to every variant sharing it, with the variant's own name and the cluster's representative in 'canonical_item'."""
+    fanned = []
+    for result in results:
+        entry = variants.get(result['scraped_item'], {'canonical': result['scraped_item'], 'names': [result['scraped_item']]})
+        for name in entry['names']:
+            fanned.append({
+                **result,
+                'scraped_item': name,
+                'ingredients': menu_book.get(name, result['ingredients']),
+                'canonical_item': entry['canonical'],
+            })
+    return fanned
+
+
+if __name__ == "__main__":
+    # Usage (from src/): python -m backend.menucanonicalizer
+    # Checks that spelling and portion variants merge, that different dishes stay apart, that each variant
+    # keeps its own ingredients, and that the correct spelling is reported over a repeated typo.
+    import sys
+    same_dish = [
+        ["ukraninan borsh", "Ukrainian Borsh", "borscht (cup)", "borscht - bowl", "Borscht"],
+        ["Pierogies", "pierogi"],
+        ["Chicken w/ Rice", "chicken with rice"],
+    ]
+    different_dishes = [
+        ["Burger with onions", "Burger without onions"],
+        ["Combo #1", "Combo #2"],
+        ["Beef Stew", "Beet Stew"],
+        ["Chicken Soup", "Chicken"],
+        ["Gluten Free Pancakes", "Pancakes"],
+        ["Latte", "No Latte"],
+        ["Korean BBQ", "Chinese BBQ"],
+        ["French Toast", "Toast"],
+    ]
+    failures = []
+    for names in same_dish:
+        if len(cluster_item_names(names)) != 1:
+            failures.append(f"should merge: {names} -> {cluster_item_names(names)}")
+    for names in different_dishes:
+        if len(cluster_item_names(names)) != len(names):
+            failures.append(f"should stay apart: {names} -> {cluster_item_names(names)}")
+
+    book = {"Borscht": ["beets", "sour cream"], "borscht (cup)": ["beets"], "borscht - bowl": ["beets"]}
+    canonical_book, variants = canonicalize_menu_book(book)
+    if sorted(canonical_book) != ["Borscht", "borscht (cup)"] or canonical_book["borscht (cup)"] != ["beets"]:
+        failures.append(f"variants should keep their own ingredients: {canonical_book}")
+    if {entry['canonical'] for entry in variants.values()} != {"Borscht"}:
+        failures.append(f"variants should share one canonical item: {variants}")
+
+    book = {"Ukraninan Borsh": [], "ukraninan borsh": [], "ukraninan borsh ": [], "Ukrainian Borsh": [], "Ukrainian Dumplings": ["potato"]}
+    representative = cluster_item_names(list(book), menu_book=book)[0][0]
+    if representative != "Ukrainian Borsh":
+        failures.append(f"representative should be the correct spelling, got {representative!r}")
+
+    print('\n'.join(failures) or f"OK: {len(same_dish)} variant groups merged, {len(different_dishes)} distinct-dish groups kept apart, ingredients and representatives checked.")
+    sys.exit(1 if failures else 0)
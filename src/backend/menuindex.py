@@ -0,0 +1,239 @@
+# menuindex.py
+
+from _utils._util import *
+from _utils._embeddings import normalize_rows
+
+from backend.embeddingservice import EmbeddingService, get_embedding_service
+
+import time
+
+
+def spherical_kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Cluster unit vectors by cosine similarity (Lloyd's algorithm with re-normalized centroids). Returns (k, dim) centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=k)
+        # Empty clusters keep their previous centroid.
+        centroids = np.where(counts[:, np.newaxis] > 0, sums, centroids)
+        centroids = normalize_rows(centroids)
+    return centroids
+
+
+class MenuItemIndex:
+    """
+    Persistent IVF (inverted file) index over one vector per scraped menu item, across every establishment.
+
+    Vectors are unit-normalized and partitioned by spherical k-means into about sqrt(n) lists. A query
+    scans only the `nprobe` lists whose centroids are closest to it. New items are assigned to the nearest
+    existing list, and the lists are retrained once the index has doubled since the last training.
+
+    Files in `directory`: items.jsonl (one record per row), vectors.npy, ivf.npz (centroids and assignments).
+    """
+    MIN_TRAIN_SIZE = 256  # Below this, queries scan every vector; it's already fast.
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.items_path = os.path.join(directory, 'items.jsonl')
+        self.vectors_path = os.path.join(directory, 'vectors.npy')
+        self.ivf_path = os.path.join(directory, 'ivf.npz')
+
+        self.items = []  # {'establishment', 'url', 'item', 'ingredients'} per row
+        self.keys = set()  # (establishment, item) already indexed
+        self.vectors = None
+        self.centroids = None
+        self.assignments = np.zeros(0, dtype=np.int64)
+        self.trained_size = 0
+        self._list_order = None  # Rows sorted by list, and each list's start offset within it.
+        self._list_offsets = None
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def load(self) -> None:
+        if not os.path.exists(self.items_path) or not os.path.exists(self.vectors_path):
+            UTIL_LOGGER.info(f"No menu index found at {self.directory}. Starting empty.")
+            return
+        with open(self.items_path, 'r', encoding='utf-8') as f:
+            self.items = [json.loads(line) for line in f if line.strip()]
+        self.keys = {(item['establishment'], item['item']) for item in self.items}
+        self.vectors = np.load(self.vectors_path)
+        if os.path.exists(self.ivf_path):
+            ivf = np.load(self.ivf_path)
+            self.centroids = ivf['centroids']
+            self.assignments = ivf['assignments']
+            self.trained_size = int(ivf['trained_size'])
+            self._build_lists()
+        UTIL_LOGGER.info(f"Loaded menu index with {len(self.items)} items from {self.directory}.")
+
+    def save(self) -> None:
+        """Write the index; each file is replaced atomically."""
+        if self.vectors is None:
+            return
+        tmp_items = f"{self.items_path}.tmp"
+        with open(tmp_items, 'w', encoding='utf-8') as f:
+            for item in self.items:
+                f.write(json.dumps(item, ensure_ascii=False) + '\n')
+        os.replace(tmp_items, self.items_path)
+        tmp_vectors = f"{self.vectors_path}.tmp.npy"
+        np.save(tmp_vectors, self.vectors)
+        os.replace(tmp_vectors, self.vectors_path)
+        if self.centroids is not None:
+            tmp_ivf = f"{self.ivf_path}.tmp.npz"
+            np.savez(tmp_ivf, centroids=self.centroids, assignments=self.assignments, trained_size=self.trained_size)
+            os.replace(tmp_ivf, self.ivf_path)
+        UTIL_LOGGER.info(f"Saved menu index with {len(self.items)} items to {self.directory}.")
+
+    def add(self, records: List[dict], vectors: np.ndarray) -> None:
+        """Append item records with their vectors. Items already indexed for the same establishment are skipped."""
+        vectors = normalize_rows(vectors)
+        new_rows = [index for index, record in enumerate(records) if (record['establishment'], record['item']) not in self.keys]
+        if not new_rows:
+            return
+        vectors = vectors[new_rows]
+        for index in new_rows:
+            self.items.append(records[index])
+            self.keys.add((records[index]['establishment'], records[index]['item']))
+        self.vectors = vectors if self.vectors is None else np.vstack([self.vectors, vectors])
+
+        if len(self.items) >= self.MIN_TRAIN_SIZE and len(self.items) >= 2 * self.trained_size:
+            self.train()
+        elif self.centroids is not None:
+            self.assignments = np.concatenate([self.assignments, np.argmax(vectors @ self.centroids.T, axis=1)])
+            self._build_lists()
+        UTIL_LOGGER.info(f"Added {len(new_rows)} items to the menu index ({len(self.items)} total).")
+
+    def train(self) -> None:
+        """(Re)partition every vector into about sqrt(n) inverted lists."""
+        start = time.perf_counter()
+        num_lists = max(1, int(np.sqrt(len(self.vectors))))
+        self.centroids = spherical_kmeans(self.vectors, num_lists)
+        self.assignments = np.argmax(self.vectors @ self.centroids.T, axis=1)
+        self.trained_size = len(self.vectors)
+        self._build_lists()
+        UTIL_LOGGER.info(f"Trained menu index: {num_lists} lists over {self.trained_size} items in {time.perf_counter() - start:.2f}s.")
+
+    def _build_lists(self) -> None:
+        self._list_order = np.argsort(self.assignments, kind='stable')
+        self._list_offsets = np.searchsorted(self.assignments[self._list_order], np.arange(len(self.centroids) + 1))
+
+    def _candidate_rows(self, queries: np.ndarray, nprobe: int) -> np.ndarray:
+        if self.centroids is None or nprobe >= len(self.centroids):
+            return np.arange(len(self.items))
+        probes = np.unique(np.argsort(-(queries @ self.centroids.T), axis=1)[:, :nprobe])
+        return np.concatenate([self._list_order[self._list_offsets[probe]:self._list_offsets[probe + 1]] for probe in probes])
+
+    def search(self, query_vectors: np.ndarray, k: int = 10, nprobe: int = 8) -> List[Tuple[int, float]]:
+        """Top-`k` (row, score) items by their best cosine similarity to any of the query vectors."""
+        if not self.items:
+            return []
+        queries = normalize_rows(query_vectors)
+        rows = self._candidate_rows(queries, nprobe)
+        scores = (self.vectors[rows] @ queries.T).max(axis=1)
+        top = np.argsort(-scores, kind='stable')[:k]
+        return [(int(rows[index]), float(scores[index])) for index in top]
+
+    def top_establishments(self, query_vectors: np.ndarray, k: int = 10, nprobe: int = 8, candidates_per_establishment: int = 20) -> List[dict]:
+        """Top-`k` establishments ranked by their best-matching item."""
+        best = {}
+        for row, score in self.search(query_vectors, k * candidates_per_establishment, nprobe):
+            item = self.items[row]
+            if item['establishment'] not in best:
+                best[item['establishment']] = {'establishment': item['establishment'], 'url': item['url'], 'item': item['item'], 'ingredients': item['ingredients'], 'score': score}
+                if len(best) == k:
+                    break
+        return list(best.values())
+
+
+def _normalized(phrases: List[str]) -> List[str]:
+    return [phrase.lower().strip() for phrase in phrases if phrase.lower().strip()]
+
+
+def combine_vectors(name_vectors: np.ndarray, ingredient_vectors: Optional[np.ndarray], name_weight: float = 0.5) -> np.ndarray:
+    """One vector per item (or query): its normalized name vector blended with the mean of its normalized ingredient vectors."""
+    name_vectors = normalize_rows(name_vectors)
+    if ingredient_vectors is None or len(ingredient_vectors) == 0:
+        return name_vectors
+    return normalize_rows(name_weight * name_vectors + (1 - name_weight) * normalize_rows(ingredient_vectors).mean(axis=0))
+
+
+async def update_menu_index(index: MenuItemIndex, trees: Dict[str, Any], embedding_service: EmbeddingService = None) -> None:
+    """Add every establishment's menu items (from the root node's aggregated menu book) to the index and save it."""
+    embedding_service = embedding_service or get_embedding_service()
+    records = []
+    for establishment, tree in trees.items():
+        for item_name, ingredients in tree.menu_book.items():
+            if (establishment, item_name) not in index.keys and _normalized([item_name]):
+                records.append({'establishment': establishment, 'url': tree.url, 'item': item_name, 'ingredients': sorted(ingredients)})
+    if not records:
+        return
+
+    # Item names and short ingredients are already cached from matching, so this is mostly cache hits.
+    phrases = set()
+    for record in records:
+        phrases.update(_normalized([record['item']] + record['ingredients']))
+    embeddings = await embedding_service.get_embeddings(list(phrases))
+
+    vectors = []
+    kept = []
+    for record in records:
+        name = _normalized([record['item']])[0]
+        if name not in embeddings:
+            continue
+        ingredients = [embeddings[phrase] for phrase in _normalized(record['ingredients']) if phrase in embeddings]
+        vectors.append(combine_vectors(embeddings[name], np.vstack(ingredients) if ingredients else None)[0])
+        kept.append(record)
+    if kept:
+        index.add(kept, np.vstack(vectors))
+        index.save()
+
+
+async def query_menu_index(index: MenuItemIndex, target_attributes: Dict[str, List[str]], k: int = 10, nprobe: int = MENU_INDEX_NPROBE, embedding_service: EmbeddingService = None) -> List[dict]:
+    """Top-`k` indexed establishments for a target profile, without crawling. One query vector per target name."""
+    embedding_service = embedding_service or get_embedding_service()
+    names = _normalized(target_attributes.get('name', []))
+    ingredients = _normalized([phrase for attribute, phrases in target_attributes.items() if attribute != 'name' for phrase in phrases])
+    embeddings = await embedding_service.get_embeddings(names + ingredients)
+    names = [name for name in names if name in embeddings]
+    if not names:
+        return []
+    ingredient_vectors = [embeddings[phrase] for phrase in ingredients if phrase in embeddings]
+    queries = combine_vectors(np.vstack([embeddings[name] for name in names]), np.vstack(ingredient_vectors) if ingredient_vectors else None)
+    return index.top_establishments(queries, k=k, nprobe=nprobe)
+
+
+_MENU_INDEX = None
+
+
+def get_menu_index() -> Optional[MenuItemIndex]:
+    """Return the process-wide menu index, or None if disabled in `_config.py`. One index per embedding backend/size."""
+    global _MENU_INDEX
+    if _MENU_INDEX is None and MENU_INDEX_DIR:
+        _MENU_INDEX = MenuItemIndex(os.path.join(MENU_INDEX_DIR, get_embedding_service().llm.embedding_store_name))
+    return _MENU_INDEX
+
+
+if __name__ == "__main__":
+    # Usage (from src/): python -m backend.menuindex [k]
+    # Ranks indexed establishments for TARGET_PROFILES (or TARGET_ATTRIBUTES) without crawling.
+    import sys
+    k = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    async def main():
+        index = get_menu_index()
+        if index is None:
+            print("MENU_INDEX_DIR is disabled in _config.py.")
+            return
+        for profile, target_attributes in (TARGET_PROFILES or {'default': TARGET_ATTRIBUTES}).items():
+            start = time.perf_counter()
+            results = await query_menu_index(index, target_attributes, k=k)
+            print(f"{profile} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+            for result in results:
+                print(f"  {result['score']:.3f}  {result['item']}  {result['url']}")
+
+    asyncio.run(main())
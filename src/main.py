@@ -2,7 +2,9 @@
 
 from _utils._util import *
 from _utils import _webnode
-from backend import itemmatcher, placeslocator
+from _utils._llm import get_llm_utilization
+from _utils._seenfilter import save_skip_filters
+from backend import itemmatcher, linkclassifier, menuindex, placeslocator
 from web import webscraper, webcrawler
 import pandas as pd
 
@@ -45,7 +47,7 @@ def initialize_components() -> tuple:
         scraper=scraper,
         max_concurrency=MAX_CONCURRENCY
     )
-    scraped_item_matcher = itemmatcher.ItemMatcher(TARGET_ATTRIBUTES)
+    scraped_item_matcher = itemmatcher.MultiProfileMatcher(TARGET_PROFILES or {'default': TARGET_ATTRIBUTES})
     return place_locator, scraper, crawler, scraped_item_matcher
 
 async def search_establishments(
@@ -61,16 +63,34 @@ async def search_establishments(
     )
     return place_locator.search_establishments_nearby(address, keyword, establishment_type, lookup_radius)
 
+def append_results(aggregated_results: Dict[str, list], website_link: str, establishment_url: str, results: Dict[str, List[dict]]) -> None:
+    """Add one establishment's matching results to each profile's result rows."""
+    for profile, profile_results in results.items():
+        for result in profile_results:
+            aggregated_results.setdefault(profile, []).append({
+                'google_url': f"'{website_link}'",
+                'establishment_url': f"'{establishment_url}'",
+                'scraped_item': result.get('scraped_item'),
+                'canonical_item': result.get('canonical_item', result.get('scraped_item')),
+                'ingredients': ', '.join(result.get('ingredients', [])),
+                'combined_score': result.get('combined_score'),
+                'attribute_scores': result.get('attribute_scores')
+            })
+
 async def process_establishment(
     establishment: Dict[str, Any],
     place_locator: placeslocator.PlaceLocator,
     scraper: webscraper.WebScraper,
     crawler: webcrawler.WebCrawler,
-    scraped_item_matcher: itemmatcher.ItemMatcher,
+    scraped_item_matcher: itemmatcher.MultiProfileMatcher,
     trees: Dict[str, _webnode.WebNode],
-    aggregated_results: list,
+    aggregated_results: Dict[str, list],
+    pending_matches: Optional[list] = None,
 ) -> None:
-    """Process a single establishment: fetch, crawl, parse, and aggregate results."""
+    """
+    Process a single establishment: fetch, crawl, parse, and aggregate results.
+    With `pending_matches`, the menu book is queued there for end-of-run matching instead of matched now.
+    """
     place_id = establishment['place_id']
     website_link = place_locator.get_google_places_url(place_id)
 
@@ -89,17 +109,11 @@ async def process_establishment(
 
             if tree and len(tree.menu_book) > 0:
                 UTIL_LOGGER.debug(f"Menu items found: {len(tree.menu_book)}")
-                results = await scraped_item_matcher.run_hybrid_similarity_tests(tree.menu_book)
-
-                for result in results:
-                    aggregated_results.append({
-                        'google_url': f"'{website_link}'",
-                        'establishment_url': f"'{establishment_url}'",
-                        'scraped_item': result.get('scraped_item'),
-                        'ingredients': ', '.join(result.get('ingredients', [])),
-                        'combined_score': result.get('combined_score'),
-                        'attribute_scores': result.get('attribute_scores')
-                    })
+                if pending_matches is not None:
+                    pending_matches.append((website_link, establishment_url, tree.menu_book))
+                else:
+                    results = await scraped_item_matcher.run_hybrid_similarity_tests(tree.menu_book)
+                    append_results(aggregated_results, website_link, establishment_url, results)
 
             trees[place_id] = tree
             UTIL_LOGGER.debug(f"Tree constructed and added with place_id: {place_id}")
@@ -108,15 +122,50 @@ async def process_establishment(
     else:
         UTIL_LOGGER.warning("No source link available.")
 
-async def save_aggregated_results(aggregated_results: list) -> None:
-    """Save aggregated results to a CSV file."""
-    if aggregated_results:
-        df = pd.DataFrame(aggregated_results)
+    UTIL_LOGGER.info(f"LLM utilization after {establishment['name']}: {get_llm_utilization()}")
+
+async def match_pending_menus(
+    scraped_item_matcher: itemmatcher.MultiProfileMatcher,
+    pending_matches: list,
+    aggregated_results: Dict[str, list],
+) -> None:
+    """
+    Match every queued menu book in one batch. If the batch fails, fall back to matching each book on its own,
+    so one bad menu only loses that establishment's results.
+    """
+    try:
+        results_per_menu = await scraped_item_matcher.run_batched_similarity_tests(
+            [menu_book for _, _, menu_book in pending_matches]
+        )
+    except Exception as e:
+        UTIL_LOGGER.error(f"Error matching menu items for {len(pending_matches)} establishments in one batch: {e}. Matching each establishment separately.")
+        for website_link, establishment_url, menu_book in pending_matches:
+            try:
+                results = await scraped_item_matcher.run_hybrid_similarity_tests(menu_book)
+            except Exception as e:
+                UTIL_LOGGER.error(f"Error matching menu items for {establishment_url}: {e}")
+                continue
+            append_results(aggregated_results, website_link, establishment_url, results)
+        return
+
+    for menu_index, (website_link, establishment_url, _) in enumerate(pending_matches):
+        append_results(
+            aggregated_results, website_link, establishment_url,
+            {profile: profile_results[menu_index] for profile, profile_results in results_per_menu.items()}
+        )
+
+async def save_aggregated_results(aggregated_results: Dict[str, list]) -> None:
+    """Save aggregated results to a CSV file: ../results.csv, or ../results_<profile>.csv per profile with TARGET_PROFILES."""
+    for profile, profile_results in aggregated_results.items():
+        if not profile_results:
+            continue
+        filepath = f'../results_{profile}.csv' if TARGET_PROFILES else '../results.csv'
+        df = pd.DataFrame(profile_results)
         df.sort_values(by='combined_score', ascending=False, inplace=True)
         try:
-            df.to_csv('../results.csv', index=False)
+            df.to_csv(filepath, index=False)
             UTIL_LOGGER.info(
-                f"Aggregated results saved to ../results.csv with {len(df)} records."
+                f"Aggregated results saved to {filepath} with {len(df)} records."
             )
         except Exception as e:
             UTIL_LOGGER.error(f"Failed to save aggregated results to CSV: {e}")
@@ -131,7 +180,8 @@ async def build_and_parse_tree(
     await scraped_item_matcher.precompute_attribute_embeddings()
 
     trees: Dict[str, _webnode.WebNode] = {}
-    aggregated_results: list = []
+    aggregated_results: Dict[str, list] = {}
+    pending_matches: Optional[list] = [] if MATCH_AT_END_OF_RUN else None
 
     UTIL_LOGGER.debug(f"Processing keyword: {SEARCH_REQUEST}")
     try:
@@ -154,12 +204,21 @@ async def build_and_parse_tree(
                 scraped_item_matcher,
                 trees,
                 aggregated_results,
+                pending_matches,
             )
         else:
             UTIL_LOGGER.warning(f"No establishment found for keyword: {SEARCH_REQUEST}.")
     except Exception as e:
         UTIL_LOGGER.error(f"Error processing keyword: {SEARCH_REQUEST}: {e}")
 
+    try:
+        # Match every establishment's menu together: shared phrases are embedded once for the whole run
+        if pending_matches:
+            await match_pending_menus(scraped_item_matcher, pending_matches, aggregated_results)
+    finally:
+        # Release the browser and HTTP sessions; the LLM pool is recreated if later steps embed again
+        await scraper.close()
+
     # Update old trees with new ones
     old_trees.update(trees)
     UTIL_LOGGER.info(f"Total trees after update: {len(old_trees)}")
@@ -184,6 +243,24 @@ async def main() -> None:
     # Save updated trees
     await save_trees(updated_trees)
 
+    # Remember dead and irrelevant links per domain for the next run
+    save_skip_filters()
+
+    # Relearn which links lead to menus from every crawl so far
+    if LINK_CLASSIFIER_PATH:
+        try:
+            linkclassifier.train_link_classifier(updated_trees)
+        except Exception as e:
+            UTIL_LOGGER.error(f"Failed to train the link classifier: {e}")
+
+    # Index the new menu items so later queries don't need a crawl
+    index = menuindex.get_menu_index()
+    if index is not None:
+        try:
+            await menuindex.update_menu_index(index, updated_trees)
+        except Exception as e:
+            UTIL_LOGGER.error(f"Failed to update the menu index: {e}")
+
 if __name__ == "__main__":
     try:
         asyncio.run(main())
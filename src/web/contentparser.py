@@ -1,18 +1,145 @@
 # contentparser.py
 from _utils._util import *
 
-from io import BytesIO
-import pdfplumber
+from _utils._processpool import PROCESS_POOL
+from .htmldocument import HTMLDocument, extract_html_views
+from .pdfextractor import PDFExtractor
+
+class MenuLineExtractor:
+    """
+    Deterministic extractor for regularly formatted menu lines, e.g.
+    `Name ........ $12` or `Name – ingredient, ingredient 12`.
+    """
+    # One price format for every pattern: "$12", "12.50" and bare "12" are all prices at the end of a line.
+    PRICE = r"\$?\s?\d{1,4}(?:[.,]\d{1,2})?"
+    LEADER_LINE = re.compile(rf"^(?P<name>[^\d$].*?)\s*(?:\.{{2,}}|…+|_{{2,}})\s*(?P<price>{PRICE})\s*$")
+    SEPARATOR_LINE = re.compile(rf"^(?P<name>[^\d$][^–—:|]*?)\s*(?:\s[–—-]\s|:|\|)\s*(?P<description>.+?)\s+(?P<price>{PRICE})\s*$")
+    PRICED_LINE = re.compile(rf"^(?P<name>[^\d$].*?)\s+(?P<price>{PRICE})\s*$")
+    TRAILING_PRICE = re.compile(rf"(?:^|[\s.…_])(?P<price>{PRICE})\s*$")
+    NUMERIC_TOKEN = re.compile(r"[\d()+./:-]+|[–—]")  # A bare number after one of these is a phone number, time or range, not a price.
+    INGREDIENT_SPLIT = re.compile(r",|;|\||\band\b|\bwith\b")
+    # Labels of contact and service lines ("Hours: Mon - Fri 11 - 9", "Gift card: $25") that are never menu items.
+    INFO_LABELS = {
+        'hours', 'hour', 'open', 'closed', 'phone', 'tel', 'telephone', 'fax', 'call', 'text', 'address', 'email',
+        'location', 'directions', 'parking', 'delivery', 'pickup', 'takeout', 'catering', 'gift', 'reservations',
+        'reservation', 'contact', 'follow', 'order', 'minimum', 'tax', 'tip', 'gratuity', 'fee', 'fees', 'copyright',
+    }
+
+    MAX_LINE_LENGTH = 200
+    MAX_NAME_WORDS = 8
+    MENU_DENSITY = 0.3  # Share of priced lines at which a page counts as fully menu-like.
+
+    def extract(self, text: str) -> Tuple[Dict[str, List[str]], float]:
+        """
+        Parse menu lines into an item -> ingredients dict.
+
+        Returns:
+            Tuple[Dict[str, List[str]], float]: The items and a confidence score in [0, 1].
+        """
+        if not text:
+            return {}, 0.0
+
+        lines = [line.strip() for line in text.splitlines()]
+        lines = [line for line in lines if line and len(line) <= self.MAX_LINE_LENGTH]
+        if not lines:
+            return {}, 0.0
+
+        items = {}
+        matched_lines = 0
+        priced_lines = 0
+        pending_item = None  # Item parsed without ingredients; the next line may describe it.
+
+        for line in lines:
+            has_price = self._has_price(line)
+            priced_lines += has_price
+
+            # Every pattern ends in a price, so only priced lines can match; coverage is matched / priced lines.
+            parsed = self._parse_line(line) if has_price else None
+            if parsed:
+                name, ingredients = parsed
+                items.setdefault(name, [])
+                items[name].extend(ingredient for ingredient in ingredients if ingredient not in items[name])
+                matched_lines += 1
+                pending_item = None if ingredients else name
+                continue
+
+            if pending_item and not has_price and ',' in line:
+                items[pending_item].extend(self._split_ingredients(line))
+            pending_item = None
+
+        if len(items) < RULE_EXTRACT_MIN_ITEMS or priced_lines == 0:
+            UTIL_LOGGER.debug(f"Rule-based extraction found {len(items)} items; not enough to be trusted.")
+            return items, 0.0
+
+        coverage = min(1.0, matched_lines / priced_lines)
+        density = min(1.0, (priced_lines / len(lines)) / self.MENU_DENSITY)
+        confidence = coverage * density
+        UTIL_LOGGER.debug(
+            f"Rule-based extraction: {len(items)} items, coverage={coverage:.2f}, density={density:.2f}, confidence={confidence:.2f}"
+        )
+        return items, confidence
+
+    def _has_price(self, line: str) -> bool:
+        """
+        True if the line ends in a price. "$" or decimal prices always count; a bare integer only counts when
+        it doesn't follow another number, time or dash, as in phone numbers and opening hours.
+        """
+        match = self.TRAILING_PRICE.search(line)
+        if not match:
+            return False
+        price = match.group('price')
+        if '$' in price or re.search(r"[.,]\d", price):
+            return True
+        previous = line[:match.start('price')].split()
+        previous = previous[-1].rstrip('.…_') if previous else ''
+        return not previous or not self.NUMERIC_TOKEN.fullmatch(previous)
+
+    def _parse_line(self, line: str) -> Optional[Tuple[str, List[str]]]:
+        for pattern in (self.LEADER_LINE, self.SEPARATOR_LINE, self.PRICED_LINE):
+            match = pattern.match(line)
+            if not match:
+                continue
+            name = self._clean(match.group('name'))
+            if not name or len(name.split()) > self.MAX_NAME_WORDS:
+                continue
+            if name.split()[0] in self.INFO_LABELS:
+                return None
+            description = match.groupdict().get('description')
+            return name, self._split_ingredients(description) if description else []
+        return None
+
+    def _split_ingredients(self, description: str) -> List[str]:
+        ingredients = [self._clean(part) for part in self.INGREDIENT_SPLIT.split(description)]
+        return [ingredient for ingredient in ingredients if ingredient]
+
+    @staticmethod
+    def _clean(text: str) -> str:
+        """Lowercase and strip numbers, prices, and punctuation, matching the LLM's output format. Letters in any script are kept."""
+        text = re.sub(r"[^\w\s'&/-]|[\d_]", ' ', text.lower())
+        return ' '.join(text.replace(' - ', ' ').split()).strip(" -/&'")
+
 
 class ContentParser:
     def __init__(self):
+        self.menu_line_extractor = MenuLineExtractor()
+        self.pdf_extractor = PDFExtractor(backend=PDF_BACKEND, max_pages=PDF_MAX_PAGES, max_chars=PDF_MAX_CHARS)
         UTIL_LOGGER.info("ContentParser initialized.")
 
-    def parse_content(self, content, content_type='html'):
+    def extract_menu_items(self, text: str) -> Tuple[Dict[str, List[str]], float]:
+        """Run the rule-based menu line extractor over parsed text. Returns (items, confidence)."""
+        try:
+            items, confidence = self.menu_line_extractor.extract(text)
+            UTIL_LOGGER.info(f"Rule-based extraction found {len(items)} items with confidence {confidence:.2f}.")
+            return items, confidence
+        except Exception as e:
+            UTIL_LOGGER.error(f"Rule-based extraction failed: {e}")
+            return {}, 0.0
+
+    async def parse_content(self, content, content_type='html'):
         UTIL_LOGGER.info(f"Parsing content of type: {content_type}")
         if content_type == 'html':
             try:
-                result = self.parse_html(content)
+                result = await self.parse_html(content)
                 UTIL_LOGGER.info("HTML content parsed successfully.")
                 return result
             except Exception as e:
@@ -20,7 +147,7 @@ class ContentParser:
                 return None
         elif content_type == 'pdf':
             try:
-                result = self.parse_pdf_content(content)
+                result = await self.parse_pdf_content(content)
                 UTIL_LOGGER.info("PDF content parsed successfully.")
                 return result
             except Exception as e:
@@ -30,47 +157,87 @@ class ContentParser:
             UTIL_LOGGER.warning(f"Unsupported content type received: {content_type}")
             return None
 
-    def parse_html(self, html_content):
+    async def parse_html(self, html_content):
         """Filter and parse HTML content."""
         UTIL_LOGGER.debug("Starting HTML parsing.")
-        filtered_content = self.filter_html_for_menu(html_content)
+        filtered_content = await self.filter_html_for_menu(html_content)
         UTIL_LOGGER.debug("HTML content filtered for menu.")
         return filtered_content
 
-    def parse_pdf_content(self, pdf_bytes):
-        """Parse PDF content."""
+    async def parse_pdf_content(self, pdf_bytes):
+        """Parse PDF content in parallel across the process pool."""
         UTIL_LOGGER.debug("Starting PDF parsing.")
         try:
-            with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
-                num_pages = len(pdf.pages)
-                UTIL_LOGGER.info(f"Number of pages in PDF: {num_pages}")
-                text = ''
-                for i, page in enumerate(pdf.pages, start=1):
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text
-                        UTIL_LOGGER.debug(f"Extracted text from page {i}.")
-                    else:
-                        UTIL_LOGGER.warning(f"No text found on page {i}.")
+            text = await self.pdf_extractor.extract(pdf_bytes)
             UTIL_LOGGER.info("Completed PDF parsing.")
             return text
         except Exception as e:
             UTIL_LOGGER.error(f"Error while parsing PDF: {e};\n{pdf_bytes[:1000]}")
             raise
 
-    def filter_html_for_menu(self, html):
-        """Filter HTML content to extract text for menu items."""
+    async def filter_html_for_menu(self, html):
+        """Filter HTML content (raw or an already parsed `HTMLDocument`) to extract text for menu items."""
         UTIL_LOGGER.debug("Starting HTML filtering for menu items.")
         try:
-            soup = BeautifulSoup(html, 'html.parser')
-            if soup:
-                # Extract text content while preserving the text between tags
-                filtered_text = soup.get_text(separator=' ', strip=True)
+            if isinstance(html, HTMLDocument):
+                document = html
+            else:
+                links, text = await PROCESS_POOL.run(extract_html_views, html)
+                document = HTMLDocument.from_views(html, links, text)
+            # Extract text content while preserving the text between tags, one block per line
+            filtered_text = document.get_text()
+            if filtered_text:
                 UTIL_LOGGER.info("HTML content filtered successfully.")
                 return filtered_text
             else:
-                UTIL_LOGGER.warning("No <body> tag found in the HTML.")
-                return "No <body> tag found in the HTML"
+                UTIL_LOGGER.warning("No text found in the HTML.")
+                return "No text found in the HTML"
         except Exception as e:
             UTIL_LOGGER.error(f"Error while filtering HTML: {e}")
             raise
+
+
+def check_rule_extraction() -> List[str]:
+    """
+    Confidence checks for `MenuLineExtractor`: a "Name – ingredient, ingredient 12" menu with bare integer
+    prices must be trusted, and a contact page with a couple of prices must not. Returns the failures.
+    """
+    extractor = MenuLineExtractor()
+    failures = []
+
+    menu = "\n".join([
+        "Soups",
+        "Borscht – beets, cabbage, dill 9",
+        "Solyanka – smoked meats, pickles, olives 11",
+        "Mains",
+        "Varenyky – potato, fried onions 12",
+        "Holubtsi – cabbage, pork, rice 14",
+        "Chicken Kyiv – chicken breast, garlic butter 18",
+    ])
+    items, confidence = extractor.extract(menu)
+    if confidence < RULE_EXTRACT_CONFIDENCE_THRESHOLD:
+        failures.append(f"integer-priced menu: confidence {confidence:.2f} is below {RULE_EXTRACT_CONFIDENCE_THRESHOLD}")
+    if sorted(items) != ['borscht', 'chicken kyiv', 'holubtsi', 'solyanka', 'varenyky']:
+        failures.append(f"integer-priced menu: extracted {sorted(items)}")
+
+    contact_page = "\n".join([
+        "Contact Us",
+        "Hours: Mon - Fri 11 - 9",
+        "Phone: (312) 555 0199",
+        "Address: 123 Main St, Chicago IL 60601",
+        "Delivery: Mon - Sun after 5",
+        "Gift card: $25",
+        "Catering from $150",
+    ])
+    items, confidence = extractor.extract(contact_page)
+    if confidence >= RULE_EXTRACT_CONFIDENCE_THRESHOLD:
+        failures.append(f"contact page: confidence {confidence:.2f} would skip the LLM with items {sorted(items)}")
+    return failures
+
+
+if __name__ == "__main__":
+    # Usage (from src/): python -m web.contentparser
+    import sys
+    failures = check_rule_extraction()
+    print('\n'.join(failures) or "OK: rule-based extraction confidence checks passed.")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,135 @@
+# htmldocument.py
+from _utils._util import *
+
+import time
+
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    import lxml  # noqa: F401  (only needed as a BeautifulSoup backend)
+    BS4_BACKEND = 'lxml'
+except ImportError:
+    BS4_BACKEND = 'html.parser'
+
+
+class HTMLDocument:
+    """
+    A fetched page parsed once and shared by link extraction and text extraction.
+    Uses selectolax when installed, otherwise BeautifulSoup with the fastest available backend.
+    """
+    STRIPPED_TAGS = ['script', 'style', 'noscript', 'template', 'svg']
+    ANCHOR_TEXT = '#text'  # Key of an anchor's visible text in `get_links`; '#' cannot start an attribute name.
+
+    def __init__(self, html_content: str, backend: Optional[str] = None):
+        self.html_content = html_content or ''
+        self.backend = backend or ('selectolax' if HTMLParser else BS4_BACKEND)
+        self._tree = None
+        self._links = None
+        self._text = None
+        UTIL_LOGGER.debug(f"HTMLDocument created with backend '{self.backend}' ({len(self.html_content)} chars).")
+
+    @classmethod
+    def from_views(cls, html_content: str, links: List[Dict[str, str]], text: str) -> 'HTMLDocument':
+        """Build a document from links and text already extracted elsewhere (e.g. in a worker process)."""
+        document = cls(html_content)
+        document._links = links
+        document._text = text
+        return document
+
+    @property
+    def tree(self):
+        """Parse the document on first access."""
+        if self._tree is None:
+            if self.backend == 'selectolax':
+                self._tree = HTMLParser(self.html_content)
+            else:
+                self._tree = BeautifulSoup(self.html_content, self.backend)
+        return self._tree
+
+    def get_links(self) -> List[Dict[str, str]]:
+        """Return the attributes of every anchor with an href, plus its text under `ANCHOR_TEXT`, in document order."""
+        if self._links is None:
+            if self.backend == 'selectolax':
+                self._links = [
+                    {**{key: value or '' for key, value in node.attributes.items()}, self.ANCHOR_TEXT: node.text(separator=' ', strip=True)}
+                    for node in self.tree.css('a[href]')
+                ]
+            else:
+                self._links = [
+                    {**{key: ' '.join(value) if isinstance(value, list) else value for key, value in a.attrs.items()}, self.ANCHOR_TEXT: a.get_text(separator=' ', strip=True)}
+                    for a in self.tree.find_all('a', href=True)
+                ]
+        return self._links
+
+    def find_link(self, attrs: Dict[str, str]) -> Optional[str]:
+        """Return the href of the first anchor whose attributes include all of `attrs`."""
+        for link in self.get_links():
+            if all(link.get(key) == value for key, value in attrs.items()) and link.get('href'):
+                return link['href']
+        return None
+
+    def get_text(self) -> str:
+        """Return the visible text, one block per line, with scripts and styles removed."""
+        if self._text is None:
+            # Links are read before stripping so both views come from the same parse.
+            self.get_links()
+            if self.backend == 'selectolax':
+                self.tree.strip_tags(self.STRIPPED_TAGS)
+                root = self.tree.body or self.tree.root
+                text = root.text(separator='\n', strip=True) if root else ''
+                self._text = '\n'.join(line for line in text.splitlines() if line.strip())
+            else:
+                for element in self.tree(self.STRIPPED_TAGS):
+                    element.decompose()
+                self._text = self.tree.get_text(separator='\n', strip=True)
+        return self._text
+
+
+def extract_html_views(html_content: str) -> Tuple[List[Dict[str, str]], str]:
+    """Parse a page once and return its (links, text). Runs in the process pool."""
+    document = HTMLDocument(html_content)
+    return document.get_links(), document.get_text()
+
+
+def benchmark_backends(html_content: str, repeats: int = 20) -> Dict[str, float]:
+    """
+    Time a full parse + link + text extraction per backend, against the old approach of
+    parsing the page separately for each consumer with 'html.parser'.
+
+    Returns:
+        Dict[str, float]: Backend -> mean seconds per page.
+    """
+    results = {}
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        BeautifulSoup(html_content, 'html.parser').find_all('a', href=True)
+        BeautifulSoup(html_content, 'html.parser').find('a', {'data-item-id': 'menu'})
+        BeautifulSoup(html_content, 'html.parser').get_text(separator=' ', strip=True)
+    results['html.parser (3 parses)'] = (time.perf_counter() - start) / repeats
+
+    backends = ['html.parser', BS4_BACKEND] + (['selectolax'] if HTMLParser else [])
+    for backend in OrderedDict.fromkeys(backends):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            document = HTMLDocument(html_content, backend=backend)
+            document.find_link({'data-item-id': 'menu'})
+            document.get_text()
+        results[backend] = (time.perf_counter() - start) / repeats
+
+    return results
+
+
+if __name__ == "__main__":
+    # Usage (from src/): python -m web.htmldocument page.html [page.html ...]
+    import sys
+    for path in sys.argv[1:]:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            timings = benchmark_backends(f.read())
+        baseline = timings['html.parser (3 parses)']
+        print(path)
+        for backend, seconds in timings.items():
+            print(f"  {backend:<24} {seconds * 1000:8.2f} ms/page  ({baseline / seconds:5.1f}x)")
@@ -0,0 +1,165 @@
+# pdfextractor.py
+from _utils._util import *
+from _utils._processpool import PROCESS_POOL
+
+import time
+from io import BytesIO
+
+import pdfplumber
+
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+
+def available_pdf_backends() -> List[str]:
+    """Return the installed PDF text backends, fastest first."""
+    backends = []
+    if pypdfium2:
+        backends.append('pypdfium2')
+    if fitz:
+        backends.append('pymupdf')
+    backends.append('pdfplumber')
+    return backends
+
+
+def count_pdf_pages(pdf_bytes: bytes, backend: str) -> int:
+    """Return the number of pages in a PDF. Runs in the process pool."""
+    if backend == 'pypdfium2':
+        pdf = pypdfium2.PdfDocument(pdf_bytes)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    if backend == 'pymupdf':
+        with fitz.open(stream=pdf_bytes, filetype='pdf') as pdf:
+            return pdf.page_count
+    with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+        return len(pdf.pages)
+
+
+def extract_pdf_pages(pdf_bytes: bytes, page_numbers: List[int], backend: str) -> List[str]:
+    """
+    Extract the text of the given (0-based) pages with the given backend. Runs in the process pool.
+    `pypdfium2` and `pymupdf` extract plain text only; `pdfplumber` runs its slower layout analysis.
+    """
+    texts = []
+    if backend == 'pypdfium2':
+        pdf = pypdfium2.PdfDocument(pdf_bytes)
+        try:
+            for page_number in page_numbers:
+                page = pdf[page_number]
+                text_page = page.get_textpage()
+                texts.append(text_page.get_text_range() or '')
+                text_page.close()
+                page.close()
+        finally:
+            pdf.close()
+    elif backend == 'pymupdf':
+        with fitz.open(stream=pdf_bytes, filetype='pdf') as pdf:
+            for page_number in page_numbers:
+                texts.append(pdf.load_page(page_number).get_text('text') or '')
+    else:
+        with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+            for page_number in page_numbers:
+                texts.append(pdf.pages[page_number].extract_text() or '')
+    return texts
+
+
+class PDFExtractor:
+    """
+    Extracts PDF text in parallel page ranges across the process pool, within a page and character budget.
+    """
+
+    def __init__(self, backend: str = 'pypdfium2', max_pages: Optional[int] = None, max_chars: Optional[int] = None, pages_per_task: int = 4):
+        installed = available_pdf_backends()
+        if backend not in installed:
+            UTIL_LOGGER.warning(f"PDF backend '{backend}' is not installed. Falling back to '{installed[0]}'.")
+            backend = installed[0]
+        self.backend = backend
+        self.max_pages = max_pages
+        self.max_chars = max_chars
+        self.pages_per_task = max(1, pages_per_task)
+        UTIL_LOGGER.info(
+            f"PDFExtractor initialized with backend={self.backend}, max_pages={self.max_pages}, "
+            f"max_chars={self.max_chars}, pages_per_task={self.pages_per_task}"
+        )
+
+    async def extract(self, pdf_bytes: bytes) -> str:
+        """Extract text from a PDF, stopping once the page or character budget is spent."""
+        num_pages = await PROCESS_POOL.run(count_pdf_pages, pdf_bytes, self.backend)
+        page_limit = min(num_pages, self.max_pages) if self.max_pages else num_pages
+        UTIL_LOGGER.info(f"Number of pages in PDF: {num_pages}; extracting up to {page_limit}.")
+
+        page_texts = []
+        total_chars = 0
+        wave_size = self.pages_per_task * max(1, PROCESS_POOL.max_workers)
+
+        # Extract in waves so the character budget can stop work before every page is read.
+        for wave_start in range(0, page_limit, wave_size):
+            wave_pages = list(range(wave_start, min(wave_start + wave_size, page_limit)))
+            chunks = [wave_pages[i:i + self.pages_per_task] for i in range(0, len(wave_pages), self.pages_per_task)]
+            results = await asyncio.gather(*[
+                PROCESS_POOL.run(extract_pdf_pages, pdf_bytes, chunk, self.backend) for chunk in chunks
+            ])
+
+            for chunk, chunk_texts in zip(chunks, results):
+                for page_number, page_text in zip(chunk, chunk_texts):
+                    if page_text.strip():
+                        page_texts.append(page_text)
+                        total_chars += len(page_text)
+                        UTIL_LOGGER.debug(f"Extracted text from page {page_number + 1}.")
+                    else:
+                        UTIL_LOGGER.warning(f"No text found on page {page_number + 1}.")
+
+            if self.max_chars and total_chars >= self.max_chars:
+                UTIL_LOGGER.info(f"PDF character budget of {self.max_chars} reached after page {wave_pages[-1] + 1}.")
+                break
+
+        text = '\n'.join(page_texts)
+        return text[:self.max_chars] if self.max_chars else text
+
+
+def benchmark_pdf_backends(pdf_bytes: bytes, repeats: int = 3) -> Dict[str, float]:
+    """
+    Time sequential full-document extraction per installed backend, plus the parallel
+    `PDFExtractor` path for each, without page or character limits.
+
+    Returns:
+        Dict[str, float]: Label -> mean seconds per document.
+    """
+    results = {}
+    num_pages = count_pdf_pages(pdf_bytes, 'pdfplumber')
+
+    for backend in available_pdf_backends():
+        start = time.perf_counter()
+        for _ in range(repeats):
+            extract_pdf_pages(pdf_bytes, list(range(num_pages)), backend)
+        results[f"{backend} (sequential)"] = (time.perf_counter() - start) / repeats
+
+        extractor = PDFExtractor(backend=backend)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            asyncio.run(extractor.extract(pdf_bytes))
+        results[f"{backend} (parallel)"] = (time.perf_counter() - start) / repeats
+
+    PROCESS_POOL.shutdown()
+    return results
+
+
+if __name__ == "__main__":
+    # Usage (from src/): python -m web.pdfextractor menu.pdf [menu.pdf ...]
+    import sys
+    for path in sys.argv[1:]:
+        with open(path, 'rb') as f:
+            timings = benchmark_pdf_backends(f.read())
+        baseline = timings['pdfplumber (sequential)']
+        print(path)
+        for label, seconds in timings.items():
+            print(f"  {label:<28} {seconds * 1000:9.2f} ms/doc  ({baseline / seconds:5.1f}x)")
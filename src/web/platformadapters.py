@@ -0,0 +1,300 @@
+# platformadapters.py
+from _utils._util import *
+
+from .htmldocument import BS4_BACKEND
+
+from backend.lexicalmatcher import STOPWORDS
+
+# Portions and prices in item names: "(6 pc)", "(2)", "$12", "12 oz". Numbers that name an item ("Combo #1") are kept.
+PORTION_IN_NAME = re.compile(r"\([^)]*\d[^)]*\)|\$\s?\d+(?:[.,]\d+)?|\b\d+(?:[.,]\d+)?\s*(?:pcs?|pieces?|ct|count|oz|lbs?|pack)\b", re.IGNORECASE)
+# Preparation and serving words in descriptions that name no ingredient: "dumplings filled with potato; served with ...".
+FILLER_WORDS = STOPWORDS | {
+    'filled', 'stuffed', 'served', 'topped', 'garnished', 'drizzled', 'finished', 'dressed', 'sprinkled',
+    'loaded', 'smothered', 'accompanied', 'alongside', 'comes', 'come', 'includes', 'including', 'available',
+}
+
+
+class PlatformAdapter:
+    """
+    Base adapter for hosted menu platforms. Subclasses declare the hosts they serve
+    and how menu items are laid out in the raw (un-rendered) page.
+    """
+    name = 'generic'
+    host_patterns: List[str] = []
+    item_selectors: List[str] = []  # CSS selectors for a single menu item container.
+    name_selectors: List[str] = []  # CSS selectors (relative to the item) for the item name.
+    description_selectors: List[str] = []  # CSS selectors (relative to the item) for the item description.
+    state_variables: List[str] = []  # Embedded JS state objects holding menu data, e.g. `window.__APOLLO_STATE__`.
+    item_typenames: List[str] = ['MenuItem']  # `__typename` values marking menu items in embedded state.
+
+    def __init__(self):
+        self._host_regexes = [re.compile(pattern, re.IGNORECASE) for pattern in self.host_patterns]
+        UTIL_LOGGER.debug(f"PlatformAdapter '{self.name}' initialized with host patterns: {self.host_patterns}")
+
+    def matches(self, url: str) -> bool:
+        """Check if the URL is hosted on this adapter's platform."""
+        host = urlparse(url).netloc.lower()
+        return any(regex.search(host) for regex in self._host_regexes)
+
+    def get_menu_url(self, url: str) -> str:
+        """Return the URL that serves the raw menu markup for the given page."""
+        return url
+
+    async def fetch(self, url: str, timeout: float, session: aiohttp.ClientSession) -> Optional[str]:
+        """Fetch the raw page without rendering it in a browser, over the registry's shared `session`."""
+        menu_url = self.get_menu_url(url)
+        UTIL_LOGGER.info(f"[{self.name}] Fetching raw menu page: {menu_url}")
+        try:
+            async with session.get(menu_url, headers=get_anonymous_headers(), timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                if response.status == 200:
+                    return await response.text()
+                UTIL_LOGGER.warning(f"[{self.name}] Failed to fetch {menu_url}. Status: {response.status}")
+                return None
+        except Exception as e:
+            UTIL_LOGGER.error(f"[{self.name}] Error fetching {menu_url}: {e}")
+            return None
+
+    def extract_items(self, html_content: str) -> Dict[str, List[str]]:
+        """
+        Extract menu items from the raw page. Tries structured data first (JSON-LD, then
+        embedded JS state) and falls back to the platform's markup selectors.
+
+        Returns:
+            Dict[str, List[str]]: Item name -> ingredients, in the same shape as `LLMHandler.extract_scraped_items`.
+        """
+        if not html_content:
+            return {}
+        soup = BeautifulSoup(html_content, BS4_BACKEND)
+
+        items = self._extract_json_ld_items(soup)
+        if not items:
+            items = self._extract_state_items(html_content)
+        if not items:
+            items = self._extract_markup_items(soup)
+
+        UTIL_LOGGER.info(f"[{self.name}] Extracted {len(items)} menu items.")
+        return items
+
+    def _extract_json_ld_items(self, soup) -> Dict[str, List[str]]:
+        """Extract schema.org `MenuItem`/`Product` entries from JSON-LD blocks."""
+        items = {}
+        for script in soup.find_all('script', type='application/ld+json'):
+            try:
+                data = json.loads(script.string or '')
+            except (json.JSONDecodeError, TypeError):
+                continue
+            for entry in self._walk_json(data):
+                if not isinstance(entry, dict):
+                    continue
+                entry_type = entry.get('@type')
+                entry_types = entry_type if isinstance(entry_type, list) else [entry_type]
+                if 'MenuItem' in entry_types or 'Product' in entry_types:
+                    self._add_item(items, entry.get('name'), entry.get('description'))
+        return items
+
+    def _extract_state_items(self, html_content: str) -> Dict[str, List[str]]:
+        """Extract menu items from embedded JS state objects."""
+        items = {}
+        for variable in self.state_variables:
+            match = re.search(rf"{re.escape(variable)}\s*=\s*(\{{.*?\}})\s*;?\s*</script>", html_content, re.DOTALL)
+            if not match:
+                continue
+            try:
+                data = json.loads(match.group(1))
+            except json.JSONDecodeError as e:
+                UTIL_LOGGER.warning(f"[{self.name}] Failed to decode embedded state '{variable}': {e}")
+                continue
+            for entry in self._walk_json(data):
+                if isinstance(entry, dict) and entry.get('__typename') in self.item_typenames:
+                    self._add_item(items, entry.get('name'), entry.get('description'))
+        return items
+
+    def _extract_markup_items(self, soup) -> Dict[str, List[str]]:
+        """Extract menu items from the platform's HTML markup."""
+        items = {}
+        for item_selector in self.item_selectors:
+            for element in soup.select(item_selector):
+                name = self._select_text(element, self.name_selectors)
+                description = self._select_text(element, self.description_selectors)
+                self._add_item(items, name, description)
+            if items:
+                break
+        return items
+
+    @staticmethod
+    def _select_text(element, selectors: List[str]) -> Optional[str]:
+        for selector in selectors:
+            found = element.select_one(selector)
+            if found:
+                text = found.get_text(separator=' ', strip=True)
+                if text:
+                    return text
+        return None
+
+    @staticmethod
+    def _walk_json(data):
+        """Yield every dict/list node of a decoded JSON document."""
+        stack = [data]
+        while stack:
+            node = stack.pop()
+            yield node
+            if isinstance(node, dict):
+                stack.extend(node.values())
+            elif isinstance(node, list):
+                stack.extend(node)
+
+    @staticmethod
+    def _split_description(description: Optional[str]) -> List[str]:
+        """
+        Split a free-text item description into ingredient phrases, on punctuation, "&", "and", "with" and "or".
+        Prices, quantities and filler words ("served", "topped", stopwords) are dropped.
+        """
+        if not description:
+            return []
+        description = re.sub(r"\$?\d+(?:[.,]\d+)?", ' ', description.lower())
+        parts = re.split(r",|;|\||/|&|\+|\band\b|\bwith\b|\bor\b|\.", description)
+        ingredients = []
+        for part in parts:
+            words = [word for word in re.sub(r"[^\w\s'-]", ' ', part).split() if word.strip("'-") and word not in FILLER_WORDS]
+            if words and ' '.join(words) not in ingredients:
+                ingredients.append(' '.join(words))
+        return ingredients
+
+    @staticmethod
+    def _clean_name(name: str) -> str:
+        """Lowercase an item name and drop its portion and price ("Potato Varenyky (6 pc)" -> "potato varenyky")."""
+        name = PORTION_IN_NAME.sub(' ', name.lower())
+        return ' '.join(re.sub(r"[^\w\s'&#-]", ' ', name).split()).strip(" -&'")
+
+    def _add_item(self, items: Dict[str, List[str]], name: Optional[str], description: Optional[str]) -> None:
+        if not isinstance(name, str):
+            return
+        name = self._clean_name(name)
+        if not name:
+            return
+        ingredients = self._split_description(description if isinstance(description, str) else None)
+        existing = items.setdefault(name, [])
+        existing.extend(ingredient for ingredient in ingredients if ingredient not in existing)
+
+
+class SinglePlatformAdapter(PlatformAdapter):
+    name = 'singleplatform'
+    host_patterns = [r"(^|\.)singleplatform\.(com|co)$"]
+    item_selectors = ['div.menu-body div.item', 'div.item', 'li.item']
+    name_selectors = ['.item-title', 'h4', '.title']
+    description_selectors = ['.description', '.item-description']
+
+
+class ToastAdapter(PlatformAdapter):
+    name = 'toast'
+    host_patterns = [r"(^|\.)toasttab\.com$"]
+    state_variables = ['window.__APOLLO_STATE__', 'window.__OO_STATE__']
+    item_typenames = ['MenuItem', 'MenuItemV2']
+    item_selectors = ['[data-testid="menu-item-card"]', 'li.item']
+    name_selectors = ['[data-testid="menu-item-name"]', '.itemName', 'h3']
+    description_selectors = ['[data-testid="menu-item-description"]', '.itemDescription', 'p']
+
+
+class SquareAdapter(PlatformAdapter):
+    name = 'square'
+    host_patterns = [r"(^|\.)square\.site$", r"(^|\.)squareup\.com$"]
+    state_variables = ['window.__BOOTSTRAP_STATE__']
+    item_typenames = ['Item', 'CatalogItem']
+    item_selectors = ['.w-product', '[data-testid="product-card"]']
+    name_selectors = ['.w-product-title', '[data-testid="product-name"]', 'h3']
+    description_selectors = ['.w-product-description', '[data-testid="product-description"]', 'p']
+
+
+class PopmenuAdapter(PlatformAdapter):
+    name = 'popmenu'
+    host_patterns = [r"(^|\.)popmenu\.com$"]
+    state_variables = ['window.POPMENU_APOLLO_STATE', 'window.__APOLLO_STATE__']
+    item_typenames = ['Dish', 'MenuItem']
+    item_selectors = ['.pm-menu-item', 'div[class*="menuItem"]']
+    name_selectors = ['h4', '[class*="itemName"]']
+    description_selectors = ['p', '[class*="itemDescription"]']
+
+
+def extract_platform_items(adapter_class: type, html_content: str) -> Dict[str, List[str]]:
+    """`extract_items` with a fresh adapter of `adapter_class`. Module-level so it can be sent to the process pool."""
+    return adapter_class().extract_items(html_content)
+
+
+class PlatformAdapterRegistry:
+    """Registry of platform adapters, looked up by the URL's host. Owns the HTTP session adapters fetch with."""
+
+    DEFAULT_ADAPTERS = [SinglePlatformAdapter, ToastAdapter, SquareAdapter, PopmenuAdapter]
+
+    def __init__(self, adapters: Optional[List[PlatformAdapter]] = None):
+        self.adapters = adapters if adapters is not None else [adapter() for adapter in self.DEFAULT_ADAPTERS]
+        self._session = None
+        UTIL_LOGGER.info(f"PlatformAdapterRegistry initialized with adapters: {[adapter.name for adapter in self.adapters]}")
+
+    def session(self) -> aiohttp.ClientSession:
+        """The session shared by every adapter fetch, created on first use so its connections are reused."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def register(self, adapter: PlatformAdapter) -> None:
+        """Register an adapter. Later registrations take precedence over earlier ones."""
+        if not isinstance(adapter, PlatformAdapter):
+            UTIL_LOGGER.error(f"Attempted to register a non-PlatformAdapter: {adapter}")
+            raise TypeError("adapter must be an instance of PlatformAdapter")
+        self.adapters.insert(0, adapter)
+        UTIL_LOGGER.info(f"Registered platform adapter: {adapter.name}")
+
+    def find_adapter(self, url: str) -> Optional[PlatformAdapter]:
+        """Return the adapter serving the URL's host, if any."""
+        if not url:
+            return None
+        for adapter in self.adapters:
+            if adapter.matches(url):
+                UTIL_LOGGER.debug(f"Platform adapter '{adapter.name}' matched URL: {url}")
+                return adapter
+        return None
+
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'platforms')
+
+
+def check_adapter_fixtures(fixture_dir: str = FIXTURE_DIR) -> Dict[str, List[str]]:
+    """
+    Run each adapter over its saved page in `fixture_dir` and compare with expected.json.
+    Returns adapter name -> problems found (empty when the adapter extracted exactly the expected items).
+    """
+    with open(os.path.join(fixture_dir, 'expected.json'), 'r', encoding='utf-8') as f:
+        expected = json.load(f)
+    registry = PlatformAdapterRegistry()
+    problems = {}
+    for name, case in expected.items():
+        adapter = registry.find_adapter(case['url'])
+        if adapter is None or adapter.name != name:
+            problems[name] = [f"{case['url']} matched adapter {adapter.name if adapter else None}"]
+            continue
+        with open(os.path.join(fixture_dir, case['fixture']), 'r', encoding='utf-8') as f:
+            items = adapter.extract_items(f.read())
+        problems[name] = [f"missing item: {item}" for item in case['items'] if item not in items]
+        problems[name] += [f"unexpected item: {item}" for item in items if item not in case['items']]
+        problems[name] += [
+            f"{item}: got {items[item]}, expected {ingredients}"
+            for item, ingredients in case['items'].items() if item in items and items[item] != ingredients
+        ]
+    return problems
+
+
+if __name__ == "__main__":
+    # Usage (from src/): python -m web.platformadapters
+    # Checks every adapter against the saved platform pages in web/fixtures/platforms.
+    import sys
+    problems = check_adapter_fixtures()
+    for name, adapter_problems in problems.items():
+        print(f"{name}: {'OK' if not adapter_problems else 'FAILED'}")
+        for problem in adapter_problems:
+            print(f"  {problem}")
+    sys.exit(1 if any(problems.values()) else 0)
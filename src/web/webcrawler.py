@@ -1,5 +1,6 @@
 # webcrawler.py
 from _utils._util import *
+from _utils._seenfilter import SeenURLFilter, record_fetch_failure, record_fetch_success
 from _utils._webnode import WebNode
 
 from .webscraper import WebScraper
@@ -10,9 +11,8 @@ from rich.console import Console
 class WebCrawler:
     def __init__(self, scraper=None, max_concurrency=8, webpage_timeout=10000):
         self.scraper = WebScraper(webpage_timeout=webpage_timeout) if not scraper else scraper
-        self.visited_urls = set()
+        self.visited_urls = SeenURLFilter(VISITED_FILTER_CAPACITY)  # Checked and updated without awaits, so no lock is needed.
         self.console = Console()
-        self.visited_lock = asyncio.Lock()  # Lock to ensure exclusive access to visited_urls
         self.node_lock = asyncio.Lock()     # Lock to ensure exclusive node handling
         self.semaphore = asyncio.Semaphore(max_concurrency)  # Limit concurrent fetches
         self.root_normalized_url = None     # To store the normalized root URL
@@ -21,30 +21,28 @@ class WebCrawler:
                      f"max_concurrency={max_concurrency}")
 
     def normalize_url(self, url, base_url=None):
-        """Normalize the URL by joining it with the base and stripping any trailing slashes, queries, and fragments."""
+        """Join the URL with the base and canonicalize it (see `canonicalize_url`); queries are dropped unless CRAWL_URL_QUERIES is set."""
         original_url = url
         url_ = url.strip()
         if base_url:
             url_ = urljoin(base_url, url_)
-        parsed = urlparse(url_)
-        normalized_url = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
-        normalized_url = normalized_url.rstrip('/')
+        normalized_url = canonicalize_url(url_, keep_query=CRAWL_URL_QUERIES)
 
         UTIL_LOGGER.debug(f"Normalized URL from '{original_url}' to '{normalized_url}'")
         return normalized_url
 
-    async def mark_as_visited(self, url):
-        """Mark a URL as visited with locking to prevent race conditions."""
-        async with self.visited_lock:
-            self.visited_urls.add(url)
+    def mark_as_visited(self, url):
+        """Mark a URL as visited (by fingerprint). Returns False if it, or an http/https or www variant of it, already was."""
+        added = self.visited_urls.add(url)
+        if added:
             UTIL_LOGGER.info(f"Marked URL as visited: {url}")
+        return added
 
-    async def is_visited(self, url):
-        """Check if a URL has been visited with locking."""
-        async with self.visited_lock:
-            visited = url in self.visited_urls
-            UTIL_LOGGER.debug(f"Checked if URL is visited: {url} -> {visited}")
-            return visited
+    def is_visited(self, url):
+        """Check if a URL, or an http/https or www variant of it, has been visited."""
+        visited = url in self.visited_urls
+        UTIL_LOGGER.debug(f"Checked if URL is visited: {url} -> {visited}")
+        return visited
         
 
     async def fetch_with_retries(self, url, timeout, max_attempts=3):
@@ -67,27 +65,41 @@ class WebCrawler:
        return None, None, None
     
     async def extract_subpage_links(self, url, html):
-       """Extract subpage links from HTML content."""
+       """Extract subpage links from HTML content as (followed, rejected, anchors); see `WebScraper.find_subpage_link_choices`."""
        try:
-           return await self.scraper.find_subpage_links(url, html)
+           return await self.scraper.find_subpage_link_choices(url, html)
        except Exception as e:
            UTIL_LOGGER.error(f"Error extracting links from {url}: {e}")
-           return []
+           return [], [], {}
 
     async def process_node(self, node, depth, d_limit, queue):
         normalized_url = self.normalize_url(node.url)
         UTIL_LOGGER.info(f"Processing node: {normalized_url} at depth {depth}")
         
+        if self.scraper.find_platform_adapter(normalized_url):
+            # Hosted menu platforms are itemized directly by their adapter; no need to render or expand them.
+            UTIL_LOGGER.info(f"Platform-hosted menu detected, skipping render: {normalized_url}")
+            return
+
         correct_timeout = self.scraper.webpage_timeout * 3 / 1000
-        
+
         async with self.semaphore:
             final_url, html_content, pdf_content = await self.fetch_with_retries(normalized_url, correct_timeout)
             if not html_content and not pdf_content:
                 UTIL_LOGGER.error(f"No content fetched for URL: {normalized_url}")
+                # Pages that keep failing across runs are skipped as dead on later runs.
+                record_fetch_failure(normalized_url)
                 return
+            record_fetch_success(normalized_url)
             node.url = final_url
             if not self.scraper.web_fetcher.is_pdf_url(final_url) and html_content:
-                subpage_links = await self.extract_subpage_links(final_url, html_content)
+                subpage_links, rejected_links, anchors = await self.extract_subpage_links(final_url, html_content)
+                # Rejected links and anchor text are kept on the node as link classifier training data.
+                async with self.node_lock:
+                    for link in rejected_links:
+                        normalized_link = self.normalize_url(link, base_url=final_url)
+                        node.rejected_links.append(normalized_link)
+                        node.link_anchors[normalized_link] = anchors.get(link, '')
                 for link in subpage_links:
                     normalized_link = self.normalize_url(link, base_url=final_url)
                     
@@ -95,12 +107,11 @@ class WebCrawler:
                         UTIL_LOGGER.debug(f"Depth limit reached for URL: {normalized_link}")
                         continue
                     
-                    if await self.is_visited(normalized_link):
+                    # Check-and-add in one call; nothing awaits in between, so concurrent workers can't both claim a link.
+                    if not self.mark_as_visited(normalized_link):
                         UTIL_LOGGER.debug(f"URL already visited: {normalized_link}")
                         continue
 
-                    await self.mark_as_visited(normalized_link)
-
                     if has_cycle(normalized_link):
                         UTIL_LOGGER.warning(f"Cycle detected in URL path: {normalized_link}")
                         continue
@@ -108,6 +119,7 @@ class WebCrawler:
                     child_node = WebNode(url=normalized_link, descriptor=f"{normalized_link}")
                     async with self.node_lock:
                         node.add_child(child_node)
+                        node.link_anchors[normalized_link] = anchors.get(link, '')
                     
                     await queue.put((child_node, depth + 1))
                     
@@ -124,7 +136,7 @@ class WebCrawler:
         UTIL_LOGGER.info(f"Starting crawl with root URL: {normalized_url} and depth limit: {d_limit}")
 
         # Mark the root node as visited and enqueue it
-        await self.mark_as_visited(normalized_url)
+        self.mark_as_visited(normalized_url)
         await queue.put((root_node, 0))
 
         workers = []
@@ -169,7 +181,7 @@ class WebCrawler:
         self.root_normalized_url = normalized_start_url
 
         # Mark the root node as visited before enqueueing
-        await self.mark_as_visited(normalized_start_url)
+        self.mark_as_visited(normalized_start_url)
 
         # Begin crawling
         await self.crawl(self.root_node, d_limit)
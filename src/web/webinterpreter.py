@@ -1,13 +1,13 @@
 # WebInterpreter.py
 from _utils._util import *
+from _utils._seenfilter import SeenURLFilter
 
 
 class WebInterpreter:
     def __init__(self, similarity_threshold=0.6, max_concurrency=10, scraper=None, llm_handler=None, cache_manager=None, content_parser=None):
         self.similarity_threshold = similarity_threshold
         self.semaphore = asyncio.Semaphore(max_concurrency)
-        self.visited_urls = set()
-        self.visited_lock = asyncio.Lock()
+        self.visited_urls = SeenURLFilter(VISITED_FILTER_CAPACITY)  # Checked and updated without awaits, so no lock is needed.
         self.node_lock = asyncio.Lock()
 
         self.scraper = scraper
@@ -21,16 +21,17 @@ class WebInterpreter:
             max_concurrency
         )
 
-    async def mark_as_visited(self, url):
-        async with self.visited_lock:
-            self.visited_urls.add(url)
+    def mark_as_visited(self, url):
+        """Returns False if the URL was already visited."""
+        added = self.visited_urls.add(url)
+        if added:
             UTIL_LOGGER.info("URL marked as visited: %s", url)
+        return added
 
-    async def is_visited(self, url):
-        async with self.visited_lock:
-            visited = url in self.visited_urls
-            UTIL_LOGGER.debug("Checked if URL is visited: %s -> %s", url, visited)
-            return visited
+    def is_visited(self, url):
+        visited = url in self.visited_urls
+        UTIL_LOGGER.debug("Checked if URL is visited: %s -> %s", url, visited)
+        return visited
 
     async def process_dfs_node(self, node, parent):
         UTIL_LOGGER.info("Processing DFS node: %s", node.url)
@@ -39,7 +40,7 @@ class WebInterpreter:
 
         semaphored = 0
         async with self.node_lock:
-            cached_scraped_items = self.cache_manager.get_cached_data('url_to_itemize', node.url)
+            cached_scraped_items = self.cache_manager.get_cached_data('url_to_itemize', url_key(node.url))
             if cached_scraped_items:
                 UTIL_LOGGER.debug("Cache hit for URL: %s", node.url)
             else:
@@ -55,29 +56,13 @@ class WebInterpreter:
         else:
             async with self.semaphore:
                 try:
-                    content_type = 'pdf' if self.scraper.web_fetcher.is_pdf_url(node.url) else 'html'
-                    
-                    UTIL_LOGGER.info("Fetching content for URL: %s as %s", node.url, content_type)
-                    final_url, html_content, pdf_content = await self.scraper.fetch_and_cache_content(node.url)
-                    
-                    if not html_content and not pdf_content:
-                        UTIL_LOGGER.warning("No content fetched for URL: %s", node.url)
+                    scraped_items = await self.extract_node_items(node)
+                    # If extraction returns None, there was an error: do not cache. Otherwise, cache.
+                    if scraped_items is None:
                         return
 
-                    if content_type == 'html':
-                        # Try loading html content first
-                        filtered_content = self.content_parser.parse_content(html_content, 'html')
-                        scraped_items = await self.llm_handler.extract_scraped_items(filtered_content, content_type)
-                    
-                    if content_type == 'pdf' or not scraped_items:
-                        # If no scraped items from html, try loading pdf content (or if pdf is the only content type)
-                        filtered_content = self.content_parser.parse_content(pdf_content, 'pdf')
-                        scraped_items = await self.llm_handler.extract_scraped_items(filtered_content, content_type)
-                    
                     node.scraped_items = scraped_items
-                    
-                    # If the llm call returns None, there was an error: do not cache. Otherwise, cache.
-                    semaphored = 1 if scraped_items is not None else 0
+                    semaphored = 1
                     UTIL_LOGGER.info("Extracted %d scraped items for URL: %s", len(scraped_items), node.url)
                 except Exception as e:
                     UTIL_LOGGER.error("Error processing URL: %s - %s", node.url, str(e))
@@ -85,8 +70,7 @@ class WebInterpreter:
 
         tasks = []
         for child in node.children:
-            if not await self.is_visited(child.url):
-                await self.mark_as_visited(child.url)
+            if self.mark_as_visited(child.url):
                 tasks.append(asyncio.create_task(self.process_dfs_node(child, node)))
             else:
                 UTIL_LOGGER.debug("Skipping already visited URL: %s", child.url)
@@ -114,14 +98,60 @@ class WebInterpreter:
                     UTIL_LOGGER.debug("Updated parent menu book with items from URL: %s", node.url)
 
                 if semaphored:
-                    self.cache_manager.set_cached_data('url_to_itemize', node.url, json.dumps(node.scraped_items))
+                    self.cache_manager.set_cached_data('url_to_itemize', url_key(node.url), json.dumps(node.scraped_items))
                     UTIL_LOGGER.info("Cached scraped items for URL: %s", node.url)
             except Exception as e:
                 UTIL_LOGGER.error("Error updating menu books for URL: %s - %s", node.url, str(e))
 
+    async def extract_node_items(self, node):
+        """
+        Extract scraped items for a node. Hosted menu platforms are handled by their adapter;
+        everything else is fetched, parsed, and itemized by the LLM.
+        Returns None if no content could be fetched.
+        """
+        platform_items = await self.scraper.fetch_platform_items(node.url)
+        if platform_items:
+            UTIL_LOGGER.info("Using platform adapter items for URL: %s", node.url)
+            return platform_items
+
+        content_type = 'pdf' if self.scraper.web_fetcher.is_pdf_url(node.url) else 'html'
+
+        UTIL_LOGGER.info("Fetching content for URL: %s as %s", node.url, content_type)
+        final_url, html_content, pdf_content = await self.scraper.fetch_and_cache_content(node.url)
+
+        if not html_content and not pdf_content:
+            UTIL_LOGGER.warning("No content fetched for URL: %s", node.url)
+            return None
+
+        scraped_items = None
+        if content_type == 'html':
+            # Try loading html content first
+            # Parsed once by the crawler; this is the page's last use, so it is released from the cache.
+            document = await self.scraper.get_document(final_url, html_content, release=True)
+            filtered_content = await self.content_parser.parse_content(document, 'html')
+            scraped_items = await self.itemize_content(filtered_content, content_type)
+
+        if content_type == 'pdf' or not scraped_items:
+            # If no scraped items from html, try loading pdf content (or if pdf is the only content type)
+            filtered_content = await self.content_parser.parse_content(pdf_content, 'pdf')
+            scraped_items = await self.itemize_content(filtered_content, content_type)
+
+        return scraped_items
+
+    async def itemize_content(self, filtered_content, content_type):
+        """Itemize parsed text with the rule-based extractor, falling back to the LLM when it isn't confident."""
+        if USE_RULE_BASED_EXTRACTION and filtered_content:
+            rule_items, confidence = self.content_parser.extract_menu_items(filtered_content)
+            if confidence >= RULE_EXTRACT_CONFIDENCE_THRESHOLD:
+                UTIL_LOGGER.info("Rule-based extraction accepted (confidence %.2f); skipping LLM.", confidence)
+                return rule_items
+            UTIL_LOGGER.debug("Rule-based extraction confidence %.2f below threshold %.2f; calling LLM.", confidence, RULE_EXTRACT_CONFIDENCE_THRESHOLD)
+
+        return await self.llm_handler.extract_scraped_items(filtered_content, content_type)
+
     async def dfs_recursive(self, root_node):
         UTIL_LOGGER.info("Starting DFS recursive traversal from root URL: %s", root_node.url)
-        await self.mark_as_visited(root_node.url)
+        self.mark_as_visited(root_node.url)
         try:
             await self.process_dfs_node(root_node, None)
             UTIL_LOGGER.info("Completed DFS recursive traversal from root URL: %s", root_node.url)
@@ -131,7 +161,7 @@ class WebInterpreter:
     async def start_dfs(self, root_node, openai_model='gpt-4o-mini', default_max_tokens=8192):
         UTIL_LOGGER.info("Starting DFS with root URL: %s", root_node.url)
         self.visited_urls.clear()
-        UTIL_LOGGER.debug("Cleared visited URLs set")
+        UTIL_LOGGER.debug("Cleared visited URLs filter")
 
         # Backup current LLM settings
         model_temp = self.llm_handler.llm.model_chat
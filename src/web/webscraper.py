@@ -2,9 +2,15 @@
 from _utils._util import *
 
 from .contentparser import ContentParser
+from .htmldocument import HTMLDocument, extract_html_views
+from .platformadapters import PlatformAdapterRegistry, extract_platform_items
 from .webinterpreter import WebInterpreter
 
+from _utils._llm import close_shared_http_client
+from _utils._processpool import PROCESS_POOL
+from _utils._seenfilter import get_skip_filter
 from backend.cachemanager import CacheManager
+from backend.linkclassifier import LinkClassifier
 from backend.llmhandler import LLMHandler
 from backend.webfetcher import WebFetcher
 
@@ -65,20 +71,19 @@ class RobotsTxtManager:
 
 class LinkParser:
     @staticmethod
-    def find_menu_link(html_content: str) -> Optional[str]:
+    def find_menu_link(document: HTMLDocument) -> Optional[str]:
         UTIL_LOGGER.debug("Parsing HTML content to find menu link.")
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            menu_element = soup.find('a', {'data-item-id': 'menu', 'data-tooltip': 'Open menu link'})
-            if menu_element and menu_element.get('href'):
-                UTIL_LOGGER.info("Menu link element found with href: %s", menu_element['href'])
-                return menu_element['href']
+            menu_link = document.find_link({'data-item-id': 'menu', 'data-tooltip': 'Open menu link'})
+            if menu_link:
+                UTIL_LOGGER.info("Menu link element found with href: %s", menu_link)
+                return menu_link
             UTIL_LOGGER.info("Menu link element not found in HTML content.")
 
-            menu_element = soup.find('a', {'data-item-id': 'authority', 'data-tooltip': 'Open website'})
-            if menu_element and menu_element.get('href'):
-                UTIL_LOGGER.info("Menu link element found with href: %s", menu_element['href'])
-                return menu_element['href']
+            menu_link = document.find_link({'data-item-id': 'authority', 'data-tooltip': 'Open website'})
+            if menu_link:
+                UTIL_LOGGER.info("Menu link element found with href: %s", menu_link)
+                return menu_link
             UTIL_LOGGER.info("Website link element not found in HTML content.")
 
             return None
@@ -87,81 +92,102 @@ class LinkParser:
             return None
 
     @staticmethod
-    async def extract_subpage_links(url: str, html_content: str, base_domain: str) -> List[str]:
+    async def extract_subpage_links(url: str, document: HTMLDocument, base_domain: str) -> Dict[str, str]:
+        """Same-domain links on the page, in document order, mapped to their anchor text (distinct texts of repeated links are joined)."""
         UTIL_LOGGER.info("Finding subpage links in URL: %s", url)
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            subpage_links = []
-            for a in soup.find_all('a', href=True):
-                href = a['href']
+            unique_links = OrderedDict()
+            for link in document.get_links():
+                href = link['href']
                 full_url = urljoin(url, href)
                 parsed_url = urlparse(full_url)
                 if parsed_url.netloc == base_domain and parsed_url.path and not full_url.startswith('#'):
-                    subpage_links.append(full_url)
+                    texts = unique_links.setdefault(full_url, [])
+                    anchor_text = link.get(HTMLDocument.ANCHOR_TEXT, '')
+                    if anchor_text and anchor_text not in texts:
+                        texts.append(anchor_text)
 
-            unique_links = list(OrderedDict.fromkeys(subpage_links))
             UTIL_LOGGER.info("Found %d unique subpage links before filtering.", len(unique_links))
 
             if not unique_links:
                 UTIL_LOGGER.warning("No subpage links found for URL: %s", url)
-                return []
+                return {}
 
-            return unique_links
+            return OrderedDict((link, ' '.join(texts)) for link, texts in unique_links.items())
         except Exception as e:
             UTIL_LOGGER.error("Error finding subpage links for URL: %s. Error: %s", url, str(e))
-            return []
+            return {}
 
 
 class URLRelevanceEvaluator:
-    def __init__(self, llm_handler: LLMHandler, cache_manager: CacheManager, similarity_threshold: float):
+    def __init__(self, llm_handler: LLMHandler, cache_manager: CacheManager, similarity_threshold: float, link_classifier: Optional[LinkClassifier] = None):
         self.llm_handler = llm_handler
         self.cache_manager = cache_manager
         self.similarity_threshold = similarity_threshold
+        self.link_classifier = link_classifier
+
+    def classify_urls(self, urls: List[str], anchors: Dict[str, str] = None) -> Tuple[List[str], List[str]]:
+        """
+        Split URLs with the learned link classifier into (accepted, undecided). Confident rejections are dropped.
+        Links the classifier is unsure about, or has no known features for, are left to the embedding path.
+        `anchors` maps URLs to their anchor text.
+        """
+        if self.link_classifier is None or not urls:
+            return [], urls
+        anchors = anchors or {}
+        anchor_texts = [anchors.get(url, '') for url in urls]
+        accepted, undecided = [], []
+        for url, anchor_text, probability in zip(urls, anchor_texts, self.link_classifier.predict_proba(urls, anchor_texts)):
+            if not self.link_classifier.known_features(url, anchor_text) or LINK_CLASSIFIER_REJECT < probability < LINK_CLASSIFIER_ACCEPT:
+                undecided.append(url)
+            elif probability >= LINK_CLASSIFIER_ACCEPT:
+                accepted.append(url)
+        UTIL_LOGGER.info(
+            "Link classifier accepted %d, rejected %d and left %d of %d URLs to embedding relevance.",
+            len(accepted), len(urls) - len(accepted) - len(undecided), len(undecided), len(urls)
+        )
+        return accepted, undecided
 
     async def filter_relevant_urls(self, urls: List[str]) -> List[str]:
-        UTIL_LOGGER.info("Evaluating embedding relevance for %d URLs.", len(urls))
-        relevant_urls = []
-        normalized_urls = [normalize_url(url) for url in urls]
+        relevant_urls, _ = await self.score_urls(urls)
+        return relevant_urls
+
+    async def score_urls(self, urls: List[str], anchors: Dict[str, str] = None) -> Tuple[List[str], List[str]]:
+        """
+        Split URLs into (relevant, rejected), both canonicalized. Only URLs whose embedding relevance was actually
+        computed and fell at or below the threshold are rejected; links the classifier dropped, links left unscored
+        and every link on the error path are in neither list. `anchors` maps canonical URLs to their anchor text.
+        """
+        # Dedupe the frontier by fingerprint: variants of one page are evaluated (and crawled) once.
+        unique_urls = {}
+        for url in urls:
+            unique_urls.setdefault(url_fingerprint(url), canonicalize_url(url))
+        classified_urls, normalized_urls = self.classify_urls(list(unique_urls.values()), anchors)
+        if not normalized_urls:
+            return classified_urls, []
+        UTIL_LOGGER.info("Evaluating embedding relevance for %d URLs.", len(normalized_urls))
         try:
-            UTIL_LOGGER.debug("Checking cache for embedding relevance.")
-            cached_data = {
-                url: self.cache_manager.get_cached_data('embedding_relevance', url)
-                for url in normalized_urls
-            }
-
-            cached_urls = [(url, relevance) for url, relevance in cached_data.items() if relevance is not None]
-            uncached_urls = [url for url, relevance in cached_data.items() if relevance is None]
+            # Relevance is cached per URL segment by the LLM handler, so new URLs made of known segments cost no embeddings.
+            relevant_urls = await self.llm_handler.find_url_relevance(normalized_urls)
 
-            UTIL_LOGGER.info(
-                "Cache hit for %d URLs, remaining URLs to evaluate: %d",
-                len(cached_urls),
-                len(uncached_urls)
-            )
-            relevant_urls.extend(cached_urls)
-
-            if uncached_urls:
-                UTIL_LOGGER.info("Evaluating relevance for %d uncached URLs.", len(uncached_urls))
-                new_relevant_urls = await self.llm_handler.find_url_relevance(uncached_urls)
-                for final_url, relevance in new_relevant_urls:
-                    if relevance is not None:
-                        self.cache_manager.set_cached_data('embedding_relevance', final_url, relevance)
-                        UTIL_LOGGER.info("Cached embedding relevance for URL: %s", final_url)
-                        relevant_urls.append((final_url, relevance))
-
-            filtered_urls = [
+            filtered_urls = classified_urls + [
                 url for url, relevance in relevant_urls
                 if relevance is not None and float(relevance) > self.similarity_threshold
             ]
+            rejected_urls = [
+                url for url, relevance in relevant_urls
+                if relevance is not None and float(relevance) <= self.similarity_threshold
+            ]
             UTIL_LOGGER.info(
                 "Filtered %d URLs based on similarity threshold of %.2f.",
                 len(filtered_urls),
                 self.similarity_threshold
             )
 
-            return filtered_urls
+            return filtered_urls, rejected_urls
         except Exception as e:
             UTIL_LOGGER.error("Error evaluating URL embedding relevance. Error: %s", str(e))
-            return []
+            return classified_urls, []
 
 
 class WebScraper:
@@ -178,7 +204,7 @@ class WebScraper:
         self.web_fetcher = WebFetcher(webpage_timeout=self.webpage_timeout)
         self.content_parser = ContentParser()
         self.cache_manager = CacheManager()
-        self.llm_handler = LLMHandler()
+        self.llm_handler = LLMHandler(cache_manager=self.cache_manager)
         self.web_interpreter = WebInterpreter(
             similarity_threshold=self.similarity_threshold,
             max_concurrency=self.max_concurrency,
@@ -189,20 +215,24 @@ class WebScraper:
         )
         self.robots_manager = RobotsTxtManager(self.cache_manager, self.webpage_timeout)
         self.link_parser = LinkParser()
-        self.url_relevance_evaluator = URLRelevanceEvaluator(self.llm_handler, self.cache_manager, self.similarity_threshold)
+        self.platform_adapters = PlatformAdapterRegistry()
+        self.documents = OrderedDict()  # LRU of parsed pages, keyed by content digest, shared by link and text extraction.
+        self.link_classifier = LinkClassifier.load(LINK_CLASSIFIER_PATH) if LINK_CLASSIFIER_PATH else None
+        self.url_relevance_evaluator = URLRelevanceEvaluator(self.llm_handler, self.cache_manager, self.similarity_threshold, self.link_classifier)
 
         UTIL_LOGGER.info("WebScraper initialized successfully.")
 
     async def fetch_and_cache_content(self, url: str) -> Optional[Tuple[str, Optional[str], Optional[bytes]]]:
         UTIL_LOGGER.info("Fetching and caching contents for URL: %s", url)
 
-        normalized_url = normalize_url(url)
+        normalized_url = canonicalize_url(url)
 
-        cached_final_url = self.cache_manager.get_cached_data('source_dest', normalized_url)
+        # URL-keyed caches are keyed by fingerprint, so http/https, www and tracking-parameter variants share entries.
+        cached_final_url = self.cache_manager.get_cached_data('source_dest', url_key(normalized_url))
         if cached_final_url:
             UTIL_LOGGER.debug("Cache hit for URL: %s, redirecting to: %s", normalized_url, cached_final_url)
-            html_content = self.cache_manager.get_cached_data('url_to_html_data', cached_final_url)
-            pdf_content = self.cache_manager.get_cached_data('url_to_pdf_data', cached_final_url)
+            html_content = self.cache_manager.get_cached_data('url_to_html_data', url_key(cached_final_url))
+            pdf_content = self.cache_manager.get_cached_data('url_to_pdf_data', url_key(cached_final_url))
             if html_content or pdf_content:
                 UTIL_LOGGER.debug("Content retrieved from cache for URL: %s", cached_final_url)
                 return cached_final_url, html_content, pdf_content
@@ -223,20 +253,86 @@ class WebScraper:
             UTIL_LOGGER.error("Exception occurred while fetching content for URL: %s. Error: %s", normalized_url, str(e))
             return None, None, None
 
-        normalized_final_url = normalize_url(final_url)
+        normalized_final_url = canonicalize_url(final_url)
 
         try:
-            self.cache_manager.set_cached_data('source_dest', normalized_url, normalized_final_url)
+            self.cache_manager.set_cached_data('source_dest', url_key(normalized_url), normalized_final_url)
             if html_content:
-                self.cache_manager.set_cached_data('url_to_html_data', normalized_final_url, html_content)
+                self.cache_manager.set_cached_data('url_to_html_data', url_key(normalized_final_url), html_content)
             if pdf_content:
-                self.cache_manager.set_cached_data('url_to_pdf_data', normalized_final_url, pdf_content)
+                self.cache_manager.set_cached_data('url_to_pdf_data', url_key(normalized_final_url), pdf_content)
             UTIL_LOGGER.info("Content cached for URL: %s", normalized_final_url)
         except Exception as e:
             UTIL_LOGGER.error("Failed to cache content for URL: %s. Error: %s", normalized_final_url, str(e))
 
         return final_url, html_content, pdf_content
 
+    async def get_document(self, url: str, html_content: str, release: bool = False) -> HTMLDocument:
+        """
+        Return the parsed document for a page, parsing it only if it isn't already in the LRU.
+        Parsing runs in the process pool so large pages don't block the event loop.
+
+        Entries are keyed by a digest of the HTML, so the crawler (which has the fetched URL) and the
+        interpreter (which may only have the redirect target or a canonical form) always find the same entry.
+        With `release`, the entry is dropped after this call; the interpreter is a page's last reader.
+        """
+        key = blake2b(html_content.encode('utf-8', errors='replace'), digest_size=16).digest() if html_content else None
+        document = self.documents.pop(key, None) if release else self.documents.get(key)
+        if document is not None:
+            if not release:
+                self.documents.move_to_end(key)
+            UTIL_LOGGER.debug("Reusing parsed document for URL: %s", url)
+            return document
+
+        try:
+            links, text = await PROCESS_POOL.run(extract_html_views, html_content)
+            document = HTMLDocument.from_views(html_content, links, text)
+        except Exception as e:
+            UTIL_LOGGER.error("Process pool failed to parse URL: %s. Parsing in-loop. Error: %s", url, str(e))
+            document = HTMLDocument(html_content)
+
+        if key and not release:
+            self.documents[key] = document
+            if len(self.documents) > DOCUMENT_CACHE_SIZE:
+                self.documents.popitem(last=False)
+        return document
+
+    def find_platform_adapter(self, url: str):
+        """Return the hosted-menu platform adapter for the URL, if adapters are enabled and one matches."""
+        if not USE_PLATFORM_ADAPTERS:
+            return None
+        return self.platform_adapters.find_adapter(url)
+
+    async def fetch_platform_items(self, url: str) -> Optional[Dict[str, List[str]]]:
+        """
+        Extract menu items directly from a hosted menu platform, bypassing the browser and the LLM.
+        Returns None if no adapter matches or the adapter finds nothing, so callers can fall back.
+        """
+        adapter = self.find_platform_adapter(url)
+        if adapter is None:
+            return None
+
+        if not await self.robots_manager.is_allowed(canonicalize_url(url)):
+            UTIL_LOGGER.info(f"URL disallowed by robots.txt: {url}. Skipping platform adapter.")
+            return None
+
+        html_content = await adapter.fetch(url, timeout=self.webpage_timeout / 1000, session=self.platform_adapters.session())
+        if not html_content:
+            return None
+
+        try:
+            scraped_items = await PROCESS_POOL.run(extract_platform_items, type(adapter), html_content)
+        except Exception as e:
+            UTIL_LOGGER.error("Platform adapter '%s' failed for URL: %s. Error: %s", adapter.name, url, str(e))
+            return None
+
+        if not scraped_items:
+            UTIL_LOGGER.warning("Platform adapter '%s' found no items for URL: %s. Falling back.", adapter.name, url)
+            return None
+
+        UTIL_LOGGER.info("Platform adapter '%s' extracted %d items for URL: %s", adapter.name, len(scraped_items), url)
+        return scraped_items
+
     async def source_establishment_url(self, google_maps_url: str) -> Optional[str]:
         UTIL_LOGGER.info("Retrieving menu link from Google Maps URL: %s", google_maps_url)
 
@@ -245,7 +341,7 @@ class WebScraper:
             UTIL_LOGGER.warning("No HTML content found for Google Maps URL: %s", google_maps_url)
             return None
 
-        menu_link = self.link_parser.find_menu_link(html_content)
+        menu_link = self.link_parser.find_menu_link(await self.get_document(final_url, html_content))
         if menu_link:
             UTIL_LOGGER.info("Menu link found: %s for URL: %s", menu_link, final_url)
             return menu_link
@@ -253,15 +349,40 @@ class WebScraper:
         return None
 
     async def find_subpage_links(self, url: str, html_content: str) -> List[str]:
+        filtered_links, _, _ = await self.find_subpage_link_choices(url, html_content)
+        return filtered_links
+
+    async def find_subpage_link_choices(self, url: str, html_content: str) -> Tuple[List[str], List[str], Dict[str, str]]:
+        """
+        Subpage links as (followed, rejected, anchors): the links to crawl, the links embedding relevance scored
+        as irrelevant, and canonical URL -> anchor text for every link on the page.
+        """
         parsed_base_url = urlparse(url)
         base_domain = parsed_base_url.netloc
-        subpage_links = await LinkParser.extract_subpage_links(url, html_content, base_domain)
-        if not subpage_links:
-            return []
-
-        filtered_links = await self.url_relevance_evaluator.filter_relevant_urls(subpage_links)
+        link_anchors = await LinkParser.extract_subpage_links(url, await self.get_document(url, html_content), base_domain)
+        if not link_anchors:
+            return [], [], {}
+        anchors = {}
+        for link, anchor_text in link_anchors.items():
+            canonical_link = canonicalize_url(link)
+            if anchor_text not in anchors.get(canonical_link, ''):
+                anchors[canonical_link] = f"{anchors.get(canonical_link, '')} {anchor_text}".strip()
+            anchors.setdefault(canonical_link, '')
+        subpage_links = list(link_anchors)
+
+        # Links found dead or irrelevant on earlier runs are skipped without scoring, and links scored irrelevant now are remembered.
+        skip_filter = get_skip_filter(base_domain)
+        if skip_filter is not None:
+            candidate_links = [link for link in subpage_links if link not in skip_filter]
+            UTIL_LOGGER.info("Skipped %d subpage links known to be dead or irrelevant.", len(subpage_links) - len(candidate_links))
+            subpage_links = candidate_links
+
+        filtered_links, rejected_links = await self.url_relevance_evaluator.score_urls(subpage_links, anchors)
+        if skip_filter is not None:
+            for link in rejected_links:
+                skip_filter.add(link)
         UTIL_LOGGER.info("Number of subpage links after filtering: %d", len(filtered_links))
-        return filtered_links
+        return filtered_links, rejected_links, anchors
 
     async def close(self):
         UTIL_LOGGER.info("Closing WebScraper and releasing resources.")
@@ -271,6 +392,24 @@ class WebScraper:
         except Exception as e:
             UTIL_LOGGER.error("Error stopping WebFetcher Playwright. Error: %s", str(e))
 
+        try:
+            await self.platform_adapters.close()
+            UTIL_LOGGER.debug("Platform adapter HTTP session closed.")
+        except Exception as e:
+            UTIL_LOGGER.error("Error closing platform adapter HTTP session. Error: %s", str(e))
+
+        try:
+            await close_shared_http_client()
+            UTIL_LOGGER.debug("Shared LLM HTTP pool closed.")
+        except Exception as e:
+            UTIL_LOGGER.error("Error closing shared LLM HTTP pool. Error: %s", str(e))
+
+        try:
+            PROCESS_POOL.shutdown()
+            UTIL_LOGGER.debug("Process pool shut down.")
+        except Exception as e:
+            UTIL_LOGGER.error("Error shutting down process pool. Error: %s", str(e))
+
         try:
             self.cache_manager.close()
             UTIL_LOGGER.debug("CacheManager closed.")